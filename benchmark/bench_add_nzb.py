@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark measuring the cost of adding in-memory NZB-Files through
+# add_nzb(content=...)
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_add_nzb.py [count]
+
+The NZBGet API is replaced by an object that simply accepts everything
+appended to it.  The legacy approach (writing each NZB-File to a temporary
+file and parsing it back from disk) is timed for comparison.
+"""
+import os
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from tempfile import mkstemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import PostProcessScript  # noqa: E402
+
+NZB_CONTENT = u"""<?xml version="1.0" encoding="UTF-8"?>
+<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">
+<head>
+    <meta type="category">TV</meta>
+    <meta type="name">A.Great.TV.Show.S01E%(no).2d</meta>
+</head>
+<file poster="bench" date="1" subject="&quot;show.rar&quot;">
+<groups><group>alt.binaries.test</group></groups>
+<segments>
+<segment bytes="768000" number="1">part1.%(no)d@example.com</segment>
+</segments>
+</file>
+</nzb>
+"""
+
+
+class API(object):
+    """Accepts (and counts) everything appended to it"""
+    def __init__(self):
+        self.count = 0
+
+    def append(self, *args):
+        self.count += 1
+        return True
+
+
+def legacy(script, content):
+    """The temporary file round trip previously used by parse_nzbcontent()
+    """
+    fd, path = mkstemp(suffix='.tmp.nzb', dir=script.tempdir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        return script.parse_nzbfile(path)
+
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        script = PostProcessScript(logger=None, tempdir=workdir)
+        script.api = API()
+        contents = [NZB_CONTENT % {'no': no % 100} for no in range(count)]
+
+        start = time.time()
+        for content in contents:
+            assert legacy(script, content)['CATEGORY'] == 'TV'
+        elapsed = time.time() - start
+        print('%-10s %8.2f ms  (%.3f ms per NZB-File)' % (
+            'tempfile', elapsed * 1000.0, elapsed * 1000.0 / count))
+
+        start = time.time()
+        for content in contents:
+            assert script.add_nzb('show.nzb', content=content)
+        elapsed = time.time() - start
+        print('%-10s %8.2f ms  (%.3f ms per NZB-File)' % (
+            'add_nzb', elapsed * 1000.0, elapsed * 1000.0 / count))
+        assert script.api.count == count
+
+    finally:
+        rmtree(workdir)
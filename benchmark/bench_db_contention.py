@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of the shared database with several scripts (processes)
+# reading from and writing to it at the same time
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_db_contention.py [writers] [readers] [ops] [path]
+
+Each writer (process) set()s and each reader get()s the specified number of
+keys.  The 'legacy' settings are the ones the database was opened with
+before; the default rollback journal, a full sync of every transaction and
+no retries.  The database is created within path if specified (use this to
+benchmark a network or other mounted file system).
+"""
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+from multiprocessing import Process
+from multiprocessing import Queue
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.Database import Database  # noqa: E402
+
+SETTINGS = (
+    ('legacy', {'journal_mode': 'DELETE', 'synchronous': 'FULL',
+                'retries': 0}),
+    ('wal', {}),
+)
+
+
+def worker(queue, database, settings, no, writer, ops):
+    """Reports the latency of each of our operations (and our failures)"""
+    db = Database(
+        container='bench%d' % (no % 2), database=database, logger=None,
+        **settings)
+
+    latencies = []
+    failures = 0
+    start = time.time()
+    for op in range(ops):
+        key = 'KEY%d' % (op % 50)
+        _start = time.time()
+        if writer:
+            failures += not db.set(key, 'x' * 256)
+        else:
+            db.get(key)
+        latencies.append(time.time() - _start)
+
+    queue.put((writer, time.time() - start, latencies, failures))
+
+
+def run(name, database, settings, writers, readers, ops):
+    # Prepare our database (and it's journal mode) up front
+    Database(container=None, database=database, reset=True, logger=None,
+             **settings)
+
+    queue = Queue()
+    processes = [
+        Process(target=worker, args=(
+            queue, database, settings, no, no < writers, ops))
+        for no in range(writers + readers)]
+
+    for process in processes:
+        process.start()
+
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    for kind, writer in (('write', True), ('read', False)):
+        _results = [r for r in results if r[0] == writer]
+        if not _results:
+            continue
+
+        latencies = sorted(sum((r[2] for r in _results), []))
+        print('%-8s %-6s %8.0f ops/s  p99 %8.2f ms  failures %d' % (
+            name, kind, len(latencies) / max(r[1] for r in _results),
+            latencies[int(len(latencies) * 0.99)] * 1000.0,
+            sum(r[3] for r in _results)))
+
+
+if __name__ == '__main__':
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    ops = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[4] if len(sys.argv) > 4 else None)
+
+    try:
+        for name, settings in SETTINGS:
+            run(name, join(workdir, '%s.db' % name), settings,
+                writers, readers, ops)
+
+    finally:
+        rmtree(workdir)
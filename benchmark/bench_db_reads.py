@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of get() and nzb_get() lookups against the database compared
+# to lookups against a preloaded container
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_db_reads.py [files] [keys] [path]
+
+Each file is looked up the way a post-process script typically does; eight
+nzb_get() calls (most of which miss) and a get().  The container is filled
+with the specified number of keys first.  The database is created within
+path if specified (use this to benchmark a network or other mounted file
+system).
+"""
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+NZB_KEYS = (
+    'PROPERNAME', 'EPISODENAME', 'MOVIEYEAR', 'CATEGORY', 'NAME',
+    'SEASON', 'EPISODE', 'PROPERNAME',
+)
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    try:
+        script = ScriptBase(
+            logger=None, tempdir=workdir, database_key='bench')
+        with script.transaction():
+            for no in range(keys):
+                script.set('KEY%.5d' % no, 'x' * 64, use_env=False)
+                script.nzb_set('KEY%.5d' % no, 'x' * 64, use_env=False)
+            script.nzb_set('CATEGORY', 'TV', use_env=False)
+
+        for preload in (False, True):
+            script = ScriptBase(
+                logger=None, tempdir=workdir, database_key='bench',
+                database_preload=preload)
+
+            start = time.time()
+            for no in range(files):
+                for key in NZB_KEYS:
+                    script.nzb_get(key)
+                script.get('KEY%.5d' % (no % keys))
+
+            print('%-10s %10.2f ms' % (
+                'preload' if preload else 'database',
+                (time.time() - start) * 1000.0))
+
+    finally:
+        rmtree(workdir)
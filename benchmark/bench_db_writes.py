@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of writing a lot of keys to the database one at a time
+# compared to writing them in a single transaction
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_db_writes.py [keys] [path]
+
+The 'legacy' writes look each key up before updating or inserting it and
+commit every key on it's own; the way set() worked before it used an UPSERT.
+The database is created within path if specified (use this to benchmark a
+network or other mounted file system).
+"""
+import sys
+import time
+from datetime import datetime
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.Database import Database  # noqa: E402
+from nzbget.Database import DEFAULT_CATEGORY  # noqa: E402
+from nzbget.Database import SQLITE_DATE_FORMAT  # noqa: E402
+
+
+def legacy(db, items):
+    """Writes each key the way set() used to"""
+    for key, value in items:
+        now = datetime.now().strftime(SQLITE_DATE_FORMAT)
+        if db.socket.execute(
+                "SELECT value FROM keystore WHERE "
+                "container = ? AND category = ? AND key = ?",
+                (db.container, DEFAULT_CATEGORY, key)).fetchall():
+            db.socket.execute(
+                "UPDATE keystore SET value = ?, last_update = ? "
+                "WHERE container = ? AND category = ? AND key = ?",
+                (value, now, db.container, DEFAULT_CATEGORY, key))
+        else:
+            db.socket.execute(
+                "INSERT INTO keystore "
+                "(container, category, key, value, last_update) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (db.container, DEFAULT_CATEGORY, key, value, now))
+        db.socket.commit()
+
+
+def each(db, items):
+    for key, value in items:
+        db.set(key, value)
+
+
+def transaction(db, items):
+    with db.transaction():
+        for key, value in items:
+            db.set(key, value)
+
+
+def set_many(db, items):
+    db.set_many(items)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[2] if len(sys.argv) > 2 else None)
+
+    try:
+        items = [('KEY%.5d' % no, 'x' * 64) for no in range(count)]
+        for synchronous in ('FULL', 'NORMAL'):
+            db = Database(
+                container='bench', database=join(workdir, 'bench.db'),
+                reset=True, logger=None, synchronous=synchronous)
+
+            for name, fn in (('legacy', legacy), ('set()', each),
+                             ('transaction()', transaction),
+                             ('set_many()', set_many)):
+                # Our first pass inserts, our second one updates
+                for action in ('insert', 'update'):
+                    start = time.time()
+                    fn(db, items)
+                    print('%-6s %-14s %-6s %10.2f ms' % (
+                        synchronous, name, action,
+                        (time.time() - start) * 1000.0))
+
+                db.execute("DELETE FROM keystore")
+                db.socket.commit()
+            db.close()
+
+    finally:
+        rmtree(workdir)
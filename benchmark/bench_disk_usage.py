@@ -0,0 +1,88 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing a get_files() total to disk_usage()
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_disk_usage.py [files] [directories] [path]
+
+A tree of files spread across the specified number of directories is
+generated (within path if specified; use this to benchmark a network or
+other mounted file system).  The 'legacy' total adds up the file sizes
+get_files() returns the way scripts typically do on their own.
+"""
+import sys
+import time
+from os import makedirs
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+def generate(path, files, directories):
+    """Generates our synthetic (show/season) tree"""
+    for dir_no in range(directories):
+        makedirs(join(path, 'Show.%.3d' % (dir_no // 10),
+                      'Season.%.3d' % dir_no))
+
+    for no in range(files):
+        dir_no = no % directories
+        with open(join(path, 'Show.%.3d' % (dir_no // 10),
+                       'Season.%.3d' % dir_no, 'Show.E%.5d.mkv' % no),
+                  'wb') as f:
+            f.write(b'x' * (no % 4096))
+    return sum(no % 4096 for no in range(files))
+
+
+def timed(name, fn, expected):
+    start = time.time()
+    assert fn() == expected
+    print('%-28s %10.2f ms' % (name, (time.time() - start) * 1000.0))
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    directories = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    try:
+        tree = join(workdir, 'tree')
+        expected = generate(tree, files, directories)
+        script = ScriptBase(logger=None, tempdir=workdir)
+
+        timed('get_files (legacy)', lambda: sum(
+            f['filesize'] for f in script.get_files(
+                tree, fullstats=True).values()), expected)
+
+        for threads in (None, 4):
+            timed('disk_usage (%s thread(s))' % (threads or 1),
+                  lambda: script.disk_usage(
+                      tree, threads=threads, use_cache=False)[tree]['bytes'],
+                  expected)
+
+        # Prime our cache
+        script.disk_usage(tree)
+        timed('disk_usage (cached)',
+              lambda: script.disk_usage(tree)[tree]['bytes'], expected)
+
+    finally:
+        rmtree(workdir)
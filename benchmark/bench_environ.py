@@ -0,0 +1,120 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing the single pass environment index to the regular
+# expression passes ScriptBase used to make over the environment
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_environ.py [variables] [iterations]
+"""
+import sys
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from timeit import timeit
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..'))
+
+from nzbget.ScriptBase import index_environ  # noqa: E402
+from nzbget.ScriptBase import SYS_OPTS_RE  # noqa: E402
+from nzbget.ScriptBase import CFG_OPTS_RE  # noqa: E402
+from nzbget.ScriptBase import SHR_OPTS_RE  # noqa: E402
+from nzbget.ScriptBase import TST_OPTS_RE  # noqa: E402
+from nzbget.ScriptBase import SAB_OPTS_RE  # noqa: E402
+from nzbget.ScriptBase import DNZB_OPTS_RE  # noqa: E402
+from nzbget.PostProcessScript import POSTPROC_OPTS_RE  # noqa: E402
+
+
+def synthetic_environ(count):
+    """Generates an environment resembling the one NZBGet passes along;
+    the bulk of it being NZBOP_ (system) options.
+    """
+    env = {
+        'PATH': '/usr/local/bin:/usr/bin:/bin',
+        'HOME': '/home/nzbget',
+        'LANG': 'en_US.UTF-8',
+    }
+    for no in range(count):
+        bucket = no % 20
+        if bucket < 14:
+            env['NZBOP_OPTION%.5d' % no] = ' value %d ' % no
+        elif bucket < 16:
+            env['NZBPO_OPTION%.5d' % no] = 'yes'
+        elif bucket < 17:
+            env['NZBR__DNZB_HEADER%.5d' % no] = 'header'
+        elif bucket < 18:
+            env['NZBPP_OPTION%.5d' % no] = '/downloads/%d' % no
+        else:
+            env['XDG_OPTION%.5d' % no] = 'ignored'
+    return env
+
+
+def legacy(env):
+    """How ScriptBase.__init__(), pull_dnzb() and postprocess_init() used to
+    load the environment.
+    """
+    system = {}
+    system.update({
+        SYS_OPTS_RE.match(k).group(1): v.strip()
+        for (k, v) in env.items() if SYS_OPTS_RE.match(k)})
+    system.update({
+        SAB_OPTS_RE.match(k).group(1): v.strip()
+        for (k, v) in env.items() if SAB_OPTS_RE.match(k)})
+    config = {
+        CFG_OPTS_RE.match(k).group(1): v.strip()
+        for (k, v) in env.items() if CFG_OPTS_RE.match(k)}
+    shared = {
+        SHR_OPTS_RE.match(k).group(1): v.strip()
+        for (k, v) in env.items() if SHR_OPTS_RE.match(k)}
+    test = {
+        TST_OPTS_RE.match(k).group(1): v.strip()
+        for (k, v) in env.items() if TST_OPTS_RE.match(k)}
+    dnzb = {
+        DNZB_OPTS_RE.match(k).group(1).upper(): v.strip()
+        for (k, v) in env.items() if DNZB_OPTS_RE.match(k)}
+    postproc = dict([
+        (POSTPROC_OPTS_RE.match(k).group(1), v.strip())
+        for (k, v) in env.items() if POSTPROC_OPTS_RE.match(k)])
+    return system, config, shared, test, dnzb, postproc
+
+
+def indexed(env):
+    """How the environment is loaded today"""
+    index = index_environ(env)
+    system = dict(index.get('NZBOP_', {}))
+    system.update(index.get('SAB_', {}))
+    return (
+        system,
+        dict(index.get('NZBPO_', {})),
+        dict(index.get('NZBR_', {})),
+        dict(index.get('NZBCP_', {})),
+        dict(index.get('NZBR__DNZB_', {})),
+        dict(index.get('NZBPP_', {})),
+    )
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    env = synthetic_environ(count)
+    assert legacy(env) == indexed(env)
+
+    before = timeit(lambda: legacy(env), number=iterations) / iterations
+    after = timeit(lambda: indexed(env), number=iterations) / iterations
+
+    print('Environment variables: %d' % len(env))
+    print('regex passes:  %8.3f ms' % (before * 1000.0))
+    print('single pass:   %8.3f ms' % (after * 1000.0))
+    print('speedup:       %8.2fx' % (before / after))
@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing a full get_files() walk to get_file_changes()
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_file_changes.py [files] [directories] [path]
+
+A tree of files spread across the specified number of directories is
+generated (within path if specified; use this to benchmark a network or
+other mounted file system).
+"""
+import sys
+import time
+from os import makedirs
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+def generate(path, files, directories):
+    """Generates our synthetic (show/season) tree"""
+    for dir_no in range(directories):
+        makedirs(join(path, 'Show.%.3d' % (dir_no // 10),
+                      'Season.%.3d' % dir_no))
+
+    for no in range(files):
+        dir_no = no % directories
+        with open(join(path, 'Show.%.3d' % (dir_no // 10),
+                       'Season.%.3d' % dir_no, 'Show.E%.5d.mkv' % no), 'w'):
+            pass
+
+
+def timed(name, fn):
+    start = time.time()
+    result = fn()
+    print('%-28s %10.2f ms' % (name, (time.time() - start) * 1000.0))
+    return result
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    directories = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    try:
+        tree = join(workdir, 'tree')
+        generate(tree, files, directories)
+        script = ScriptBase(
+            logger=None, tempdir=workdir, database_key='bench')
+
+        assert len(timed('get_files (fullstats)', lambda: script.get_files(
+            tree, fullstats=True))) == files
+        assert len(timed('first snapshot', lambda: script.get_file_changes(
+            tree))['added']) == files
+
+        changes = timed('no changes', lambda: script.get_file_changes(tree))
+        assert not any(changes.values())
+
+        changes = timed('no changes (verify)', lambda: script.get_file_changes(
+            tree, verify=True))
+        assert not any(changes.values())
+
+        # A new episode arrives
+        with open(join(tree, 'Show.000', 'Season.000', 'new.mkv'), 'w'):
+            pass
+        changes = timed('one file added', lambda: script.get_file_changes(
+            tree))
+        assert len(changes['added']) == 1
+
+    finally:
+        rmtree(workdir)
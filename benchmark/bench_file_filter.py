@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of the per-file cost of the filters applied by get_files()
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_file_filter.py [filenames]
+
+The 'legacy' matcher loops over each regular expression, prefix and suffix
+in turn the way get_files() did before it used a FileFilter.
+"""
+import re
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.ScriptBase import FileFilter  # noqa: E402
+
+REGEX_FILTER = [
+    re.compile(r, re.MULTILINE | re.IGNORECASE) for r in (
+        r'^sample', r'\.nfo$', r'\.(srt|sub|idx)$', r'\.vol[0-9]+',
+        r'^proof', r'\.sfv$')]
+PREFIX_FILTER = ['Show', 'Movie', 'Sample', 'Proof']
+SUFFIX_FILTER = ['.mkv', '.avi', '.mp4', '.nfo', '.srt', '.par2', '.sfv']
+
+
+def legacy(name):
+    """The way get_files() matched each file before"""
+    for regex in REGEX_FILTER:
+        if regex.search(name):
+            break
+    else:
+        return False
+
+    for prefix in PREFIX_FILTER:
+        if name[0:len(prefix)] == prefix:
+            break
+    else:
+        return False
+
+    for suffix in SUFFIX_FILTER:
+        if name[-len(suffix):] == suffix:
+            return True
+    return False
+
+
+def timed(name, fn, names, expected):
+    start = time.time()
+    assert sum(1 for n in names if fn(n)) == expected
+    print('%-10s %10.2f ms' % (name, (time.time() - start) * 1000.0))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    names = [
+        '%s.E%.5d.%s' % (prefix, no, ext)
+        for no, (prefix, ext) in enumerate(
+            (p, e) for p in ('Show', 'Sample', 'Other', 'Proof')
+            for e in ('mkv', 'nfo', 'srt', 'vol01.par2', 'txt', 'sfv'))
+    ] * (count // 24)
+
+    file_filter = FileFilter(
+        regex_filter=REGEX_FILTER, prefix_filter=PREFIX_FILTER,
+        suffix_filter=SUFFIX_FILTER)
+    expected = sum(1 for n in names if legacy(n))
+
+    timed('legacy', legacy, names, expected)
+    timed('FileFilter', file_filter.match, names, expected)
@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of the memory used by the per-file details get_files() returns
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_file_records.py [files]
+
+The 'legacy' records are the dictionaries (with their datetime objects)
+get_files() created for each file before it used FileRecord objects.
+Python v3.4+ is required (for tracemalloc).
+"""
+import sys
+import time
+import tracemalloc
+from os import stat
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from os.path import splitext
+from datetime import datetime
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.ScriptBase import FileRecord  # noqa: E402
+
+
+def legacy(basename, dirname, stat_obj):
+    """The way get_files() recorded each file (with fullstats) before"""
+    return {
+        'basename': basename,
+        'dirname': dirname,
+        'extension': splitext(basename)[1].lower(),
+        'filename': splitext(basename)[0],
+        'modified': datetime.fromtimestamp(stat_obj.st_mtime),
+        'accessed': datetime.fromtimestamp(stat_obj.st_atime),
+        'created': datetime.fromtimestamp(stat_obj.st_ctime),
+        'filesize': stat_obj.st_size,
+    }
+
+
+def measure(name, fn, names, stat_obj):
+    """Reports the time taken and the memory held by our records"""
+    path = '/downloads/complete/A.Great.Show'
+    tracemalloc.start()
+    start = time.time()
+    records = dict(
+        (join(path, n), fn(n, path, stat_obj)) for n in names)
+    elapsed = time.time() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Reading the file sizes (what most callers are after)
+    start = time.time()
+    assert sum(r['filesize'] for r in records.values()) == \
+        stat_obj.st_size * len(names)
+    read = time.time() - start
+
+    print('%-12s %8.1f MB  %6d bytes/file  build %8.2f ms  read %6.2f ms' % (
+        name, size / (1024.0 * 1024.0), size // len(names),
+        elapsed * 1000.0, read * 1000.0))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    names = ['A.Great.Show.E%.6d.mkv' % no for no in range(count)]
+    stat_obj = stat(__file__)
+
+    measure('legacy', legacy, names, stat_obj)
+    measure('FileRecord', FileRecord, names, stat_obj)
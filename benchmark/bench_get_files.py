@@ -0,0 +1,121 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of get_files() against large synthetic directory trees
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_get_files.py [files] [directories] [path]
+
+A tree of files spread across the specified number of directories is
+generated (within path if specified; use this to benchmark a network or
+other mounted file system).  The 'legacy' walk issues the same system calls
+get_files() did before it was built on scandir(): listdir() followed by
+isdir(), isfile() (and islink() for directories) and stat() per entry.
+"""
+import sys
+import time
+from os import stat
+from os import listdir
+from os import makedirs
+from os.path import join
+from os.path import isdir
+from os.path import isfile
+from os.path import islink
+from os.path import dirname
+from os.path import abspath
+from os.path import basename
+from os.path import splitext
+from datetime import datetime
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+def generate(path, files, directories):
+    """Generates our synthetic tree"""
+    for dir_no in range(directories):
+        makedirs(join(path, 'Season.%.3d' % dir_no))
+
+    for no in range(files):
+        with open(join(path, 'Season.%.3d' % (no % directories),
+                       'Show.E%.5d.mkv' % no), 'w'):
+            pass
+
+
+def legacy(path, fullstats=False):
+    """The system calls get_files() made per entry before scandir()"""
+    files = {}
+    for dirent in listdir(path):
+        fullpath = join(path, dirent)
+        if isdir(fullpath):
+            if islink(fullpath):
+                continue
+            files.update(legacy(fullpath, fullstats=fullstats))
+            continue
+
+        elif not isfile(fullpath):
+            continue
+
+        files[fullpath] = {
+            'basename': dirent,
+            'dirname': path,
+            'extension': splitext(basename(dirent))[1].lower(),
+            'filename': splitext(basename(dirent))[0],
+        }
+        if fullstats:
+            stat_obj = stat(fullpath)
+            files[fullpath]['modified'] = \
+                datetime.fromtimestamp(stat_obj.st_mtime)
+            files[fullpath]['accessed'] = \
+                datetime.fromtimestamp(stat_obj.st_atime)
+            files[fullpath]['created'] = \
+                datetime.fromtimestamp(stat_obj.st_ctime)
+            files[fullpath]['filesize'] = stat_obj.st_size
+
+    return files
+
+
+def timed(name, fn, expected, count=3):
+    """Reports the best of count runs"""
+    results = []
+    for _ in range(count):
+        start = time.time()
+        assert len(fn()) == expected
+        results.append(time.time() - start)
+    print('%-24s %10.2f ms' % (name, min(results) * 1000.0))
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    directories = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    try:
+        generate(workdir, files, directories)
+        script = ScriptBase(logger=None, tempdir=workdir)
+
+        timed('legacy', lambda: legacy(workdir), files)
+        timed('get_files', lambda: script.get_files(workdir), files)
+        timed('legacy (fullstats)',
+              lambda: legacy(workdir, fullstats=True), files)
+        timed('get_files (fullstats)',
+              lambda: script.get_files(workdir, fullstats=True), files)
+
+    finally:
+        rmtree(workdir)
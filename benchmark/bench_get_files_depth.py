@@ -0,0 +1,114 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of get_files() against deep (narrow) and wide (shallow)
+# directory trees
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_get_files_depth.py [depth] [width]
+
+The 'recursive' walk is the way get_files() walked sub-directories before
+it used an explicit stack; a generator per directory level with each file
+passed up through every level above it.
+"""
+import sys
+import time
+from os import mkdir
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+class RecursiveScript(ScriptBase):
+    """Walks sub-directories the way get_files() used to"""
+    def _iter_directory(self, search_dir, current_depth, threads=None,
+                        **filters):
+        for fullpath, _file in self._scan_directory(
+                search_dir, current_depth, **filters):
+            if _file is None:
+                for _entry in self._iter_directory(
+                        fullpath, current_depth + 1, **filters):
+                    yield _entry
+                continue
+
+            yield (fullpath, _file)
+
+
+def deep(path, depth, files=5):
+    """A single chain of directories (with a few files at each level)"""
+    for _ in range(depth):
+        for no in range(files):
+            open(join(path, 'file%d.m2ts' % no), 'w').close()
+        path = join(path, 'd')
+        mkdir(path)
+    return depth * files
+
+
+def wide(path, width, files=5):
+    """A lot of directories (with a few files in each) at the same level"""
+    for dir_no in range(width):
+        _path = join(path, 'dir%.5d' % dir_no)
+        mkdir(_path)
+        for no in range(files):
+            open(join(_path, 'file%d.mkv' % no), 'w').close()
+    return width * files
+
+
+def timed(name, script, path, expected, count=3):
+    """Reports the best of count runs"""
+    results = []
+    for _ in range(count):
+        start = time.time()
+        try:
+            assert len(script.get_files(path)) == expected
+
+        except RuntimeError:
+            # RecursionError (Python v3.5+)
+            print('%-24s RecursionError' % name)
+            return
+
+        results.append(time.time() - start)
+    print('%-24s %10.2f ms' % (name, min(results) * 1000.0))
+
+
+if __name__ == '__main__':
+    # Our deep tree must fit within the maximum path length
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        for name, build, size in (('deep', deep, depth),
+                                  ('wide', wide, width)):
+            path = join(workdir, name)
+            mkdir(path)
+            expected = build(path, size)
+
+            timed('%s (recursive)' % name,
+                  RecursiveScript(logger=None, tempdir=workdir),
+                  path, expected)
+            timed('%s (stack)' % name,
+                  ScriptBase(logger=None, tempdir=workdir), path, expected)
+
+    finally:
+        # rmtree() recurses once per directory level
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), depth * 2))
+        rmtree(workdir)
@@ -0,0 +1,116 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of the threaded get_files() walk against a (simulated) slow
+# network file system
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_get_files_threaded.py [latency ms] [threads ...]
+
+Every directory listing and stat() call made by get_files() is delayed by
+the latency specified (2ms by default) to simulate the round trip each one
+costs on a NFS or FUSE mounted file system.
+"""
+import sys
+import time
+from os import makedirs
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+from nzbget import Utils  # noqa: E402
+
+
+class SlowDirEntry(object):
+    """An os.DirEntry whose stat() calls are delayed"""
+    def __init__(self, entry, latency):
+        self._entry = entry
+        self._latency = latency
+        self.name = entry.name
+        self.path = entry.path
+
+    def stat(self, *args, **kwargs):
+        time.sleep(self._latency)
+        return self._entry.stat(*args, **kwargs)
+
+    def is_dir(self, *args, **kwargs):
+        return self._entry.is_dir(*args, **kwargs)
+
+    def is_file(self, *args, **kwargs):
+        return self._entry.is_file(*args, **kwargs)
+
+    def is_symlink(self):
+        return self._entry.is_symlink()
+
+
+def slow_scandir(scandir, latency):
+    """Returns a scandir() whose listings (and stat() calls) are delayed"""
+    def _scandir(path):
+        time.sleep(latency)
+        return [SlowDirEntry(entry, latency) for entry in scandir(path)]
+    return _scandir
+
+
+def generate(path, shows=10, seasons=5, episodes=10):
+    """Generates a (shows/seasons/episodes) tree"""
+    for show in range(shows):
+        for season in range(seasons):
+            _dir = join(path, 'Show.%.2d' % show, 'Season.%.2d' % season)
+            makedirs(_dir)
+            for episode in range(episodes):
+                for ext in ('mkv', 'nfo'):
+                    open(join(_dir, 'Show.S%.2dE%.2d.%s' % (
+                        season, episode, ext)), 'w').close()
+
+    return shows * seasons * episodes * 2
+
+
+def timed(name, fn, expected):
+    start = time.time()
+    assert fn() == expected
+    print('%-28s %10.2f ms' % (name, (time.time() - start) * 1000.0))
+
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) / 1000.0 if len(sys.argv) > 1 else 0.002
+    threads = [int(t) for t in sys.argv[2:]] or [4, 16, 32]
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        files = generate(workdir)
+        script = ScriptBase(logger=None, tempdir=workdir)
+        Utils._scandir = slow_scandir(Utils._scandir, latency)
+
+        for fullstats in (False, True):
+            expected = list(script.iter_files(workdir, fullstats=fullstats))
+            assert len(expected) == files
+
+            label = ' (fullstats)' if fullstats else ''
+            timed('serial' + label, lambda: list(script.iter_files(
+                workdir, fullstats=fullstats)), expected)
+
+            for count in threads:
+                timed('%d threads%s' % (count, label),
+                      lambda: list(script.iter_files(
+                          workdir, fullstats=fullstats, threads=count)),
+                      expected)
+
+    finally:
+        rmtree(workdir)
@@ -0,0 +1,100 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of hash_files() (serial, threaded and cached)
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_hash_files.py [files] [size in MB] [path]
+
+The files are generated within path if specified (use this to benchmark a
+network or other mounted file system).  The 'legacy' hash reads each file
+in 64KB blocks the way scripts typically do on their own.
+"""
+import os
+import sys
+import time
+import hashlib
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+def legacy(paths, algorithm):
+    """Hashes each file one after another"""
+    results = {}
+    for path in paths:
+        hasher = hashlib.new(algorithm)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(65536)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        results[path] = hasher.hexdigest()
+    return results
+
+
+def timed(name, fn, expected):
+    start = time.time()
+    assert fn() == expected
+    print('%-28s %10.2f ms' % (name, (time.time() - start) * 1000.0))
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    try:
+        paths = []
+        for no in range(files):
+            paths.append(join(workdir, 'file%.3d.mkv' % no))
+            with open(paths[-1], 'wb') as f:
+                f.write(os.urandom(size * 1024 * 1024))
+
+        script = ScriptBase(
+            logger=None, tempdir=workdir, database_key='bench')
+        for algorithm in ('md5', 'sha1', 'crc32'):
+            expected = script.hash_files(paths, algorithm, use_cache=False)
+            if algorithm != 'crc32':
+                timed('%s legacy' % algorithm,
+                      lambda: legacy(paths, algorithm), expected)
+
+            for threads in (1, 4):
+                timed('%s %d thread(s)' % (algorithm, threads),
+                      lambda: script.hash_files(
+                          paths, algorithm, threads=threads,
+                          use_cache=False), expected)
+
+            timed('%s partial (64KB)' % algorithm,
+                  lambda: script.hash_files(
+                      paths, algorithm, partial=65536, use_cache=False),
+                  script.hash_files(
+                      paths, algorithm, partial=65536, use_cache=False))
+
+            # Prime our cache
+            script.hash_files(paths, algorithm)
+            timed('%s cached' % algorithm,
+                  lambda: script.hash_files(paths, algorithm), expected)
+
+    finally:
+        rmtree(workdir)
@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing largest_files() to sorting all of get_files()
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_largest_files.py [files]
+
+A download directory made up of a few (sparse) video files and a lot of
+small ones (subtitles, par2 volumes, etc) is generated.  Python v3.4+ is
+required (for tracemalloc).
+"""
+import sys
+import time
+import tracemalloc
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+def generate(path, files):
+    """Generates our download directory"""
+    for no in range(files):
+        ext = ('srt', 'vol%.3d.par2' % no, 'nfo', 'jpg')[no % 4]
+        with open(join(path, 'A.Great.Show.%.5d.%s' % (no, ext)), 'wb') as f:
+            f.write(b'x' * (no % 512))
+
+    for no in range(3):
+        with open(join(path, 'A.Great.Show.E%.2d.mkv' % no), 'wb') as f:
+            f.truncate((no + 1) * 1024 * 1024 * 1024)
+
+
+def measure(name, fn):
+    """Reports the time taken (and the peak memory used) by fn()"""
+    start = time.time()
+    result = fn()
+    elapsed = time.time() - start
+
+    # Tracing our memory slows us down; so it's measured separately
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print('%-16s %10.2f ms  peak %8.1f MB' % (
+        name, elapsed * 1000.0, peak / (1024.0 * 1024.0)))
+    return result
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        generate(workdir, files)
+        script = ScriptBase(logger=None, tempdir=workdir)
+
+        def legacy():
+            return sorted(
+                script.get_files(workdir, fullstats=True).items(),
+                key=lambda entry: entry[1]['filesize'], reverse=True)[:3]
+
+        expected = [path for path, _ in measure('get_files + sort', legacy)]
+        assert [path for path, _ in measure(
+            'largest_files', lambda: script.largest_files(
+                3, workdir))] == expected
+
+        summary = measure(
+            'summarize_files', lambda: script.summarize_files(workdir))
+        assert summary['files'] == files + 3
+
+    finally:
+        rmtree(workdir)
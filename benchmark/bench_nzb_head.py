@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing the cost of reading just the <head/> of an NZB-File
+# to parsing the entire document
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_nzb_head.py [sizes in MB ...]
+"""
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from os.path import getsize
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.NZBParser import parse_nzb_head  # noqa: E402
+
+NZB_HEAD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">
+<head>
+    <meta type="category">Movies</meta>
+    <meta type="name">A.Great.Movie</meta>
+</head>
+"""
+
+NZB_SEGMENT = b'<segment bytes="768000" number="%d">' \
+    b'part%d.%d.abcdefghijklmnop@example.com</segment>\n'
+
+
+def generate(path, size):
+    """Writes an NZB-File of (approximately) size bytes"""
+    with open(path, 'wb') as f:
+        f.write(NZB_HEAD)
+        written = len(NZB_HEAD)
+        file_no = 0
+        while written < size:
+            file_no += 1
+            chunk = [
+                b'<file poster="bench" date="1" subject="part%d">\n' % file_no,
+                b'<groups><group>alt.binaries.test</group></groups>\n',
+                b'<segments>\n',
+            ]
+            chunk.extend([
+                NZB_SEGMENT % (no, file_no, no) for no in range(1, 101)])
+            chunk.append(b'</segments>\n</file>\n')
+            chunk = b''.join(chunk)
+            f.write(chunk)
+            written += len(chunk)
+
+        f.write(b'</nzb>\n')
+
+
+def timed(path, head_only, count):
+    """Returns the mean time (in milliseconds) to parse our NZB-File"""
+    start = time.time()
+    for _ in range(count):
+        assert parse_nzb_head(path, head_only=head_only)['NAME']
+    return (time.time() - start) * 1000.0 / count
+
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1:]] or [1, 10, 50]
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        for size in sizes:
+            path = join(workdir, 'bench-%dMB.nzb' % size)
+            generate(path, size * 1024 * 1024)
+
+            head = timed(path, True, 100)
+            full = timed(path, False, 3)
+            print('%6.1f MB  head %8.3f ms  full %10.2f ms  (%.0fx)' % (
+                getsize(path) / (1024.0 * 1024.0), head, full, full / head))
+
+    finally:
+        rmtree(workdir)
@@ -0,0 +1,100 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark measuring the time and peak memory used to index the body of
+# an NZB-File compared to loading the entire document tree
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_nzb_index.py [segments]
+
+Peak memory is measured with tracemalloc (Python 3.4+).  Memory allocated
+by lxml itself is not visible to tracemalloc, so the full tree is loaded
+with xml.etree.ElementTree for comparison.  Timings are inflated by
+tracemalloc; compare them against one another only.
+"""
+import sys
+import time
+import tracemalloc
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+from xml.etree import ElementTree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget.NZBParser import iter_nzb_files  # noqa: E402
+from nzbget.NZBParser import summarize_nzb  # noqa: E402
+
+NZB_HEAD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">
+<head>
+    <meta type="name">A.Great.Movie</meta>
+</head>
+"""
+
+NZB_SEGMENT = b'<segment bytes="768000" number="%d">' \
+    b'part%d.%d.abcdefghijklmnop@example.com</segment>\n'
+
+
+def generate(path, segments, per_file=1000):
+    """Writes an NZB-File with the specified number of segments"""
+    with open(path, 'wb') as f:
+        f.write(NZB_HEAD)
+        for file_no in range(1, (segments // per_file) + 1):
+            ext = b'par2' if file_no % 10 == 0 else b'rar'
+            f.write(
+                b'<file poster="bench" date="1" '
+                b'subject="&quot;movie.%d.%s&quot;">\n' % (file_no, ext))
+            f.write(b'<groups><group>alt.binaries.test</group></groups>\n')
+            f.write(b'<segments>\n')
+            f.write(b''.join([
+                NZB_SEGMENT % (no, file_no, no)
+                for no in range(1, per_file + 1)]))
+            f.write(b'</segments>\n</file>\n')
+        f.write(b'</nzb>\n')
+
+
+def measure(name, fn):
+    tracemalloc.start()
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-10s %8.2f s  peak %10.2f MB' % (
+        name, elapsed, peak / (1024.0 * 1024.0)))
+
+
+if __name__ == '__main__':
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        path = join(workdir, 'bench.nzb')
+        generate(path, segments)
+
+        def index():
+            for entry in iter_nzb_files(path):
+                for segment in entry.segments:
+                    pass
+
+        measure('tree', lambda: ElementTree.parse(path))
+        measure('index', index)
+        measure('summary', lambda: summarize_nzb(path))
+
+    finally:
+        rmtree(workdir)
@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing the lookup of renamed NZB-Files (.queued,
+# .processed, etc) through a filtered directory scan to our indexed lookup
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_nzb_variants.py [files]
+"""
+import re
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+from nzbget.ScriptBase import nzb_variants  # noqa: E402
+
+SUFFIXES = ('.queued', '.2.queued', '.processed', '.error')
+
+
+def legacy(script, path, name):
+    """The filtered directory scan previously used by parse_nzbfile()"""
+    file_escaped = re.escape(name)
+    file_regex = r'^%s|%s' % (file_escaped, file_escaped) + \
+        r'(' + \
+        r'|\.queued|\.[0-9]+\.queued' + \
+        r'|\.processed|\.[0-9]+\.processed' + \
+        r'|\.nzb_processed|\.[0-9]+\.nzb_processed' + \
+        r'|\.error|\.[0-9]+\.error' + \
+        r')$'
+
+    return script.get_files(
+        search_dir=path,
+        regex_filter=file_regex,
+        fullstats=True,
+        max_depth=1,
+    )
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        for no in range(count // len(SUFFIXES)):
+            for suffix in SUFFIXES:
+                with open(join(workdir, 'Show.S01E%.5d.nzb%s' % (
+                        no, suffix)), 'w'):
+                    pass
+
+        script = ScriptBase(logger=None, tempdir=workdir)
+        name = 'Show.S01E%.5d.nzb' % (count // len(SUFFIXES) // 2)
+
+        start = time.time()
+        assert len(legacy(script, workdir, name)) == len(SUFFIXES)
+        print('%-10s %10.3f ms' % ('scan', (time.time() - start) * 1000.0))
+
+        start = time.time()
+        assert len(nzb_variants(workdir, name)) == len(SUFFIXES)
+        print('%-10s %10.3f ms' % ('index', (time.time() - start) * 1000.0))
+
+        start = time.time()
+        for _ in range(1000):
+            assert len(nzb_variants(workdir, name)) == len(SUFFIXES)
+        print('%-10s %10.3f ms' % ('lookup', (time.time() - start)))
+
+    finally:
+        rmtree(workdir)
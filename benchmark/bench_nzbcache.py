@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing repeated parse_nzbfile() calls for the same
+# NZB-File with and without the (shared) NZB-File cache
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_nzbcache.py [count]
+
+Each call is made from a new script object (and therefore a new database
+connection), the way each NZBGet event would see it.  The 'cold' timings
+start a new interpreter for each call; a cache hit never has to load the
+XML parser.
+"""
+import os
+import sys
+import time
+import subprocess
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+NZB_HEAD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">
+<head>
+    <meta type="category">Movies</meta>
+    <meta type="name">A.Great.Movie</meta>
+</head>
+"""
+
+NZB_SEGMENT = b'<segment bytes="768000" number="%d">' \
+    b'part%d.%d.abcdefghijklmnop@example.com</segment>\n'
+
+COLD = '''
+import sys
+sys.path.insert(0, %(root)r)
+from nzbget import ScriptBase
+script = ScriptBase(logger=None, tempdir=%(tempdir)r)
+assert script.parse_nzbfile(%(path)r, use_cache=%(use_cache)r)['NAME']
+'''
+
+
+def generate(path, files=500):
+    """Writes an NZB-File"""
+    with open(path, 'wb') as f:
+        f.write(NZB_HEAD)
+        for file_no in range(1, files + 1):
+            f.write(b'<file poster="bench" date="1" subject="part%d">\n'
+                    b'<groups><group>alt.binaries.test</group></groups>\n'
+                    b'<segments>\n' % file_no)
+            f.write(b''.join([
+                NZB_SEGMENT % (no, file_no, no) for no in range(1, 101)]))
+            f.write(b'</segments>\n</file>\n')
+        f.write(b'</nzb>\n')
+
+
+def report(name, elapsed, count):
+    print('%-14s %8.3f ms per call' % (name, elapsed * 1000.0 / count))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    try:
+        path = join(workdir, 'A.Great.Movie.nzb')
+        generate(path)
+
+        for use_cache in (False, True):
+            # Prime our cache
+            ScriptBase(logger=None, tempdir=workdir).parse_nzbfile(
+                path, use_cache=True)
+
+            start = time.time()
+            for _ in range(count):
+                script = ScriptBase(logger=None, tempdir=workdir)
+                assert script.parse_nzbfile(
+                    path, use_cache=use_cache)['NAME']
+            report('cached' if use_cache else 'parsed',
+                   time.time() - start, count)
+
+            start = time.time()
+            for _ in range(count // 10):
+                subprocess.check_call([sys.executable, '-c', COLD % {
+                    'root': ROOT, 'tempdir': workdir, 'path': path,
+                    'use_cache': use_cache}], env=dict(os.environ))
+            report('cold cached' if use_cache else 'cold parsed',
+                   time.time() - start, count // 10)
+
+    finally:
+        rmtree(workdir)
@@ -0,0 +1,131 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark comparing the per-event latency of a cold script start to
+# one handed off to a resident Worker through it's shim
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_worker.py [events]
+"""
+import os
+import sys
+import time
+import subprocess
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+
+SCRIPT = '''
+import sys
+sys.path.insert(0, %(root)r)
+
+from nzbget import PostProcessScript
+
+
+class BenchScript(PostProcessScript):
+    def postprocess_main(self, *args, **kwargs):
+        self.push('RESULT', self.get('COLOR'))
+        return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from nzbget.Worker import ScriptWorker
+        ScriptWorker(BenchScript, sys.argv[2], logger=False).serve_forever()
+
+    else:
+        sys.exit(BenchScript(logger=False).run())
+'''
+
+
+def timed(command, env, count):
+    """Returns the per-event latencies (in milliseconds)"""
+    results = []
+    for _ in range(count):
+        start = time.time()
+        process = subprocess.Popen(
+            command, env=env, stdout=subprocess.PIPE)
+        output = process.communicate()[0]
+        results.append((time.time() - start) * 1000.0)
+        assert process.returncode == 93
+        assert b'NZBPR_RESULT=blue' in output
+
+    return sorted(results)
+
+
+class Discard(object):
+    """Swallows the output relayed back to us"""
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def report(name, results):
+    print('%-10s mean %8.2f ms  median %8.2f ms  max %8.2f ms' % (
+        name,
+        sum(results) / len(results),
+        results[len(results) // 2],
+        results[-1],
+    ))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    workdir = mkdtemp(prefix='nzbget-bench-')
+    script = join(workdir, 'BenchScript.py')
+    sock = join(workdir, 'worker.sock')
+    with open(script, 'w') as f:
+        f.write(SCRIPT % {'root': ROOT})
+
+    env = dict(os.environ)
+    env.update({
+        'NZBOP_TEMPDIR': workdir,
+        'NZBOP_VERSION': '18',
+        'NZBPP_DIRECTORY': workdir,
+        'NZBPP_NZBNAME': 'A.Great.Movie',
+        'NZBPO_COLOR': 'blue',
+    })
+    # A realistic amount of NZBGet options
+    env.update({'NZBOP_OPTION%.4d' % no: 'value' for no in range(1000)})
+
+    worker = subprocess.Popen([sys.executable, script, 'serve', sock])
+    try:
+        while not os.path.exists(sock):
+            time.sleep(0.01)
+
+        shim = [sys.executable, join(ROOT, 'nzbget', 'Worker.py'), sock]
+        report('cold', timed([sys.executable, script], env, count))
+        report('shim', timed(shim, env, count))
+
+        # The round trip to the worker alone (no interpreter start up)
+        sys.path.insert(0, ROOT)
+        from nzbget.Worker import forward
+        results = []
+        for _ in range(count):
+            start = time.time()
+            assert forward(sock, environ=env, stdout=Discard()) == 93
+            results.append((time.time() - start) * 1000.0)
+        report('worker', sorted(results))
+
+    finally:
+        worker.terminate()
+        worker.wait()
+        rmtree(workdir)
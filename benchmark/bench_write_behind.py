@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+#
+# A benchmark of set() writing to the database immediately compared to
+# queuing the writes (write-behind)
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Usage: python benchmark/bench_write_behind.py [keys] [path]
+
+The database is created within path if specified (use this to benchmark a
+network or other mounted file system).
+"""
+import sys
+import time
+from os.path import join
+from os.path import dirname
+from os.path import abspath
+from tempfile import mkdtemp
+from shutil import rmtree
+
+ROOT = join(dirname(abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from nzbget import ScriptBase  # noqa: E402
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workdir = mkdtemp(
+        prefix='nzbget-bench-', dir=sys.argv[2] if len(sys.argv) > 2 else None)
+
+    try:
+        for write_behind in (False, True):
+            script = ScriptBase(
+                logger=None, tempdir=workdir, database_key='bench',
+                write_behind=write_behind)
+
+            start = time.time()
+            for no in range(count):
+                script.set('KEY%.5d' % no, 'x' * 64, use_env=False)
+            queued = time.time() - start
+            script.flush_writes()
+            elapsed = time.time() - start
+
+            print('%-14s set() %10.2f ms  total %10.2f ms' % (
+                'write-behind' if write_behind else 'immediate',
+                queued * 1000.0, elapsed * 1000.0))
+
+    finally:
+        rmtree(workdir)
@@ -32,6 +32,10 @@ cpu power by just sharing your results in advance.
 import sqlite3
 import re
 import six
+import json
+from contextlib import contextmanager
+from time import sleep
+from random import uniform
 from datetime import datetime
 from datetime import timedelta
 from os.path import isfile
@@ -39,13 +43,14 @@ from os.path import dirname
 from os.path import isdir
 from os import unlink
 from os import makedirs
+from os import sep
 
 from .Logger import init_logger
 from .Logger import destroy_logger
 from logging import Logger
 
 # This should always be set to the current database version
-NZBGET_DATABASE_VERSION = 1
+NZBGET_DATABASE_VERSION = 4
 
 # In seconds, we identify how long to let content linger in the
 # database for before it's purged (no sense letting content grow)
@@ -53,6 +58,43 @@ NZBGET_DATABASE_VERSION = 1
 # information; there is no need to keep content longer then this.
 PURGE_AGE = 60 * 60 * 12
 
+# The maximum number of parsed NZB-Files we keep in our cache; the least
+# recently used entries are removed by prune() once we exceed this
+NZBCACHE_SIZE = 1000
+
+# In seconds, how often we update when a cached NZB-File was last used
+NZBCACHE_TOUCH_AGE = 60 * 10
+
+# The journal mode set on every connection; WAL lets readers carry on while
+# another script is writing (the journal mode falls back to SQLite's default
+# on file systems that don't support it such as NFS)
+DATABASE_JOURNAL_MODE = 'WAL'
+
+# How hard SQLite works to get our writes to disk; NORMAL is safe from
+# corruption in WAL mode (a power loss can only cost the last transaction)
+DATABASE_SYNCHRONOUS = 'NORMAL'
+
+# In milliseconds, how long we wait for another script to release its lock
+# on the database before giving up
+DATABASE_BUSY_TIMEOUT = 2000
+
+# The number of times we retry a locked database (after our busy timeout has
+# elapsed); each attempt is delayed by a random amount of up to
+# DATABASE_RETRY_DELAY seconds (doubled with each attempt and capped at
+# DATABASE_RETRY_MAX_DELAY) so that waiting scripts don't all retry at once.
+#
+# NZBGet waits on each script it runs, so a locked database holds up its
+# queue; a write gives up after (1 + DATABASE_RETRIES) busy timeouts plus
+# the delays between them (about 6 seconds by default).  Without WAL our
+# COMMIT can be held up by readers as well, which can double this.
+DATABASE_RETRIES = 2
+DATABASE_RETRY_DELAY = 0.05
+DATABASE_RETRY_MAX_DELAY = 2.0
+
+# The supported (journal mode and synchronous) settings
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
 # Format required to correctly query and handle SQLite Dates
 SQLITE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
@@ -79,6 +121,59 @@ NZBGET_SCHEMA = {
      "CREATE UNIQUE INDEX keystore_idx ON keystore (container, category, key)",
      "CREATE INDEX last_update_idx ON keystore (last_update)",
   ],
+  2: [
+     # A cache of the (meta) content parsed from NZB-Files shared by all
+     # scripts (regardless of their container).  Entries are identified
+     # by their path and are only valid for as long as the size,
+     # modification time and inode of the NZB-File remains unchanged.
+     "CREATE TABLE nzbcache (" + \
+        "path TEXT PRIMARY KEY, " + \
+        "size INTEGER, " + \
+        "mtime REAL, " + \
+        "inode INTEGER, " + \
+        "meta TEXT, " + \
+        "summary TEXT, " + \
+        "last_access DATETIME DEFAULT current_timestamp" + \
+     ")",
+     "CREATE INDEX nzbcache_access_idx ON nzbcache (last_access)",
+     "INSERT INTO lookup (key, value) VALUES ('NZBCACHE_SIZE', '%d')" % \
+         NZBCACHE_SIZE,
+  ],
+  3: [
+     # The snapshot of each directory tree (root) scanned for changes; every
+     # directory and file found within it is recorded along with the
+     # directory (parent) it was found in.  Snapshots are kept until they're
+     # removed; they are not subject to our PURGE_AGE.
+     "CREATE TABLE snapshot (" + \
+        "container TEXT, " + \
+        "root TEXT, " + \
+        "path TEXT, " + \
+        "parent TEXT, " + \
+        "is_dir INTEGER, " + \
+        "inode INTEGER, " + \
+        "size INTEGER, " + \
+        "mtime REAL" + \
+     ")",
+     "CREATE UNIQUE INDEX snapshot_idx ON snapshot (container, root, path)",
+     "CREATE INDEX snapshot_parent_idx ON snapshot " + \
+        "(container, root, parent, is_dir)",
+  ],
+  4: [
+     # A cache of the hashes calculated for files (shared by all scripts);
+     # just like the nzbcache, entries are only valid for as long as the
+     # size, modification time and inode of the file remains unchanged.
+     "CREATE TABLE hashcache (" + \
+        "path TEXT, " + \
+        "algorithm TEXT, " + \
+        "size INTEGER, " + \
+        "mtime REAL, " + \
+        "inode INTEGER, " + \
+        "digest TEXT, " + \
+        "last_update DATETIME DEFAULT current_timestamp" + \
+     ")",
+     "CREATE UNIQUE INDEX hashcache_idx ON hashcache (path, algorithm)",
+     "CREATE INDEX hashcache_update_idx ON hashcache (last_update)",
+  ],
 }
 # This is just used for a quick reference when verifying that
 # all of the schema is present (during initialization)
@@ -87,6 +182,9 @@ NZBGET_SCHEMA = {
 NZBGET_SCHEMA_TABLES = (
    u'lookup',
    u'keystore',
+   u'nzbcache',
+   u'snapshot',
+   u'hashcache',
 )
 
 # Categories allow us to further partition our keystore hash table
@@ -104,13 +202,58 @@ DEFAULT_CATEGORY = Category.CONFIG
 # keys should not be complicated... make it so they aren't
 VALID_KEY_RE = re.compile('[^a-zA-Z0-9_.-]')
 
+
+# The kinds of (sqlite3) errors we recover from
+class ErrorType(object):
+    # Another script is holding on to the database; we retry
+    LOCKED = u'locked'
+    # The disk is full or the database is read-only; we carry on in memory
+    UNWRITABLE = u'unwritable'
+    # Anything else might be damage; it's confirmed before we reset
+    CORRUPT = u'corrupt'
+
+ERROR_TYPES = [ ErrorType.LOCKED, ErrorType.UNWRITABLE, ErrorType.CORRUPT, ]
+
+# The (lowercase) error messages that identify each type of error
+LOCKED_ERRORS = ('locked', 'busy', )
+UNWRITABLE_ERRORS = (
+    'disk is full', 'readonly', 'read-only', 'disk i/o error',
+    'unable to open', 'out of memory',
+)
+
+
+def classify_error(e):
+    """Returns the ErrorType of the sqlite3.Error specified
+    """
+    message = str(e).lower()
+    if any(m in message for m in LOCKED_ERRORS):
+        return ErrorType.LOCKED
+
+    if any(m in message for m in UNWRITABLE_ERRORS):
+        return ErrorType.UNWRITABLE
+
+    return ErrorType.CORRUPT
+
+
 class Database(object):
     def __init__(self, container, database, reset=False,
-                 logger=True, debug=False):
+                 logger=True, debug=False, journal_mode=None,
+                 synchronous=None, busy_timeout=None, retries=None,
+                 preload=False):
         """Initializes the database if it isn't already prepared,
            Th en fetches an index to work with based on the key passed in.
            If reset is set to True, then if an existing entry is found, it is
            automatically reset and treated as a fresh process.
+
+           The journal_mode, synchronous, busy_timeout (in milliseconds) and
+           retries default to DATABASE_JOURNAL_MODE, DATABASE_SYNCHRONOUS,
+           DATABASE_BUSY_TIMEOUT and DATABASE_RETRIES respectively.
+
+           If preload is set to True, then everything stored in our
+           container is read (in a single query) the first time it's needed
+           and get() and items() are served from memory from then on.  Our
+           own writes are kept in sync; the writes of other scripts made
+           after this point are not seen.
         """
         # self.container
         # This acts as the index for fetching content to and from
@@ -158,17 +301,68 @@ class Database(object):
         else:
             self.logger_id = None
 
-        if reset or not isfile(self.database):
+        # Connection settings
+        self.journal_mode = (
+            journal_mode or DATABASE_JOURNAL_MODE).upper()
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(
+                'Invalid journal mode specified: %s' % journal_mode)
+
+        self.synchronous = (synchronous or DATABASE_SYNCHRONOUS).upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                'Invalid synchronous mode specified: %s' % synchronous)
+
+        self.busy_timeout = DATABASE_BUSY_TIMEOUT \
+            if busy_timeout is None else int(busy_timeout)
+        self.retries = DATABASE_RETRIES if retries is None else int(retries)
+
+        # The depth of the transaction() blocks we're in and whether a
+        # write within them has failed (so nothing is committed)
+        self._transactions = 0
+        self._transaction_failed = False
+
+        # Whether our last (outermost) transaction() block was committed
+        self.committed = None
+
+        # Our preloaded container (keyed by category and then key); it's
+        # None until it's first needed (or after it's been invalidated)
+        self.preload = preload
+        self._cache = None
+
+        # Set once we can no longer write to our database and have moved
+        # to an in-memory copy of it
+        self.in_memory = False
+
+        # How often we've had to recover from each ErrorType along with how
+        # often we retried a locked database and reset a damaged one
+        self.counters = dict((k, 0) for k in ERROR_TYPES + ['retry', 'reset'])
+
+        if reset:
             # Initialize
             self._reset()
 
+        elif not isfile(self.database):
+            # Initialize; but don't remove a database another script
+            # (starting up at the same time) may have just created
+            self._reset(remove=False)
+
         # Connect to Database
         if not self.connect():
             raise EnvironmentError('Could not access database.')
 
         if not self._schema_okay():
-            # fail-safe
-            self._reset()
+            version = self._get_version()
+            if 0 < version < NZBGET_DATABASE_VERSION:
+                # Upgrade our older database (keeping it's content)
+                self._build_schema(start_version=version)
+
+        if not self._schema_okay():
+            # fail-safe; but never reset a database that's just locked
+            if self._damaged():
+                self.counters['reset'] += 1
+                self._reset()
+
             if not self._schema_okay():
                 raise EnvironmentError('Could not prepare database.')
 
@@ -183,21 +377,30 @@ class Database(object):
         if self.logger_id:
             destroy_logger(self.logger_id)
 
-    def _reset(self, rebuild=True):
+    def _reset(self, rebuild=True, remove=True):
         """Resets the database
         If rebuild is set to True then the schema is re-prepared
+        If remove is set to False then an existing database is kept
         """
+        self._cache = None
+
         try:
             self.close()
         except:
             pass
 
-        try:
-            # Best way to reset the database is to
-            # remove it entirely
-            unlink(self.database)
-        except:
-            pass
+        for path in (self.database,
+                     # Our write-ahead log (and it's index)
+                     self.database + '-wal', self.database + '-shm'):
+            if not remove:
+                break
+
+            try:
+                # Best way to reset the database is to
+                # remove it entirely
+                unlink(path)
+            except:
+                pass
 
         if not isdir(dirname(self.database)):
             try:
@@ -230,7 +433,8 @@ class Database(object):
             return False
 
         try:
-            self.socket = sqlite3.connect(self.database, 20)
+            self.socket = sqlite3.connect(
+                self.database, self.busy_timeout / 1000.0)
             self.logger.debug(
                 'Opened connection to SQLite Database: %s' % \
                 self.database,
@@ -246,8 +450,99 @@ class Database(object):
             ))
             return False
 
+        try:
+            # The journal mode is stored in the database itself; so this
+            # only has an effect the first time around
+            mode = self._retry(
+                self.socket.execute,
+                "PRAGMA journal_mode = %s" % self.journal_mode,
+            ).fetchone()[0]
+
+            if mode.upper() != self.journal_mode:
+                self.logger.debug(
+                    'SQLite Database (%s) journal mode %s unsupported; '
+                    'using %s.' % (self.database, self.journal_mode, mode))
+
+            # synchronous is specific to our connection
+            self.socket.execute("PRAGMA synchronous = %s" % self.synchronous)
+
+        except sqlite3.DatabaseError as e:
+            # Not fatal; we just carry on with SQLite's defaults
+            self.logger.debug(
+                'SQLite Database (%s) settings failure message: %s' % (
+                    self.database,
+                    str(e),
+            ))
+
         return True
 
+    def _retry(self, fn, *args, **kwargs):
+        """Calls fn() and returns it's result; should the database still be
+           locked (by another script) once our busy timeout has elapsed, the
+           call is retried up to self.retries times.  Each retry is delayed
+           by a random (exponential) backoff.
+
+           Anything fn() wrote is rolled back before it's retried; so fn()
+           must make all of it's changes again (not just the one that
+           failed).  Within a transaction() block we can't roll back what
+           was written before us, so the error is raised instead.
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+
+            except sqlite3.OperationalError as e:
+                if attempt >= self.retries or \
+                        classify_error(e) != ErrorType.LOCKED:
+                    raise
+
+                if self._transactions and \
+                        getattr(self.socket, 'in_transaction', True):
+                    raise
+
+                try:
+                    # Release anything our failed attempt was holding on to
+                    self.socket.rollback()
+                except sqlite3.Error:
+                    pass
+
+                attempt = self._backoff(attempt)
+
+    def _retry_commit(self):
+        """Commits our changes; a COMMIT that finds the database locked
+           (by another script still reading it) leaves our transaction
+           intact, so unlike _retry() nothing is rolled back and the COMMIT
+           alone is retried.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.socket.commit()
+
+            except sqlite3.OperationalError as e:
+                if attempt >= self.retries or \
+                        classify_error(e) != ErrorType.LOCKED:
+                    raise
+
+                attempt = self._backoff(attempt)
+
+    def _backoff(self, attempt):
+        """Sleeps for a random (exponential) backoff before the retry
+           following the attempt specified and returns the retry's attempt.
+        """
+        delay = uniform(0, min(
+            DATABASE_RETRY_DELAY * (2 ** attempt),
+            DATABASE_RETRY_MAX_DELAY))
+        attempt += 1
+        self.counters['retry'] += 1
+
+        self.logger.debug(
+            'Database locked; retry %d/%d in %.3fs.' % (
+                attempt, self.retries, delay))
+        sleep(delay)
+        return attempt
+
     def close(self):
         if self.socket is not None:
             try:
@@ -260,8 +555,131 @@ class Database(object):
                 'Closed connection to SQLite Database %s' % \
                 self.database,
             )
+
+            if any(self.counters.values()):
+                self.logger.debug(
+                    'SQLite Database %s recovery counters: %s' % (
+                        self.database,
+                        ', '.join('%s=%d' % (k, self.counters[k])
+                                  for k in sorted(self.counters)),
+                ))
         return
 
+    def _recover(self, method, e):
+        """Recovers from the (sqlite3) error raised by the method specified.
+
+           A locked database is left alone, an unwritable one is swapped for
+           an in-memory copy and the database is only reset if a quick_check
+           (or our schema) confirms it's damaged.
+
+           Returns True if we moved to memory (or reset the database) and
+           the method's (rolled back) changes should be made again.
+        """
+        error_type = classify_error(e)
+        self.counters[error_type] += 1
+
+        # We can't be sure what made it to the database
+        self._cache = None
+
+        if self._transactions and \
+                getattr(self.socket, 'in_transaction', True):
+            # What was written within our transaction() block is rolled
+            # back with us; so nothing more may be committed by it either
+            self._transaction_failed = True
+
+        try:
+            # Don't hold on to (the lock of) a failed transaction
+            self.socket.rollback()
+
+        except (AttributeError, sqlite3.Error):
+            pass
+
+        if error_type == ErrorType.LOCKED:
+            # Another script is holding on to the database
+            self.logger.warning(
+                "Database.%s() timed out; the database is locked." % method)
+            return False
+
+        self.logger.debug(
+            "Database.%s() Operational Error: %s" % (method, str(e)))
+
+        if error_type == ErrorType.UNWRITABLE:
+            if self.in_memory:
+                # There's nowhere left for us to go
+                return False
+
+            self._use_memory()
+            # What was written within a transaction() block before us can't
+            # be made again
+            return not self._transactions
+
+        if self.in_memory or not self._damaged():
+            # Nothing wrong with the database itself
+            return False
+
+        self.counters['reset'] += 1
+        if not self._reset():
+            self.logger.error(
+                "Detected damaged database; countermeasures failed.",
+            )
+            self.disabled = True
+            return False
+
+        self.logger.info(
+            "Detected damaged database; situation corrected.",
+        )
+        return not self._transactions
+
+    def _damaged(self):
+        """Returns True if the database is damaged (it fails a quick_check
+           or it's missing part of our schema).
+        """
+        try:
+            result = self._retry(
+                self.socket.execute, "PRAGMA quick_check").fetchall()
+
+        except sqlite3.DatabaseError as e:
+            # We can't confirm anything if we're locked out
+            return classify_error(e) != ErrorType.LOCKED
+
+        if [row[0] for row in result] != ['ok']:
+            self.logger.debug(
+                'SQLite Database (%s) quick_check failed: %s' % (
+                    self.database,
+                    ', '.join(str(row[0]) for row in result[:10]),
+            ))
+            return True
+
+        return not self._schema_okay()
+
+    def _use_memory(self):
+        """Moves to an in-memory copy of our database; used once we can no
+           longer write to it (the disk is full or it's read-only).  Nothing
+           written from here on is shared with other scripts.
+        """
+        if self.in_memory:
+            return
+
+        socket = sqlite3.connect(':memory:')
+        try:
+            # Keep what we've got (Python v3.7+)
+            self.socket.backup(socket)
+
+        except (AttributeError, sqlite3.Error):
+            pass
+
+        self.close()
+        self.socket = socket
+        self.in_memory = True
+
+        if not self._schema_okay():
+            self._build_schema()
+
+        self.logger.warning(
+            'SQLite Database %s is unwritable; continuing in memory.' % \
+            self.database,
+        )
+
     def execute(self, *args, **kwargs):
 
         if not self.socket:
@@ -269,7 +687,7 @@ class Database(object):
                 return None
 
         try:
-            result = self.socket.execute(*args, **kwargs)
+            result = self._retry(self.socket.execute, *args, **kwargs)
             self.logger.vdebug('DB Executing: %s' % str(args))
 
         except sqlite3.OperationalError as e:
@@ -291,6 +709,20 @@ class Database(object):
             if not self.connect():
                 return False
 
+        try:
+            # Hold on to the write lock while we work; other scripts starting
+            # up at the same time wait for us instead of building it too
+            self._retry(self.socket.execute, "BEGIN IMMEDIATE")
+
+        except sqlite3.OperationalError as e:
+            self.logger.debug('DB Schema Lock Error: %s' % str(e))
+            return False
+
+        if self._schema_okay():
+            # Another script beat us to it
+            self.socket.commit()
+            return True
+
         if not isinstance(start_version, int):
             start_version = self._get_version()
 
@@ -303,6 +735,8 @@ class Database(object):
                 "WHERE key = 'SCHEMA_VERSION'",
                 (str(version),),
             )
+
+        self.socket.commit()
         return True
 
     def _schema_okay(self):
@@ -376,14 +810,165 @@ class Database(object):
             "DELETE FROM keystore WHERE last_update <= ?",
             (purge_ref, ),
         )
+        self._cache = None
+
+        # Our NZB-File cache is aged the same way; we also only keep the
+        # most recently used entries
+        self.execute(
+            "DELETE FROM nzbcache WHERE last_access <= ?",
+            (purge_ref, ),
+        )
+
+        # File hashes are only kept for as long as everything else
+        self.execute(
+            "DELETE FROM hashcache WHERE last_update <= ?",
+            (purge_ref, ),
+        )
+
+        cache_size = NZBCACHE_SIZE
+        result = self.execute(
+            "SELECT value FROM lookup WHERE key = ?",
+            ('NZBCACHE_SIZE', ),
+        )
+        if result:
+            try:
+                cache_size = int(result.fetchall()[0][-1])
+            except:
+                pass
+
+        self.execute(
+            "DELETE FROM nzbcache WHERE path NOT IN (" + \
+            "SELECT path FROM nzbcache " + \
+            "ORDER BY last_access DESC LIMIT ?)",
+            (cache_size, ),
+        )
+        self.socket.commit()
+
         if vacuum:
             self.execute("VACUUM")
 
         return True
 
+    @contextmanager
+    def transaction(self):
+        """A with block within which all of the set(), set_many(), unset()
+           and unset_many() calls are written in a single transaction (with
+           a single commit) when the block is left.  Nothing is written if
+           an exception is raised within the block.  Transactions can be
+           nested; only the outermost one commits.
+
+           Should a write fail within the block, everything written before
+           it (within the block) is rolled back too and nothing written
+           after it is committed.  self.committed is set once the block is
+           left.
+        """
+        if not self._transactions:
+            self._transaction_failed = False
+            self.committed = None
+
+        self._transactions += 1
+        try:
+            yield self
+
+        except Exception:
+            self._transactions -= 1
+            if not self._transactions:
+                self._rollback()
+                self.committed = False
+            raise
+
+        self._transactions -= 1
+        if self._transactions:
+            return
+
+        if self._transaction_failed:
+            self._rollback()
+            self.committed = False
+            self.logger.warning(
+                'Database.transaction() failed; nothing was written.')
+            return
+
+        self.committed = self._commit('transaction')
+
+    def _rollback(self):
+        """Rolls back (and forgets) our uncommitted changes
+        """
+        self._transaction_failed = False
+        self._cache = None
+
+        if self.socket is not None:
+            try:
+                self.socket.rollback()
+
+            except sqlite3.Error:
+                pass
+
+    def _begin(self):
+        """Starts a write transaction (holding on to the write lock) unless
+           we're already in one
+        """
+        # Python v2 manages it's own transactions
+        if not getattr(self.socket, 'in_transaction', True):
+            self.socket.execute("BEGIN IMMEDIATE")
+
+    def _commit(self, method):
+        """Commits our changes unless we're within a transaction() block
+        """
+        if self._transactions or self.socket is None:
+            return True
+
+        try:
+            self._retry_commit()
+
+        except sqlite3.DatabaseError as e:
+            self._recover(method, e)
+            return False
+
+        return True
+
+    def _write(self, method, fn):
+        """Calls fn() to make our changes (on self.socket) in a single
+           write transaction and commits them (unless we're within a
+           transaction() block).  A locked database is retried as a whole;
+           our changes are made again before they're committed.  They're
+           also made again (once) should we recover from a failure by moving
+           to memory or by resetting a damaged database.
+
+           Returns True if our changes were written and False if they
+           weren't (nothing is left half written).
+        """
+        def _changes():
+            self._begin()
+            fn()
+
+        replayed = False
+        while True:
+            try:
+                self._retry(_changes)
+                if not self._transactions:
+                    self._retry_commit()
+
+                return True
+
+            except sqlite3.DatabaseError as e:
+                if not self._recover(method, e) or replayed:
+                    return False
+
+                replayed = True
+
     def unset(self, key, category=None):
         """Remove a key from the database
         """
+        # clean key
+        key = VALID_KEY_RE.sub('', key).upper()
+        if not key:
+            return False
+
+        return self.unset_many((key, ), category=category)
+
+    def unset_many(self, keys, category=None):
+        """Remove several keys from the database (in a single transaction)
+        """
         if not self.socket:
             if not self.connect():
                 return False
@@ -397,45 +982,44 @@ class Database(object):
             self.logger.error("Database category '%s' does not exist.")
             return False
 
-        # clean key
-        key = VALID_KEY_RE.sub('', key).upper()
-        if not key:
-            return False
+        # clean keys
+        keys = [VALID_KEY_RE.sub('', key).upper() for key in keys]
+        keys = [key for key in keys if key]
+        if not keys:
+            return True
 
-        try:
-            # First see if keystore already has a match
-            if(bool(len(self.socket.execute(
-                "SELECT value FROM keystore WHERE " + \
+        def _unset():
+            self.socket.executemany(
+                "DELETE FROM keystore WHERE " +\
                 "container = ? AND category = ? AND key = ?",
-                (self.container, category, key)).fetchall()))):
-                if not self.socket.execute(
-                    "DELETE FROM keystore WHERE " +\
-                    "container = ? AND category = ? AND key = ?",
-                    (self.container, category, key),):
-                    return False
-
-        except sqlite3.OperationalError as e:
-            # Database is corrupt or changed
-            self.logger.debug(
-                "Database.unset() Operational Error: %s" % str(e))
+                [(self.container, category, key) for key in keys],
+            )
 
-            if not self._reset():
-                self.logger.error(
-                    "Detected damaged database; countermeasures failed.",
-                )
-                self.disabled = True
+        if not self._write('unset', _unset):
+            return False
 
-            else:
-                self.logger.info(
-                    "Detected damaged database; situation corrected.",
-                )
+        if self._cache is not None:
+            cache = self._cache.setdefault(category, {})
+            for key in keys:
+                cache.pop(key, None)
 
         return True
 
-
     def set(self, key, value, category=None):
         """Set a key and a value into the database for retrieval later
         """
+        # clean key
+        key = VALID_KEY_RE.sub('', key).upper()
+        if not key:
+            return False
+
+        return self.set_many(((key, value), ), category=category)
+
+    def set_many(self, items, category=None):
+        """Set several keys and values into the database (in a single
+           transaction); items is a dictionary or a list of (key, value)
+           tuples.
+        """
         if not self.socket:
             if not self.connect():
                 return False
@@ -451,54 +1035,99 @@ class Database(object):
 
         now = datetime.now().strftime(SQLITE_DATE_FORMAT)
 
-        # clean key
-        key = VALID_KEY_RE.sub('', key).upper()
-        if not key:
-            return False
+        if isinstance(items, dict):
+            items = items.items()
 
-        # Get a cursor object
-        cursor = self.socket.cursor()
+        # clean keys
+        entries = []
+        for key, value in items:
+            key = VALID_KEY_RE.sub('', key).upper()
+            if key:
+                entries.append((self.container, category, key, value, now))
 
-        try:
-            # First see if keystore already has a match
-            if(bool(len(cursor.execute(
-                "SELECT value FROM keystore WHERE " + \
-                "container = ? AND category = ? AND key = ?",
-                (self.container, category, key)).fetchall()))):
-                if not cursor.execute(
-                    "UPDATE keystore SET value = ?, last_update = ?" + \
-                    " WHERE container = ? AND category = ? AND key = ?",
-                    (value, now, self.container, category, key),):
-                    return False
-            else:
-                if not cursor.execute(
+        if not entries:
+            return True
+
+        def _set():
+            # We hold on to the write lock for all of our writes so another
+            # script can't add the same key in between
+            if sqlite3.sqlite_version_info >= (3, 24, 0):
+                self.socket.executemany(
                     "INSERT INTO keystore " + \
                     "(container, category, key, value, last_update) " + \
-                    "VALUES (?, ?, ?, ?, ?)",
-                    (self.container, category, key, value, now),):
-                    return False
-            # commit changes
-            self.socket.commit()
+                    "VALUES (?, ?, ?, ?, ?) " + \
+                    "ON CONFLICT (container, category, key) DO UPDATE " + \
+                    "SET value = excluded.value, " + \
+                    "last_update = excluded.last_update",
+                    entries,
+                )
+                return
 
-        except sqlite3.OperationalError as e:
-            # Database is corrupt or changed
-            self.logger.debug(
-                "Database.set() Operational Error: %s" % str(e))
+            # UPSERT requires SQLite v3.24.0+
+            cursor = self.socket.cursor()
+            for container, category_, key, value, last_update in entries:
+                cursor.execute(
+                    "UPDATE keystore SET value = ?, last_update = ?" + \
+                    " WHERE container = ? AND category = ? AND key = ?",
+                    (value, last_update, container, category_, key),)
 
-            if not self._reset():
-                self.logger.error(
-                    "Detected damaged database; countermeasures failed.",
-                )
-                self.disabled = True
+                if not cursor.rowcount:
+                    cursor.execute(
+                        "INSERT INTO keystore " + \
+                        "(container, category, key, value, last_update) " + \
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (container, category_, key, value, last_update),)
 
-            else:
-                self.logger.info(
-                    "Detected damaged database; situation corrected.",
-                )
+        if not self._write('set', _set):
             return False
 
+        if self._cache is not None:
+            cache = self._cache.setdefault(category, {})
+            for _, _, key, value, _ in entries:
+                if value is None or isinstance(
+                        value, (six.string_types, six.binary_type)):
+                    cache[key] = value
+
+                elif isinstance(value, six.integer_types):
+                    # Stored as text (in our TEXT column); bool's included
+                    cache[key] = six.text_type(int(value))
+
+                else:
+                    # Anything else is converted SQLite's own way; we'll
+                    # read it back the next time we're asked
+                    self._cache = None
+                    break
+
         return True
 
+    def _preloaded(self, category):
+        """Returns the dictionary of the keys and values stored in our
+           container under the category specified if we're preloading it.
+           Everything in our container is read the first time around.
+
+           None is returned if we're not preloading (or we can't).
+        """
+        if not self.preload:
+            return None
+
+        if self._cache is None:
+            cache = {}
+            try:
+                for row in self._retry(
+                        self.socket.execute,
+                        "SELECT category, key, value FROM keystore " + \
+                        "WHERE container = ?",
+                        (self.container, )):
+                    cache.setdefault(row[0], {})[row[1]] = row[2]
+
+            except sqlite3.DatabaseError as e:
+                self._recover('preload', e)
+                return None
+
+            self._cache = cache
+
+        return self._cache.setdefault(category, {})
+
     def get(self, key, default=None, category=None):
         """Get a value after specifying a key
         """
@@ -519,8 +1148,13 @@ class Database(object):
         # clean key
         key = VALID_KEY_RE.sub('', key).upper()
 
+        cache = self._preloaded(category)
+        if cache is not None:
+            return cache[key] if key in cache else default
+
         try:
-            result = self.socket.execute(
+            result = self._retry(
+                self.socket.execute,
                 "SELECT value FROM keystore " + \
                 "WHERE container = ? AND category = ? AND key = ?",
                 (self.container, category, key),
@@ -531,21 +1165,8 @@ class Database(object):
                 except:
                     return default
 
-        except sqlite3.OperationalError as e:
-            # Database is corrupt or changed
-            self.logger.debug(
-                "Database.get() Operational Error: %s" % str(e))
-
-            if not self._reset():
-                self.logger.error(
-                    "Detected damaged database; countermeasures failed.",
-                )
-                self.disabled = True
-
-            else:
-                self.logger.info(
-                    "Detected damaged database; situation corrected.",
-                )
+        except sqlite3.DatabaseError as e:
+            self._recover('get', e)
 
         return default
 
@@ -568,6 +1189,10 @@ class Database(object):
             self.logger.error("Database category '%s' does not exist.")
             return items
 
+        cache = self._preloaded(category)
+        if cache is not None:
+            return list(cache.items())
+
         # Get a cursor object
         cursor = self.socket.cursor()
 
@@ -578,21 +1203,8 @@ class Database(object):
                 (self.container, category),
             )
 
-        except sqlite3.OperationalError as e:
-            # Database is corrupt or changed
-            self.logger.debug(
-                "Database.items() Operational Error: %s" % str(e))
-
-            if not self._reset():
-                self.logger.error(
-                    "Detected damaged database; countermeasures failed.",
-                )
-                self.disabled = True
-
-            else:
-                self.logger.info(
-                    "Detected damaged database; situation corrected.",
-                )
+        except sqlite3.DatabaseError as e:
+            self._recover('items', e)
 
             # early return of empty list
             return items
@@ -605,3 +1217,218 @@ class Database(object):
             items.append((row[0], row[1]))
 
         return items
+
+    def nzbcache_get(self, path, size, mtime, inode):
+        """Returns a tuple of (meta, summary) previously stored for the
+           NZB-File specified or None if we don't have one (or the NZB-File
+           has since changed).  summary is None if it was never stored.
+        """
+        if not self.socket:
+            if not self.connect():
+                return None
+
+        try:
+            row = self._retry(
+                self.socket.execute,
+                "SELECT meta, summary, last_access FROM nzbcache " + \
+                "WHERE path = ? AND size = ? AND mtime = ? AND inode = ?",
+                (path, size, mtime, inode),
+            ).fetchone()
+
+        except sqlite3.DatabaseError as e:
+            self._recover('nzbcache_get', e)
+            return None
+
+        if row is None:
+            return None
+
+        now = datetime.now()
+        if row[2] < (now - timedelta(seconds=NZBCACHE_TOUCH_AGE))\
+                .strftime(SQLITE_DATE_FORMAT):
+            # Track our usage (for prune()); but not every time we're
+            # accessed as this would turn each read into a write
+            self._write('nzbcache_get', lambda: self.socket.execute(
+                "UPDATE nzbcache SET last_access = ? WHERE path = ?",
+                (now.strftime(SQLITE_DATE_FORMAT), path),
+            ))
+
+        try:
+            return (
+                json.loads(row[0]) if row[0] else {},
+                json.loads(row[1]) if row[1] else None,
+            )
+
+        except ValueError as e:
+            # Our entry is corrupt
+            self.logger.debug(
+                "Database.nzbcache_get() Error: %s" % str(e))
+
+        return None
+
+    def nzbcache_set(self, path, size, mtime, inode, meta=None,
+                     summary=None):
+        """Stores the meta content (and optionally the summary) parsed from
+           the NZB-File specified.  Anything previously stored for the
+           NZB-File that isn't specified here is kept if the NZB-File has
+           not changed since.
+        """
+        if not self.socket:
+            if not self.connect():
+                return False
+
+        if meta is None or summary is None:
+            cached = self.nzbcache_get(path, size, mtime, inode)
+            if cached is not None:
+                if meta is None:
+                    meta = cached[0]
+
+                if summary is None:
+                    summary = cached[1]
+
+        now = datetime.now().strftime(SQLITE_DATE_FORMAT)
+
+        entry = (
+            path, size, mtime, inode,
+            json.dumps(meta) if meta is not None else None,
+            json.dumps(summary) if summary is not None else None,
+            now,
+        )
+
+        return self._write('nzbcache_set', lambda: self.socket.execute(
+            "INSERT OR REPLACE INTO nzbcache " + \
+            "(path, size, mtime, inode, meta, summary, last_access) " + \
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", entry,
+        ))
+
+    def nzbcache_unset(self, path):
+        """Removes anything stored for the NZB-File specified
+        """
+        if not self.socket:
+            if not self.connect():
+                return False
+
+        return self._write('nzbcache_unset', lambda: self.socket.execute(
+            "DELETE FROM nzbcache WHERE path = ?", (path, ),
+        ))
+
+    def snapshot_entries(self, root, parent, directories_only=False):
+        """Returns a dictionary of the entries recorded in our snapshot of
+           the directory tree (root) that were found in the directory
+           (parent) specified.  Each entry is keyed by it's path and set to
+           a tuple of (is_dir, inode, size, mtime).  Set directories_only to
+           True to leave out the files.
+
+           The entry of the root directory itself is recorded with a parent
+           of '' (an empty string).
+        """
+        if not self.socket:
+            if not self.connect():
+                return {}
+
+        query = "SELECT path, is_dir, inode, size, mtime " + \
+            "FROM snapshot WHERE container = ? AND root = ? AND parent = ?"
+        if directories_only:
+            query += " AND is_dir = 1"
+
+        try:
+            return dict(
+                (row[0], (bool(row[1]), row[2], row[3], row[4]))
+                for row in self._retry(
+                    self.socket.execute,
+                    query, (self.container or '', root, parent)).fetchall())
+
+        except sqlite3.DatabaseError as e:
+            self._recover('snapshot_entries', e)
+
+        return {}
+
+    def snapshot_update(self, root, entries=None, removed=None):
+        """Updates our snapshot of the directory tree (root) specified.
+
+           entries is a list of (path, parent, is_dir, inode, size, mtime)
+           tuples to record, removed is a list of the paths to remove
+           (removing a directory removes everything recorded beneath it).
+           All of the changes are applied in a single transaction.
+        """
+        if not self.socket:
+            if not self.connect():
+                return False
+
+        container = self.container or ''
+
+        def _update():
+            cursor = self.socket.cursor()
+            for path in (removed or []):
+                cursor.execute(
+                    "DELETE FROM snapshot WHERE " + \
+                    "container = ? AND root = ? AND " + \
+                    "(path = ? OR (path >= ? AND path < ?))",
+                    (container, root, path,
+                     # Everything beneath path
+                     path + sep, path + chr(ord(sep) + 1)),
+                )
+
+            if entries:
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO snapshot " + \
+                    "(container, root, path, parent, is_dir, inode, " + \
+                    "size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(container, root) + tuple(e) for e in entries],
+                )
+
+        return self._write('snapshot_update', _update)
+
+    def snapshot_unset(self, root):
+        """Removes our snapshot of the directory tree (root) specified
+        """
+        if not self.socket:
+            if not self.connect():
+                return False
+
+        return self._write('snapshot_unset', lambda: self.socket.execute(
+            "DELETE FROM snapshot WHERE container = ? AND root = ?",
+            (self.container or '', root),
+        ))
+
+    def hashcache_get(self, path, size, mtime, inode, algorithm):
+        """Returns the (hex) digest previously stored for the file specified
+           using the algorithm specified or None if we don't have one (or
+           the file has since changed).
+        """
+        if not self.socket:
+            if not self.connect():
+                return None
+
+        try:
+            row = self._retry(
+                self.socket.execute,
+                "SELECT digest FROM hashcache WHERE " + \
+                "path = ? AND algorithm = ? AND " + \
+                "size = ? AND mtime = ? AND inode = ?",
+                (path, algorithm, size, mtime, inode),
+            ).fetchone()
+
+            return row[0] if row is not None else None
+
+        except sqlite3.DatabaseError as e:
+            self._recover('hashcache_get', e)
+
+        return None
+
+    def hashcache_set(self, entries):
+        """Stores the hashes calculated for files; entries is a list of
+           (path, size, mtime, inode, algorithm, digest) tuples.  All of the
+           entries are written in a single transaction.
+        """
+        if not self.socket:
+            if not self.connect():
+                return False
+
+        now = datetime.now().strftime(SQLITE_DATE_FORMAT)
+        entries = [tuple(e) + (now, ) for e in entries]
+
+        return self._write('hashcache_set', lambda: self.socket.executemany(
+            "INSERT OR REPLACE INTO hashcache " + \
+            "(path, size, mtime, inode, algorithm, digest, " + \
+            "last_update) VALUES (?, ?, ?, ?, ?, ?, ?)", entries,
+        ))
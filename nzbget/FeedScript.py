@@ -148,6 +148,7 @@ from os import environ
 from .ScriptBase import ScriptBase
 from .ScriptBase import NZBGET_BOOL_FALSE
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .PostProcessScript import POSTPROC_ENVIRO_ID
 
 # Environment variable that prefixes all NZBGET options being passed into
@@ -186,9 +187,7 @@ class FeedScript(ScriptBase):
         filename = kwargs.get('filename')
 
         # Fetch/Load Feed Script Configuration
-        script_config = \
-            dict([(FEED_OPTS_RE.match(k).group(1), v.strip())
-                 for (k, v) in environ.items() if FEED_OPTS_RE.match(k)])
+        script_config = self.environ_options(FEED_ENVIRO_ID)
 
         if self.vvdebug:
             # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -281,6 +280,10 @@ class FeedScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature(
+        '%sFEEDID' % FEED_ENVIRO_ID,
+        excluded=('%sDIRECTORY' % POSTPROC_ENVIRO_ID, ),
+    )
     def feed_sanity_check(self, *args, **kargs):
         """Sanity checking to ensure this really is a post_process script
         """
@@ -0,0 +1,628 @@
+# -*- encoding: utf-8 -*-
+#
+# A light weight NZB-File parser used by the NZBGet scripts
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+NZB-Files are parsed incrementally (using iterparse()) so that we never hold
+more of the document in memory then we need to.
+
+The <head/> section (where all of the <meta/> entries live) is always found
+at the top of the NZB-File, so parse_nzb_head() stops reading the moment
+it's passed; this makes it's cost near constant regardless of how large the
+NZB-File is.
+"""
+import re
+import six
+from array import array
+from io import BytesIO
+
+# The NZB-File XML Namespace
+NZB_XML_NAMESPACE = u'{http://www.newzbin.com/DTD/2003/nzb}'
+
+# The tags we're interested in
+NZB_HEAD_TAG = u'%shead' % NZB_XML_NAMESPACE
+NZB_META_TAG = u'%smeta' % NZB_XML_NAMESPACE
+NZB_FILE_TAG = u'%sfile' % NZB_XML_NAMESPACE
+NZB_GROUPS_TAG = u'%sgroups' % NZB_XML_NAMESPACE
+NZB_GROUP_TAG = u'%sgroup' % NZB_XML_NAMESPACE
+NZB_SEGMENTS_TAG = u'%ssegments' % NZB_XML_NAMESPACE
+NZB_SEGMENT_TAG = u'%ssegment' % NZB_XML_NAMESPACE
+
+# The filename is usually quoted within the subject of each file
+NZB_SUBJECT_FILENAME_RE = re.compile(r'"(?P<filename>[^"]+)"')
+
+# Used to categorize the files found within an NZB-File
+NZB_PAR2_FILE_RE = re.compile(r'\.par2$', re.IGNORECASE)
+NZB_RAR_FILE_RE = re.compile(r'\.(rar|r[0-9]{2,3}|[0-9]{3})$', re.IGNORECASE)
+
+# Compressed NZB-Files are detected by the magic bytes they start with; the
+# decompressors themselves are only imported when they're needed
+NZB_COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', u'gzip'),
+    (b'BZh', u'bz2'),
+    (b'\xfd7zXZ\x00', u'xz'),
+)
+
+# The most bytes we need to look at to detect the compression used
+NZB_COMPRESSION_MAGIC_LEN = max([len(m) for m, _ in NZB_COMPRESSION_MAGIC])
+
+# The size of the compressed blocks we read at a time
+NZB_DECOMPRESS_CHUNK_SIZE = 65536
+
+# The number of characters at the start of a string we look at to decide
+# if it's the content of an NZB-File (or a path to one)
+NZB_CONTENT_PREFIX_LEN = 64
+
+# How NZB-File content (parsed from memory) is referred to in our logs
+NZB_CONTENT_LABEL = u'<memory>'
+
+# The largest segment number (or size) NZBFile can store in its arrays
+NZB_SEGMENT_MAX = 2 ** (array('L').itemsize * 8) - 1
+
+# The file types tracked by summarize_nzb()
+NZB_FILE_TYPES = (u'par2', u'rar', u'other')
+
+# NZB Processing Support if lxml is installed; the XML parser is not loaded
+# until it's first needed (see load_etree())
+LXML_TYPE = None
+etree = None
+XMLSyntaxError = Exception
+
+
+def load_etree():
+    """
+    Imports the best XML parser available to us the first time it's called
+    and returns it.  None is returned if no parser could be loaded.
+
+    Importing lxml (or one of it's fallbacks) is relatively expensive, so
+    we only want to pay for it if an NZB-File is actually parsed.
+    """
+    global etree
+    global XMLSyntaxError
+    global LXML_TYPE
+
+    if LXML_TYPE is not None:
+        # We've already been here
+        return etree
+
+    try:
+        from lxml import etree
+        from lxml.etree import XMLSyntaxError
+        LXML_TYPE = u'lxml.etree'
+    except ImportError:
+        try:
+            # Python 2.5
+            import xml.etree.cElementTree as etree
+            XMLSyntaxError = Exception
+            LXML_TYPE = u'xml.etree.cElementTree'
+        except ImportError:
+            try:
+                # Python 2.5
+                import xml.etree.ElementTree as etree
+                XMLSyntaxError = Exception
+                LXML_TYPE = u'xml.etree.ElementTree'
+            except ImportError:
+                try:
+                    # normal cElementTree install
+                    import cElementTree as etree
+                    XMLSyntaxError = Exception
+                    LXML_TYPE = u'cElementTree'
+                except ImportError:
+                    try:
+                        # normal ElementTree install
+                        import elementtree.ElementTree as etree
+                        XMLSyntaxError = Exception
+                        LXML_TYPE = u'elementtree.ElementTree'
+                    except ImportError:
+                        # No panic, we just can't use nzbfile parsing
+                        etree = None
+                        LXML_TYPE = False
+
+    return etree
+
+
+def compression_type(data):
+    """
+    Returns the compression (gzip, bz2 or xz) the data specified starts
+    with, or None if it doesn't appear to be compressed.
+    """
+    data = bytes(data[:NZB_COMPRESSION_MAGIC_LEN])
+    for magic, compression in NZB_COMPRESSION_MAGIC:
+        if data.startswith(magic):
+            return compression
+
+    return None
+
+
+def decompressor(compression):
+    """
+    Returns a new decompressor object for the compression specified.
+
+    ImportError is thrown if the compression isn't supported by our version
+    of Python (xz requires Python v3.3 or higher).
+    """
+    if compression == u'gzip':
+        import zlib
+        # Adding 16 to wbits expects (and skips) the gzip header
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    elif compression == u'bz2':
+        import bz2
+        return bz2.BZ2Decompressor()
+
+    elif compression == u'xz':
+        import lzma
+        return lzma.LZMADecompressor()
+
+    raise ImportError('Unsupported compression: %s' % compression)
+
+
+class DecompressedStream(object):
+    """
+    A read-only file-like object that decompresses the stream it wraps as
+    it's read from; nothing is ever written to disk.
+    """
+
+    def __init__(self, stream, compression, close=True,
+                 chunk_size=NZB_DECOMPRESS_CHUNK_SIZE):
+        """
+        If close is set to True, the stream we wrap is closed with us.
+        """
+        self.stream = stream
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self._close = close
+        self._decompressor = decompressor(compression)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def _fill(self, size):
+        """Decompresses data until we have size bytes buffered (or reach
+        the end of our stream)"""
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            data = self.stream.read(self.chunk_size)
+            if not data:
+                self._eof = True
+                flush = getattr(self._decompressor, 'flush', None)
+                if flush is not None:
+                    self._buffer.extend(flush())
+                break
+
+            while data:
+                if getattr(self._decompressor, 'eof', False):
+                    # The previous stream ended; anything that follows it
+                    # must be another (concatenated) stream
+                    if compression_type(data) != self.compression:
+                        # Trailing garbage is ignored
+                        self._eof = True
+                        break
+
+                    self._decompressor = decompressor(self.compression)
+
+                self._buffer.extend(self._decompressor.decompress(data))
+                data = self._decompressor.unused_data \
+                    if getattr(self._decompressor, 'eof', False) else b''
+
+    def read(self, size=-1):
+        """Returns up to size bytes of decompressed data"""
+        if size is None:
+            size = -1
+
+        self._fill(size)
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            del self._buffer[:]
+
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+
+        return data
+
+    def close(self):
+        if self._close and self.stream is not None:
+            self.stream.close()
+        self.stream = None
+
+
+def is_nzb_content(source):
+    """
+    Returns True if the source specified is the content of an NZB-File (as
+    opposed to the path to one or a file-like object).
+
+    bytes, bytearray and memoryview objects are always treated as content;
+    strings are treated as content if they start with an XML tag (or are
+    compressed).
+    """
+    if isinstance(source, (bytearray, memoryview)):
+        return True
+
+    # Only the start of the content is looked at (skipping any whitespace
+    # and byte order mark)
+    if isinstance(source, six.binary_type):
+        return source[:NZB_CONTENT_PREFIX_LEN].lstrip(
+            b' \t\r\n\xef\xbb\xbf')[:1] == b'<' or \
+            compression_type(source) is not None
+
+    if isinstance(source, six.text_type):
+        return source[:NZB_CONTENT_PREFIX_LEN].lstrip(
+            u' \t\r\n\ufeff')[:1] == u'<'
+
+    return False
+
+
+def is_nzb_path(source):
+    """
+    Returns True if the source specified is the path to an NZB-File.
+    """
+    return isinstance(source, six.string_types) and \
+        not is_nzb_content(source)
+
+
+def _peek(stream):
+    """
+    Returns the first few bytes of the stream specified without consuming
+    them; None is returned if we can't look ahead in the stream.
+    """
+    peek = getattr(stream, 'peek', None)
+    if peek is not None:
+        return peek(NZB_COMPRESSION_MAGIC_LEN)[:NZB_COMPRESSION_MAGIC_LEN]
+
+    try:
+        if not stream.seekable():
+            return None
+
+    except AttributeError:
+        # Python v2.x file objects
+        if not hasattr(stream, 'seek'):
+            return None
+
+    position = stream.tell()
+    data = stream.read(NZB_COMPRESSION_MAGIC_LEN)
+    stream.seek(position)
+    return data
+
+
+def open_nzb(source):
+    """
+    Returns a tuple of (stream, close) where stream is a file-like object
+    the XML parser can read from; close is set to True if we opened it (and
+    are therefore responsible for closing it).
+
+    The source can be the path to an NZB-File, a file-like object or the
+    content of an NZB-File itself (as bytes, str or a memoryview); content
+    is parsed directly from memory.
+
+    Compressed (gzip, bz2 and xz) NZB-Files are detected by their magic
+    bytes and decompressed as they're read.
+    """
+    if is_nzb_content(source):
+        if isinstance(source, six.text_type):
+            source = source.encode('utf-8')
+
+        stream, close = BytesIO(source), True
+
+    elif isinstance(source, six.string_types):
+        # A path to an NZB-File
+        stream, close = open(source, 'rb'), True
+
+    else:
+        # Presumed to be a file-like object
+        stream, close = source, False
+
+    try:
+        compression = compression_type(_peek(stream) or b'')
+        if compression is not None:
+            return DecompressedStream(stream, compression, close=close), True
+
+    except Exception:
+        if close:
+            stream.close()
+        raise
+
+    return stream, close
+
+
+def read_nzb(source):
+    """
+    Returns the (decompressed) content of the NZB-File specified as bytes.
+    The same sources supported by open_nzb() can be used here.
+    """
+    if isinstance(source, six.binary_type) and is_nzb_content(source) \
+            and compression_type(source) is None:
+        # Nothing to do
+        return source
+
+    stream, close = open_nzb(source)
+    try:
+        return stream.read()
+
+    finally:
+        if close:
+            stream.close()
+
+
+def parse_nzb_head(source, head_only=True):
+    """
+    Parses the <meta/> entries out of the <head/> of an NZB-File and returns
+    them as a dictionary (keyed by their upper case type).
+
+    If head_only is set to True (the default), the parser stops reading as
+    soon as the </head> (or the first <file>) is reached.  Otherwise the
+    entire NZB-File is parsed (and therefore verified).
+
+    ImportError is thrown if no XML parser is available, IOError if the
+    NZB-File can't be read and XMLSyntaxError (or one of it's ElementTree
+    equivalents) if it's corrupt.
+    """
+    if load_etree() is None:
+        raise ImportError('No XML parser is available')
+
+    results = {}
+    stream, close = open_nzb(source)
+    try:
+        for event, element in etree.iterparse(
+                stream, events=('start', 'end')):
+
+            if event == 'start':
+                if head_only and element.tag == NZB_FILE_TAG:
+                    # There are no <meta/> entries beyond this point
+                    break
+                continue
+
+            if element.tag == NZB_META_TAG:
+                if isinstance(element.text, six.string_types) and \
+                        element.text.strip():
+                    # Only store entries with content
+                    results[element.attrib['type'].upper()] = \
+                        element.text.strip()
+
+            elif element.tag == NZB_HEAD_TAG:
+                element.clear()
+                if head_only:
+                    # We're done
+                    break
+
+            elif element.tag == NZB_FILE_TAG:
+                # Keep our memory footprint low
+                element.clear()
+
+    finally:
+        if close:
+            stream.close()
+
+    return results
+
+
+class NZBSegment(object):
+    """A single segment (article) of a file found within an NZB-File"""
+    __slots__ = ('number', 'bytes', 'message_id')
+
+    def __init__(self, number, bytes, message_id):
+        self.number = number
+        self.bytes = bytes
+        self.message_id = message_id
+
+    def __eq__(self, other):
+        return isinstance(other, NZBSegment) and \
+            (self.number, self.bytes, self.message_id) == \
+            (other.number, other.bytes, other.message_id)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '<NZBSegment number=%d bytes=%d message_id=%s>' % (
+            self.number, self.bytes, self.message_id)
+
+
+class NZBFile(object):
+    """
+    A file entry found within an NZB-File.
+
+    Segment numbers and sizes are stored in arrays (instead of an object
+    per segment) to keep our memory footprint low; NZBSegment objects are
+    only created as you iterate over them.
+    """
+    __slots__ = (
+        'poster', 'date', 'subject', 'groups', 'bytes', 'segment_count',
+        '_numbers', '_sizes', '_message_ids',
+    )
+
+    def __init__(self, poster=None, date=None, subject=None,
+                 track_segments=True):
+        self.poster = poster
+        self.date = date
+        self.subject = subject
+        self.groups = []
+
+        # Totals (always tracked)
+        self.bytes = 0
+        self.segment_count = 0
+
+        if track_segments:
+            self._numbers = array('L')
+            self._sizes = array('L')
+            self._message_ids = []
+
+        else:
+            self._numbers = None
+            self._sizes = None
+            self._message_ids = None
+
+    def add_segment(self, number, size, message_id):
+        """Adds a segment to our file
+
+        A negative (or too large) number or size can't be stored in our
+        arrays; it's treated like a malformed one and recorded as 0.
+        """
+        if not 0 <= number <= NZB_SEGMENT_MAX:
+            number = 0
+
+        if not 0 <= size <= NZB_SEGMENT_MAX:
+            size = 0
+
+        self.bytes += size
+        self.segment_count += 1
+        if self._numbers is not None:
+            self._numbers.append(number)
+            self._sizes.append(size)
+            self._message_ids.append(message_id)
+
+    @property
+    def filename(self):
+        """The filename (as best we can tell) taken from the subject"""
+        if not self.subject:
+            return u''
+
+        result = NZB_SUBJECT_FILENAME_RE.search(self.subject)
+        return result.group('filename').strip() if result \
+            else self.subject.strip()
+
+    @property
+    def file_type(self):
+        """Returns one of 'par2', 'rar' or 'other'"""
+        filename = self.filename
+        if NZB_PAR2_FILE_RE.search(filename):
+            return u'par2'
+
+        if NZB_RAR_FILE_RE.search(filename):
+            return u'rar'
+
+        return u'other'
+
+    @property
+    def segments(self):
+        """Iterates over our segments"""
+        if self._numbers is None:
+            return iter(())
+
+        return (NZBSegment(*segment) for segment in
+                zip(self._numbers, self._sizes, self._message_ids))
+
+    def __len__(self):
+        return self.segment_count
+
+    def __repr__(self):
+        return '<NZBFile filename=%s segments=%d bytes=%d>' % (
+            self.filename, self.segment_count, self.bytes)
+
+
+def iter_nzb_files(source, segments=True):
+    """
+    A generator that parses an NZB-File and yields an NZBFile object for
+    each <file/> entry found within it.
+
+    The document is parsed incrementally and each element is released as
+    soon as we're done with it, so memory use is bounded by the size of
+    the largest <file/> entry (not the NZB-File itself).
+
+    If segments is set to False, only the segment totals of each file are
+    tracked (and not the segments themselves).
+
+    The same exceptions thrown by parse_nzb_head() apply here.
+    """
+    if load_etree() is None:
+        raise ImportError('No XML parser is available')
+
+    stream, close = open_nzb(source)
+    try:
+        # Our parent elements; we remove elements from them once we've
+        # processed them so the tree we build never grows
+        parents = []
+        nzbfile = None
+
+        for event, element in etree.iterparse(
+                stream, events=('start', 'end')):
+
+            if event == 'start':
+                if element.tag == NZB_FILE_TAG:
+                    attrib = element.attrib
+                    nzbfile = NZBFile(
+                        poster=attrib.get('poster'),
+                        date=attrib.get('date'),
+                        subject=attrib.get('subject'),
+                        track_segments=segments,
+                    )
+
+                parents.append(element)
+                continue
+
+            parents.pop()
+            if element.tag == NZB_SEGMENT_TAG:
+                if nzbfile is not None:
+                    try:
+                        number = int(element.attrib.get('number', 0))
+                        size = int(element.attrib.get('bytes', 0))
+
+                    except (TypeError, ValueError):
+                        number = size = 0
+
+                    nzbfile.add_segment(
+                        number, size, (element.text or u'').strip())
+
+            elif element.tag == NZB_GROUP_TAG:
+                if nzbfile is not None and element.text:
+                    nzbfile.groups.append(element.text.strip())
+
+            elif element.tag == NZB_FILE_TAG:
+                if nzbfile is not None:
+                    yield nzbfile
+                nzbfile = None
+
+            elif element.tag not in (NZB_SEGMENTS_TAG, NZB_GROUPS_TAG):
+                # Keep everything else (such as the <head/>) around
+                continue
+
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+    finally:
+        if close:
+            stream.close()
+
+
+def summarize_nzb(source):
+    """
+    Returns a summary of the contents of an NZB-File as a dictionary:
+
+        {
+            'files': 3,
+            'segments': 130,
+            'bytes': 99840000,
+            'par2': {'files': 1, 'segments': 2, 'bytes': 1536000},
+            'rar': {'files': 2, 'segments': 128, 'bytes': 98304000},
+            'other': {'files': 0, 'segments': 0, 'bytes': 0},
+        }
+
+    The individual segments are never stored, so this can be used on
+    NZB-Files of any size.
+    """
+    results = {
+        'files': 0,
+        'segments': 0,
+        'bytes': 0,
+    }
+    for file_type in NZB_FILE_TYPES:
+        results[file_type] = {'files': 0, 'segments': 0, 'bytes': 0}
+
+    for nzbfile in iter_nzb_files(source, segments=False):
+        for entry in (results, results[nzbfile.file_type]):
+            entry['files'] += 1
+            entry['segments'] += nzbfile.segment_count
+            entry['bytes'] += nzbfile.bytes
+
+    return results
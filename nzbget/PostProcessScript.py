@@ -163,6 +163,7 @@ from socket import error as SocketError
 from .ScriptBase import ScriptBase
 from .ScriptBase import Health
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .ScriptBase import NZBGET_BOOL_FALSE
 from .Utils import os_path_split as split
 
@@ -233,9 +234,7 @@ class PostProcessScript(ScriptBase):
         unpackstatus = kwargs.get('unpackstatus')
 
         # Fetch/Load Post Process Script Configuration
-        script_config = \
-            dict([(POSTPROC_OPTS_RE.match(k).group(1), v.strip())
-                 for (k, v) in environ.items() if POSTPROC_OPTS_RE.match(k)])
+        script_config = self.environ_options(POSTPROC_ENVIRO_ID)
 
         if self.vvdebug:
             # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -375,9 +374,11 @@ class PostProcessScript(ScriptBase):
             if parse_nzbfile:
                 # Initialize information fetched from NZB-File
                 # We intentionally allow existing nzbheaders to over-ride
-                # any found in the nzbfile
-                self.nzbheaders = \
-                    self.parse_nzbfile(self.nzbfilename, check_queued=True)
+                # any found in the nzbfile; our cache is used if we're
+                # about to use the database anyway
+                self.nzbheaders = self.parse_nzbfile(
+                    self.nzbfilename, check_queued=True,
+                    use_cache=use_database or None)
                 self.nzbheaders.update(self.pull_dnzb())
 
         if self.directory:
@@ -486,6 +487,7 @@ class PostProcessScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature('%sDIRECTORY' % POSTPROC_ENVIRO_ID)
     def postprocess_sanity_check(self, *args, **kwargs):
         """Sanity checking to ensure this really is a Post-Process Script
         """
@@ -561,10 +563,17 @@ class PostProcessScript(ScriptBase):
            the only difference is the search_dir automatically uses the
            defined download `directory` as a default (if not specified).
         """
+        return dict(self.postprocess_iter_files(search_dir, *args, **kwargs))
+
+    def postprocess_iter_files(self, search_dir=None, *args, **kwargs):
+        """a wrapper to the iter_files() function defined in the inherited
+           class the only difference is the search_dir automatically uses
+           the defined download `directory` as a default (if not specified).
+        """
         if search_dir is None:
             search_dir = self.directory
 
-        return super(PostProcessScript, self)._get_files(
+        return super(PostProcessScript, self)._iter_files(
             search_dir=search_dir, *args, **kwargs)
 
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -157,6 +157,7 @@ from os.path import abspath
 # Relative Includes
 from .ScriptBase import ScriptBase
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .ScriptBase import PRIORITY
 from .ScriptBase import PRIORITIES
 from .ScriptBase import NZBGET_BOOL_FALSE
@@ -226,8 +227,7 @@ class QueueScript(ScriptBase):
         event = kwargs.get('event')
 
         # Fetch/Load Queue Script Configuration
-        script_config = dict([(QUEUE_OPTS_RE.match(k).group(1), v.strip()) \
-               for (k, v) in environ.items() if QUEUE_OPTS_RE.match(k)])
+        script_config = self.environ_options(QUEUE_ENVIRO_ID)
 
         if self.vvdebug:
             # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -434,6 +434,10 @@ class QueueScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature(
+        '%sDIRECTORY' % QUEUE_ENVIRO_ID,
+        excluded=('%sDIRECTORY' % POSTPROC_ENVIRO_ID, ),
+    )
     def queue_sanity_check(self, *args, **kargs):
         """Sanity checking to ensure this really is a post_process script
         """
@@ -476,16 +480,31 @@ class QueueScript(ScriptBase):
            the only difference is the search_dir automatically uses the
            defined download `directory` as a default (if not specified).
         """
+        return dict(self.queue_iter_files(
+            search_dir=search_dir,
+            regex_filter=regex_filter,
+            prefix_filter=prefix_filter,
+            suffix_filter=suffix_filter,
+            fullstats=fullstats,
+            *args, **kargs))
+
+    def queue_iter_files(self, search_dir=None, regex_filter=None,
+                         prefix_filter=None, suffix_filter=None,
+                         fullstats=False, *args, **kargs):
+        """a wrapper to the iter_files() function defined in the inherited
+           class the only difference is the search_dir automatically uses
+           the defined download `directory` as a default (if not specified).
+        """
         if search_dir is None:
             search_dir = self.directory
 
-        return super(QueueScript, self)._get_files(
+        return super(QueueScript, self)._iter_files(
             search_dir=search_dir,
             regex_filter=regex_filter,
             prefix_filter=prefix_filter,
             suffix_filter=suffix_filter,
             fullstats=fullstats,
-        )
+            *args, **kargs)
 
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Set/Control Functions (also passes data back to NZBGet)
@@ -86,23 +86,19 @@ if __name__ == "__main__":
 
 import re
 from os import chdir
-from os import unlink
 from os import environ
 from os.path import isdir
-from os.path import isfile
 from os.path import join
 from os.path import splitext
 from os.path import basename
 from os.path import abspath
 
-# NZB-File Compression Handling
-import gzip
-from tempfile import mkstemp
 
 # Relative Includes
 from .ScriptBase import ScriptBase
 from .ScriptBase import SAB_ENVIRO_ID
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .ScriptBase import NZBGET_BOOL_FALSE
 from .PostProcessCommon import OBFUSCATED_PATH_RE
 from .PostProcessCommon import OBFUSCATED_FILE_RE
@@ -155,9 +151,6 @@ class SABPostProcessScript(ScriptBase):
             self.script_dict = {}
         self.script_dict[SCRIPT_MODE.SABNZBD_POSTPROCESSING] = self
 
-        # Used to track a temporary NZB-File if we need one.
-        self._sab_temp_nzb = None
-
         # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
         # Initialize Parent
         # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -236,8 +229,6 @@ class SABPostProcessScript(ScriptBase):
         else:
             self.nzbfilename = nzbfilename
 
-        self.nzbfilename = self.handle_nzbfile(self.nzbfilename)
-
         # self.category
         # Category assigned to nzb-file (can be empty string).
         if category is None:
@@ -278,10 +269,12 @@ class SABPostProcessScript(ScriptBase):
             if parse_nzbfile:
                 # Initialize information fetched from NZB-File
                 # We intentionally allow existing nzbheaders to over-ride
-                # any found in the nzbfile
+                # any found in the nzbfile; our cache is used if we're
+                # about to use the database anyway
                 self.nzbheaders = dict(
                     self.parse_nzbfile(
-                        self.nzbfilename, check_queued=True)\
+                        self.nzbfilename, check_queued=True,
+                        use_cache=use_database or None)\
                 )
 
         if self.directory:
@@ -352,6 +345,7 @@ class SABPostProcessScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature('%sCOMPLETE_DIR' % SAB_ENVIRO_ID)
     def sabnzbd_postprocess_sanity_check(self, *args, **kwargs):
         """Sanity checking to ensure this really is a SAB Post-Process Script
         """
@@ -413,10 +407,18 @@ class SABPostProcessScript(ScriptBase):
            the only difference is the search_dir automatically uses the
            defined download `directory` as a default (if not specified).
         """
+        return dict(self.sabnzbd_postprocess_iter_files(
+            search_dir, *args, **kwargs))
+
+    def sabnzbd_postprocess_iter_files(self, search_dir=None, *args, **kwargs):
+        """a wrapper to the iter_files() function defined in the inherited
+           class the only difference is the search_dir automatically uses
+           the defined download `directory` as a default (if not specified).
+        """
         if search_dir is None:
             search_dir = self.directory
 
-        return super(SABPostProcessScript, self)._get_files(
+        return super(SABPostProcessScript, self)._iter_files(
             search_dir=search_dir, *args, **kwargs)
 
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -582,79 +584,15 @@ class SABPostProcessScript(ScriptBase):
 
     def handle_nzbfile(self, nzbfile):
         """
-        Takes an nzbfile and if it's compressed it creates a temporary
-        uncompressed version we can reference. The function returns
-        an uncompressed NZB-File if it can (obviously depends on what was
-        passed in.
+        Kept for backwards compatibility; compressed NZB-Files are now
+        decompressed as they're parsed, so no temporary (uncompressed)
+        copy is needed and the nzbfile is returned as is.
         """
-
-        if not nzbfile:
-            # Nothing we can do
-            return ''
-
-        # Handle .gz compressed NZB-Files and update our pointer accordingly
-        if not isfile(nzbfile):
-            # Nothing we can do; return what we started with
-            return nzbfile
-
-        # Extract our filename
-        result = re.match('^(?P<filename>.+\.nzb)\.gz$', nzbfile, re.I)
-        if not result:
-            # We're done; that was easy
-            return nzbfile
-
-        # Extract our file into a temporary directory
-        fo, self._sab_temp_nzb = mkstemp(dir=self.tempdir, suffix='.nzb')
-
-        # Our file descriptors
-        fi = None
-        try:
-            fi = gzip.open(nzbfile, "rb")
-
-        except Exception:
-            # Can't open the file
-            return nzbfile
-
-        try:
-            fo = open(self._sab_temp_nzb, 'wb')
-        except Exception:
-            # Can't open the file
-            return nzbfile
-
-        try:
-            while 1:
-                buf = fi.read(16384)
-                if not buf:
-                    # We're Done
-                    break
-                fo.write(buf)
-
-        except Exception:
-            # oh well..
-            unlink(self._sab_temp_nzb)
-            self._sab_temp_nzb = None
-
-        try:
-            fo.close()
-        except Exception:
-            pass
-
-        try:
-            fi.close()
-        except Exception:
-            pass
-
-        return self._sab_temp_nzb
+        return nzbfile
 
     def sabnzbd_postprocess_close(self):
         """
-        Allow the graceful handling of our temporary NZB-File
+        Kept for backwards compatibility; there is no longer a temporary
+        NZB-File for us to clean up.
         """
-        if self._sab_temp_nzb and isfile(self._sab_temp_nzb):
-            try:
-                # Cleanup
-                unlink(self._sab_temp_nzb)
-                self._sab_temp_nzb = None
-            except:
-                # we tried...
-                pass
+        return
@@ -157,6 +157,7 @@ from os.path import abspath
 # Relative Includes
 from .ScriptBase import ScriptBase
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .ScriptBase import NZBGET_BOOL_FALSE
 from .ScriptBase import PRIORITY
 from .ScriptBase import PRIORITIES
@@ -199,8 +200,7 @@ class ScanScript(ScriptBase):
         use_database = kwargs.get('use_database')
 
         # Fetch/Load Scan Script Configuration
-        script_config = dict([(SCAN_OPTS_RE.match(k).group(1), v.strip()) \
-               for (k, v) in environ.items() if SCAN_OPTS_RE.match(k)])
+        script_config = self.environ_options(SCAN_ENVIRO_ID)
 
         if self.vvdebug:
             # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -288,10 +288,12 @@ class ScanScript(ScriptBase):
             if parse_nzbfile:
                 # Initialize information fetched from NZB-File
                 # We intentionally allow existing nzbheaders to over-ride
-                # any found in the nzbfile
+                # any found in the nzbfile; our cache is used if we're
+                # about to use the database anyway
                 self.nzbheaders = dict(
                     self.parse_nzbfile(
-                        self.filename, check_queued=True)\
+                        self.filename, check_queued=True,
+                        use_cache=use_database or None)\
                         .items() + self.pull_dnzb().items(),
                 )
 
@@ -391,6 +393,10 @@ class ScanScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature(
+        '%sDIRECTORY' % SCAN_ENVIRO_ID,
+        excluded=('%sDIRECTORY' % POSTPROC_ENVIRO_ID, ),
+    )
     def scan_sanity_check(self, *args, **kargs):
         """Sanity checking to ensure this really is a post_process script
         """
@@ -419,11 +425,31 @@ class ScanScript(ScriptBase):
            the only difference is the search_dir automatically uses the
            defined download `directory` as a default (if not specified).
         """
+        return dict(self.scan_iter_files(
+            search_dir=search_dir,
+            regex_filter=regex_filter,
+            prefix_filter=prefix_filter,
+            suffix_filter=suffix_filter,
+            fullstats=fullstats,
+            *args, **kargs))
+
+    def scan_iter_files(self, search_dir=None, regex_filter=None,
+                        prefix_filter=None, suffix_filter=None,
+                        fullstats=False, *args, **kargs):
+        """a wrapper to the iter_files() function defined in the inherited
+           class the only difference is the search_dir automatically uses
+           the defined download `directory` as a default (if not specified).
+        """
         if search_dir is None:
             search_dir = self.directory
 
-        return super(ScanScript, self)._get_files(
-            search_dir=search_dir, *args, **kargs)
+        return super(ScanScript, self)._iter_files(
+            search_dir=search_dir,
+            regex_filter=regex_filter,
+            prefix_filter=prefix_filter,
+            suffix_filter=suffix_filter,
+            fullstats=fullstats,
+            *args, **kargs)
 
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Set/Control Functions (also passes data back to NZBGet)
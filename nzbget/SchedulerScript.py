@@ -148,6 +148,7 @@ from os import environ
 from .ScriptBase import ScriptBase
 from .ScriptBase import NZBGET_BOOL_FALSE
 from .ScriptBase import SCRIPT_MODE
+from .ScriptBase import mode_signature
 from .PostProcessScript import POSTPROC_ENVIRO_ID
 
 # Environment variable that prefixes all NZBGET options being passed into
@@ -180,8 +181,7 @@ class SchedulerScript(ScriptBase):
         taskid = kwargs.get('taskid')
 
         # Fetch/Load Scan Script Configuration
-        script_config = dict([(SCHEDULER_OPTS_RE.match(k).group(1), v.strip()) \
-               for (k, v) in environ.items() if SCHEDULER_OPTS_RE.match(k)])
+        script_config = self.environ_options(SCHEDULER_ENVIRO_ID)
 
         if self.vvdebug:
             # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
@@ -260,6 +260,10 @@ class SchedulerScript(ScriptBase):
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
     # Sanity
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @mode_signature(
+        '%sTASKID' % SCHEDULER_ENVIRO_ID,
+        excluded=('%sDIRECTORY' % POSTPROC_ENVIRO_ID, ),
+    )
     def scheduler_sanity_check(self, *args, **kargs):
         """Sanity checking to ensure this really is a post_process script
         """
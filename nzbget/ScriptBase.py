@@ -133,8 +133,11 @@ Additionally all exception handling is wrapped to make debugging easier.
 
 import re
 import six
+import heapq
+import atexit
+import weakref
+from time import time
 from tempfile import gettempdir
-from tempfile import mkstemp
 from platform import system as p_system
 from platform import python_version as p_version
 from platform import release as p_release
@@ -151,7 +154,6 @@ from os import X_OK
 from os import kill
 from os import getpid
 from os.path import isdir
-from os.path import islink
 from os.path import isfile
 from os.path import join
 from os.path import dirname
@@ -162,8 +164,8 @@ from os.path import splitext
 from getpass import getuser
 from logging import Logger
 from datetime import datetime
+from contextlib import contextmanager
 from .Utils import tidy_path
-import ssl
 
 import traceback
 from sys import exc_info
@@ -178,6 +180,20 @@ from .Logger import destroy_logger
 from .Utils import ESCAPED_WIN_PATH_SEPARATOR
 from .Utils import ESCAPED_NUX_PATH_SEPARATOR
 from .Utils import unescape_xml
+from .Utils import scandir
+from .Utils import ThreadPool
+from .Utils import file_hash
+from .Utils import hash_object
+
+from .NZBParser import load_etree
+from .NZBParser import parse_nzb_head
+from .NZBParser import iter_nzb_files
+from .NZBParser import summarize_nzb
+from .NZBParser import is_nzb_path
+from .NZBParser import is_nzb_content
+from .NZBParser import read_nzb
+from .NZBParser import compression_type
+from .NZBParser import NZB_CONTENT_LABEL
 
 import signal
 
@@ -186,10 +202,20 @@ from stat import ST_ATIME
 from stat import ST_CTIME
 from stat import ST_MTIME
 from stat import ST_SIZE
+from stat import S_ISREG
+from stat import S_ISDIR
 
 from os import stat
 from base64 import standard_b64encode
 
+try:
+    # Python v3.3+
+    from collections.abc import MutableMapping
+
+except ImportError:
+    # Python v2.x
+    from collections import MutableMapping
+
 try:
     # Python v2.7 -> v3.6
     re_pattern_type = re._pattern_type
@@ -201,70 +227,6 @@ except AttributeError:
 # Initialize the default character set to use
 DEFAULT_CHARSET = u'utf-8'
 
-# NZB Processing Support if lxml is installed
-LXML_TYPE = None
-try:
-    from lxml import etree
-    from lxml.etree import XMLSyntaxError
-    LXML_TYPE = u'lxml.etree'
-except ImportError:
-    try:
-        # Python 2.5
-        import xml.etree.cElementTree as etree
-        XMLSyntaxError = Exception
-        LXML_TYPE = u'xml.etree.cElementTree'
-    except ImportError:
-        try:
-            # Python 2.5
-            import xml.etree.ElementTree as etree
-            XMLSyntaxError = Exception
-            LXML_TYPE = u'xml.etree.ElementTree'
-        except ImportError:
-            try:
-                # normal cElementTree install
-                import cElementTree as etree
-                XMLSyntaxError = Exception
-                LXML_TYPE = u'cElementTree'
-            except ImportError:
-                try:
-                    # normal ElementTree install
-                    import elementtree.ElementTree as etree
-                    XMLSyntaxError = Exception
-                    LXML_TYPE = u'elementtree.ElementTree'
-                except ImportError:
-                    # No panic, we just can't use nzbfile parsing
-                    pass
-
-# Database Support if sqllite is installed
-try:
-    from .Database import Database
-    from .Database import Category
-except ImportError:
-    # No panic, we just can't use database
-    pass
-
-try:
-    # Python 2.7
-    from urllib import unquote
-    from urllib import quote
-    from urlparse import parse_qsl
-    from urlparse import urlparse
-
-except ImportError:
-    # Python 3.x
-    from urllib.parse import unquote
-    from urllib.parse import quote
-    from urllib.parse import parse_qsl
-    from urllib.parse import urlparse
-
-try:
-    # Python 2
-    from xmlrpclib import ServerProxy
-    from xmlrpclib import SafeTransport
-except ImportError:
-    # Python 3
-    from xmlrpc.client import ServerProxy
-
 # Some booleans that are read to and from nzbget
 NZBGET_BOOL_TRUE = u'yes'
 NZBGET_BOOL_FALSE = u'no'
@@ -747,6 +709,14 @@ DNZB_OPTS_RE = re.compile(r'^{}{}([A-Z0-9_]+)$'.format(
     SHR_ENVIRO_DNZB_ID,
 ))
 
+# Used by index_environ() to break an environment variable into its prefix
+# (everything up to and including the first underscore) and the remaining
+# name; the name portion is matched identically to the *_OPTS_RE above.
+ENVIRO_KEY_RE = re.compile(r'^([A-Z0-9]+_)([A-Z0-9_]+)$')
+
+# The key index_environ() stores the DNZB variables under
+DNZB_ENVIRO_ID = u'{}{}'.format(SHR_ENVIRO_ID, SHR_ENVIRO_DNZB_ID)
+
 # Precompile Guess Fetching
 SHR_GUESS_OPTS_RE = re.compile(r'^{}([A-Z0-9_]+)$'.format(SHR_ENVIRO_GUESS_ID))
 
@@ -785,12 +755,415 @@ PATH_DELIMITERS = r'([%s]+[%s;\|,\s]+|[;\|,\s%s]+[%s]+)' % (
 # SQLite Database
 NZBGET_DATABASE_FILENAME = "nzbget/nzbget.db"
 
+# In write-behind mode, the number of database writes we queue (and the age
+# in seconds of the oldest one) before they're flushed; see flush_writes()
+WRITE_BEHIND_SIZE = 100
+WRITE_BEHIND_AGE = 10.0
+
 # URL Indexing Table for returns via parse_url()
 VALID_URL_RE = re.compile(r'^[\s]*([^:\s]+):[/\\]*([^?]+)(\?(.+))?[\s]*$')
 VALID_HOST_RE = re.compile(r'^[\s]*([^:/\s]+)')
 VALID_QUERY_RE = re.compile(r'^(.*[/\\])([^/\\]*)$')
 
 
+def mode_signature(required, excluded=(), verify=False):
+    """
+    A decorator for the *_sanity_check() functions that identifies the
+    environment variable that must be present (and the ones that must not be)
+    for the sanity check to pass.
+
+    detect_mode() uses these to identify the script mode from a signature of
+    the environment (which of these variables are present) without having to
+    call each of the sanity checks in turn.
+
+    If verify is set to True, then the sanity check is still called once the
+    signature matches (for checks that need to do more than look for the
+    variable).
+    """
+    def decorator(fn):
+        fn.mode_signature = (required, tuple(excluded), verify)
+        return fn
+
+    return decorator
+
+
+# Caches the results of detect_mode() lookups
+MODE_DETECTION_CACHE = {}
+
+
+# NZBGet renames the NZB-Files it picks up; the original NZB-File name is
+# what remains after the (optional) counter and suffix are removed:
+#   .queued, .processed, .nzb_processed and .error
+#   and .2.queued, .3.processed, etc
+NZB_VARIANT_RE = re.compile(
+    r'^(?P<name>.+?)(\.[0-9]+)?'
+    r'\.(queued|processed|nzb_processed|error)$',
+)
+
+# Caches the NZB-File variants found in each directory scanned by
+# nzb_variants(); keyed by directory
+NZB_VARIANT_INDEX = {}
+
+
+def nzb_variants(path, name):
+    """
+    Returns a list of all of the files (full paths) found in the directory
+    specified that are the NZB-File name specified or one of it's renamed
+    variants (such as name.queued, name.2.processed, etc).
+
+    The directory is only listed the first time it's referenced (or after
+    it has since changed); lookups otherwise cost a single stat() of the
+    directory.
+    """
+    path = abspath(path)
+    try:
+        mtime = stat(path).st_mtime
+
+    except OSError:
+        # Directory is missing or can not be accessed
+        NZB_VARIANT_INDEX.pop(path, None)
+        return []
+
+    cached = NZB_VARIANT_INDEX.get(path)
+    if cached is None or cached[0] != mtime:
+        index = {}
+        try:
+            for filename in listdir(path):
+                result = NZB_VARIANT_RE.match(filename)
+                base = result.group('name') if result else filename
+                try:
+                    index[base].append(filename)
+
+                except KeyError:
+                    # First entry
+                    index[base] = [filename]
+
+        except OSError:
+            # We can't read the directory
+            return []
+
+        cached = NZB_VARIANT_INDEX[path] = (mtime, index)
+
+    return [join(path, filename) for filename in cached[1].get(name, [])]
+
+
+# Regular expressions using back-references can't be safely merged with
+# others (as their group numbers would change)
+REGEX_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class FileFilter(object):
+    """
+    The regex, prefix and suffix filters applied to each file found by
+    get_files(); they're prepared once so that matching a filename is a
+    single call to match().
+
+    All of the regular expressions sharing the same flags are merged into
+    one alternation; prefixes and suffixes are checked with a single
+    startswith() and endswith() call.  If ignore_case is set, the prefixes
+    and suffixes are compared without regards to their case.
+    """
+    __slots__ = ('_search', '_prefixes', '_suffixes', '_ignore_case',
+                 '_count')
+
+    def __init__(self, regex_filter=None, prefix_filter=None,
+                 suffix_filter=None, ignore_case=False):
+
+        regex_filter = regex_filter or ()
+        self._prefixes = tuple(prefix_filter or ())
+        self._suffixes = tuple(suffix_filter or ())
+        self._ignore_case = ignore_case and \
+            bool(self._prefixes or self._suffixes)
+        if self._ignore_case:
+            self._prefixes = tuple(p.lower() for p in self._prefixes)
+            self._suffixes = tuple(s.lower() for s in self._suffixes)
+
+        self._count = \
+            len(regex_filter) + len(self._prefixes) + len(self._suffixes)
+
+        # Group our (compiled) regular expressions by their flags
+        groups = {}
+        for regex in regex_filter:
+            key = (type(regex.pattern), regex.flags)
+            groups.setdefault(key, []).append(regex)
+
+        patterns = []
+        for (_, flags), _patterns in groups.items():
+            if len(_patterns) > 1 and all(
+                    isinstance(r.pattern, six.string_types) and
+                    not REGEX_BACKREFERENCE_RE.search(r.pattern)
+                    for r in _patterns):
+                try:
+                    patterns.append(re.compile('|'.join(
+                        ['(?:%s)' % r.pattern for r in _patterns]), flags))
+                    continue
+
+                except re.error:
+                    # Our patterns can't be merged (for example they define
+                    # the same named group); we use them as they are
+                    pass
+
+            patterns.extend(_patterns)
+
+        if not patterns:
+            self._search = None
+
+        elif len(patterns) == 1:
+            self._search = patterns[0].search
+
+        else:
+            self._search = \
+                lambda name: any(r.search(name) for r in patterns)
+
+    def match(self, name):
+        """
+        Returns True if the filename specified passes our filters
+        """
+        if self._search is not None and not self._search(name):
+            return False
+
+        if self._ignore_case:
+            name = name.lower()
+
+        if self._prefixes and not name.startswith(self._prefixes):
+            return False
+
+        if self._suffixes and not name.endswith(self._suffixes):
+            return False
+
+        return True
+
+    def __len__(self):
+        """
+        Returns the number of filters defined
+        """
+        return self._count
+
+
+# Caches the FileFilter objects prepared by get_files() so they can be
+# reused when it's called with the same filters
+FILE_FILTER_CACHE = {}
+
+# The maximum number of FileFilter objects to cache
+FILE_FILTER_CACHE_SIZE = 100
+
+
+def _filter_key(value):
+    """
+    Returns a (hashable) representation of the filter specified that can be
+    used to look up it's FileFilter in the FILE_FILTER_CACHE.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_filter_key(v) for v in value)
+    return value
+
+
+# The datetime used when a file's timestamp can't be represented as one
+INVALID_FILE_DATETIME = datetime(1980, 1, 1, 0, 0, 0, 0)
+
+
+def file_datetime(timestamp):
+    """
+    Returns the datetime object of the (stat()) timestamp specified
+    """
+    try:
+        return datetime.fromtimestamp(timestamp)
+
+    except (ValueError, OverflowError, OSError):
+        return INVALID_FILE_DATETIME
+
+
+class FileRecord(MutableMapping):
+    """
+    The details of a file found by get_files(); it behaves just like the
+    dictionary get_files() has always returned for each file:
+
+        {
+            'basename': 'file.mkv',
+            'dirname': '/full/path/to',
+            'filename': 'file',
+            'extension': '.mkv',
+
+            # only present if the file was stat()'ed (fullstats):
+            'filesize': 10000,
+            'accessed': datetime(),
+            'created': datetime(),
+            'modified': datetime(),
+        }
+
+    Only the basename, dirname and raw stat() values are kept; everything
+    else (such as the datetime objects) is only created when it's asked
+    for.  The record is converted to a
+    regular dictionary internally the first time it's modified.
+    """
+    __slots__ = ('basename', 'dirname', 'size', 'atime', 'ctime', 'mtime',
+                 '_dict')
+
+    # The keys every record has
+    KEYS = ('basename', 'dirname', 'extension', 'filename')
+
+    # The keys available if the file was stat()'ed
+    STAT_KEYS = ('filesize', 'accessed', 'created', 'modified')
+
+    def __init__(self, basename, dirname, stat_obj=None):
+        self.basename = basename
+        self.dirname = dirname
+        self._dict = None
+
+        if stat_obj is not None:
+            self.size = stat_obj[ST_SIZE]
+            self.atime = stat_obj[ST_ATIME]
+            self.ctime = stat_obj[ST_CTIME]
+            self.mtime = stat_obj[ST_MTIME]
+
+        else:
+            self.size = self.atime = self.ctime = self.mtime = None
+
+    @property
+    def filename(self):
+        """
+        The filename without it's extension
+        """
+        return splitext(self.basename)[0]
+
+    @property
+    def extension(self):
+        """
+        The (lowercase) extension of the file
+        """
+        return splitext(self.basename)[1].lower()
+
+    def __getitem__(self, key):
+        if self._dict is not None:
+            return self._dict[key]
+
+        if key in FileRecord.KEYS:
+            return getattr(self, key)
+
+        if self.size is not None:
+            if key == 'filesize':
+                return self.size
+            elif key == 'modified':
+                return file_datetime(self.mtime)
+            elif key == 'accessed':
+                return file_datetime(self.atime)
+            elif key == 'created':
+                return file_datetime(self.ctime)
+
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._as_dict()[key] = value
+
+    def __delitem__(self, key):
+        del self._as_dict()[key]
+
+    def __iter__(self):
+        if self._dict is not None:
+            return iter(self._dict)
+
+        if self.size is None:
+            return iter(FileRecord.KEYS)
+        return iter(FileRecord.KEYS + FileRecord.STAT_KEYS)
+
+    def __len__(self):
+        if self._dict is not None:
+            return len(self._dict)
+        return 4 if self.size is None else 8
+
+    def __contains__(self, key):
+        if self._dict is not None:
+            return key in self._dict
+
+        return key in FileRecord.KEYS or \
+            (self.size is not None and key in FileRecord.STAT_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        """
+        Returns a (regular) dictionary copy of our record
+        """
+        return dict(self)
+
+    def _as_dict(self):
+        if self._dict is None:
+            self._dict = dict((key, self[key]) for key in self)
+        return self._dict
+
+
+# The (write-behind) scripts with database writes that may still be queued
+# when we exit; they're only referenced weakly so that each one is dropped
+# along with the script itself
+WRITE_BEHIND_SCRIPTS = weakref.WeakSet()
+
+
+def _flush_writes_at_exit():
+    """Flushes the database writes queued by each of our (write-behind)
+    scripts; registered (once) with atexit.
+    """
+    for script in list(WRITE_BEHIND_SCRIPTS):
+        if not script._pending_writes:
+            continue
+
+        try:
+            if not script.flush_writes():
+                script.logger.warning(
+                    'Discarded %d queued database write(s) on exit.' % len(
+                        script._pending_writes))
+
+        except Exception:
+            # We're exiting; there is nothing more we can do
+            pass
+
+
+atexit.register(_flush_writes_at_exit)
+
+
+def index_environ(env=None):
+    """
+    Takes a single pass over the environment (os.environ if one isn't
+    specified) and returns a dictionary of all of the variables grouped by
+    their prefix (with the prefix removed from the key and the value
+    stripped).  For example:
+        {
+            u'NZBOP_': {u'TEMPDIR': u'/tmp', ...},
+            u'NZBPO_': {u'DEBUG': u'no', ...},
+            u'NZBPP_': {u'DIRECTORY': u'/downloads/abcd', ...},
+        }
+
+    DNZB variables (NZBR__DNZB_*) are additionally grouped under the
+    DNZB_ENVIRO_ID key so they don't need to be looked up separately.
+    """
+    if env is None:
+        env = environ
+
+    index = {}
+    dnzb = {}
+    dnzb_len = len(SHR_ENVIRO_DNZB_ID)
+    for key, value in env.items():
+        result = ENVIRO_KEY_RE.match(key)
+        if not result:
+            continue
+
+        prefix, name = result.group(1), result.group(2)
+        value = value.strip()
+        try:
+            index[prefix][name] = value
+
+        except KeyError:
+            # First entry for this prefix
+            index[prefix] = {name: value}
+
+        if prefix == SHR_ENVIRO_ID and len(name) > dnzb_len and \
+                name.startswith(SHR_ENVIRO_DNZB_ID):
+            dnzb[name[dnzb_len:]] = value
+
+    index[DNZB_ENVIRO_ID] = dnzb
+    return index
+
+
 class ScriptBase(object):
     """The intent is this is the script you run from within your script
        after overloading the main() function of your class
@@ -859,31 +1232,49 @@ class ScriptBase(object):
         self.database = None
         self.database_key = database_key
 
+        # Read everything stored under our database_key (in one query) the
+        # first time we need it and serve get() and nzb_get() from memory
+        self.database_preload = self.parse_bool(
+            kwargs.get('database_preload', False))
+
+        # The database used to cache the content parsed from NZB-Files; see
+        # _get_nzbcache()
+        self._nzbcache = None
+
+        # The results of disk_usage() calls; see disk_usage()
+        self._disk_usage = {}
+
+        # In write-behind mode the database writes made by set() and
+        # nzb_set() are queued (keyed by their category and key) and
+        # written all at once by flush_writes()
+        self.write_behind = self.parse_bool(kwargs.get('write_behind', False))
+        self.write_behind_size = WRITE_BEHIND_SIZE
+        self.write_behind_age = WRITE_BEHIND_AGE
+        self._pending_writes = {}
+        self._pending_since = None
+        if self.write_behind:
+            # Don't lose anything should we never make it to the end of run()
+            WRITE_BEHIND_SCRIPTS.add(self)
+
+        # Index the environment once; the result is reused by all of the
+        # script modes (see environ_options()) while we initialize
+        self._environ_index = index_environ()
+
         # Fetch System Environment (passed from NZBGet)
-        self.system.update({
-            SYS_OPTS_RE.match(k).group(1): v.strip()
-            for (k, v) in environ.items() if SYS_OPTS_RE.match(k)})
+        self.system.update(self.environ_options(SYS_ENVIRO_ID))
 
         # Fetch System Environment (passed from SABNZBd)
-        self.system.update({
-            SAB_OPTS_RE.match(k).group(1): v.strip()
-            for (k, v) in environ.items() if SAB_OPTS_RE.match(k)})
+        self.system.update(self.environ_options(SAB_ENVIRO_ID))
 
         # Fetch/Load Script Specific Configuration
-        self.config.update({
-            CFG_OPTS_RE.match(k).group(1): v.strip()
-            for (k, v) in environ.items() if CFG_OPTS_RE.match(k)})
+        self.config.update(self.environ_options(CFG_ENVIRO_ID))
 
         # Fetch/Load Shared Configuration through push()
-        self.shared.update({
-            SHR_OPTS_RE.match(k).group(1): v.strip()
-            for (k, v) in environ.items() if SHR_OPTS_RE.match(k)})
+        self.shared.update(self.environ_options(SHR_ENVIRO_ID))
 
         # Fetch/Load Test/Command Specific Configuration; This is used
         # when issuing commands to a script from the configuration screen
-        self.test.update({
-            TST_OPTS_RE.match(k).group(1): v.strip()
-            for (k, v) in environ.items() if TST_OPTS_RE.match(k)})
+        self.test.update(self.environ_options(TST_ENVIRO_ID))
 
         # Preload nzbheaders based on any DNZB environment variables
         self.nzbheaders = self.pull_dnzb()
@@ -1062,10 +1453,16 @@ class ScriptBase(object):
                 )
 
         # Initialize the chosen script mode
-        if hasattr(self, '%s_%s' % (self.script_mode, 'init')):
-            getattr(
-                self, '%s_%s' % (self.script_mode, 'init')
-            )(*args, **kwargs)
+        try:
+            if hasattr(self, '%s_%s' % (self.script_mode, 'init')):
+                getattr(
+                    self, '%s_%s' % (self.script_mode, 'init')
+                )(*args, **kwargs)
+
+        finally:
+            # The environment is free to change from this point on; release
+            # our index (even if we failed) so that future lookups reflect it
+            self._environ_index = None
 
         # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
         # Signal Handling
@@ -1082,6 +1479,20 @@ class ScriptBase(object):
             # we just gracefully move on if this happens
             pass
 
+    def environ_options(self, prefix):
+        """Returns a dictionary of the environment variables identified by
+        the specified prefix (such as SYS_ENVIRO_ID or CFG_ENVIRO_ID) with
+        the prefix removed from each key.
+
+        While the script is initializing, this is served from the single pass
+        we made over the environment; otherwise it is indexed again.
+        """
+        index = getattr(self, '_environ_index', None)
+        if index is None:
+            index = index_environ()
+
+        return dict(index.get(prefix, {}))
+
     def set_debugging(self, enabled=True):
         """
         Provides a toggle to the debug function built into
@@ -1345,6 +1756,14 @@ class ScriptBase(object):
         return True
 
     def __del__(self):
+        if getattr(self, '_pending_writes', None):
+            try:
+                self.flush_writes()
+
+            except Exception:
+                # We're going away; there is nothing more we can do
+                pass
+
         if self.logger_id:
             destroy_logger(self.logger_id)
 
@@ -1448,8 +1867,7 @@ class ScriptBase(object):
             return dict()
 
         # Preload nzbheaders based on any DNZB environment variables
-        return {DNZB_OPTS_RE.match(k).group(1).upper(): v.strip()
-                for (k, v) in environ.items() if DNZB_OPTS_RE.match(k)}
+        return self.environ_options(DNZB_ENVIRO_ID)
 
     def push_guess(self, guess):
         """pushes guess results to NZBGet Server. The function was
@@ -1489,18 +1907,38 @@ class ScriptBase(object):
                 if SHR_GUESS_OPTS_RE.match(k) and
                 SHR_GUESS_OPTS_RE.match(k).group(1) in GUESS_KEY_MAP}
 
-    def parse_nzbfile(self, nzbfile, check_queued=False):
+    def parse_nzbfile(self, nzbfile, check_queued=False, head_only=True,
+                      use_cache=None):
         """Parse an nzbfile specified and return just the
         meta information within the <head></head> tags
 
+        The nzbfile can be the path to an NZB-File, a file-like object or
+        the content of an NZB-File (bytes, str or a memoryview); content is
+        parsed directly from memory.
+
+        By default we stop reading the NZB-File as soon as the <head/> has
+        been parsed; set head_only to False if you want the entire NZB-File
+        parsed (and therefore verified) instead.
+
+        The meta information parsed from an NZB-File is cached in our
+        database (shared by all scripts) for as long as the NZB-File remains
+        unchanged.  By default this only takes place if we already have a
+        database (a database_key is defined); set use_cache to True to
+        always use the cache or to False to always parse the NZB-File.
         """
         results = {}
-        if not isinstance(nzbfile, six.string_types):
+        if not (is_nzb_path(nzbfile) or is_nzb_content(nzbfile) or
+                hasattr(nzbfile, 'read')):
             # Simple check for nothing found
             self.logger.debug('NZB-File not defined; parse skipped.')
             return results
 
-        if isfile(nzbfile):
+        if not is_nzb_path(nzbfile):
+            # Content (or a stream) was provided; there is nothing to look
+            # for on disk
+            pass
+
+        elif isfile(nzbfile):
             # Nothing expensive to do with i/o; just move along
             pass
 
@@ -1513,38 +1951,29 @@ class ScriptBase(object):
             #                scripts.
             # .error may be corrupted, but it does't mean we can't attempt
             #        to parse content from it.
-            file_escaped = re.escape(basename(nzbfile))
-            file_regex = r'^%s|%s' % (file_escaped, file_escaped) + \
-                r'(' + \
-                r'|\.queued|\.[0-9]+\.queued' + \
-                r'|\.processed|\.[0-9]+\.processed' + \
-                r'|\.nzb_processed|\.[0-9]+\.nzb_processed' + \
-                r'|\.error|\.[0-9]+\.error' + \
-                r')$'
+            search_dirs = [dirname(nzbfile)]
+            nzb_dir = self.get('NZBDir', None)
+            if nzb_dir and abspath(nzb_dir) != abspath(dirname(nzbfile)):
+                search_dirs.append(nzb_dir)
 
             # look in the directory and extract all matches
-            _filenames = self.get_files(
-                search_dir=dirname(nzbfile),
-                regex_filter=file_regex,
-                fullstats=True,
-                max_depth=1,
-            )
+            _filenames = {}
+            for search_dir in search_dirs:
+                for path in nzb_variants(search_dir, basename(nzbfile)):
+                    try:
+                        _filenames[path] = stat(path)
 
-            nzb_dir = self.get('NZBDir', None)
-            if nzb_dir and abspath(nzb_dir) != abspath(dirname(nzbfile)):
-                _filenames.update(self.get_files(
-                    search_dir=abspath(nzb_dir),
-                    regex_filter=file_regex,
-                    fullstats=True,
-                    max_depth=1))
+                    except OSError:
+                        # File was removed since our index was built
+                        continue
 
             if len(_filenames):
                 # sort our results by access time
                 _files = sorted(list(_filenames.keys()), key=lambda k: (
                     # Sort by Accessed time first
-                    _filenames[k]['accessed'],
+                    _filenames[k][ST_ATIME],
                     # Then sort by Created Date
-                    _filenames[k]['created'],
+                    _filenames[k][ST_CTIME],
                     # Then sort by filename length
                     # file.nzb.2.queued > file.nzb.queued
                     len(k)), reverse=True)
@@ -1552,7 +1981,8 @@ class ScriptBase(object):
                     for _file in _files:
                         self.logger.debug('NZB-Files located: %s (%s)' % (
                             basename(_file),
-                            _filenames[_file]['accessed']
+                            datetime.fromtimestamp(
+                                _filenames[_file][ST_ATIME])
                             .strftime('%Y-%m-%d %H:%M:%S'),
                         ))
                 # Assign first file (since we've listed by access time)
@@ -1561,53 +1991,42 @@ class ScriptBase(object):
                     'NZB-File detected: %s' % basename(nzbfile),
                 )
 
-        try:
-            if LXML_TYPE == u'xml.etree.cElementTree':
-                # cElementTree does not support tag= option and is not as
-                # powerful as some of it's other partners since you have to
-                # parse much more to get the results.  It's slower; but it
-                # works:
-                elements = etree.iterparse(nzbfile)
-
-                for event, element in elements:
-                    if element.tag == \
-                            "{http://www.newzbin.com/DTD/2003/nzb}meta":
-                        if isinstance(element.text, six.string_types) and \
-                                element.text.strip():
-                            # Only store entries with content
-                            results[element.attrib['type'].upper()] = \
-                                element.text.strip()
-                    element.clear()
-            else:
-                elements = etree.iterparse(
-                    nzbfile,
-                    tag="{http://www.newzbin.com/DTD/2003/nzb}head",
-                )
+        # Check our cache before loading our XML parser
+        cache_key = self._nzbcache_key(nzbfile, use_cache)
+        if cache_key is not None and head_only:
+            cached = self._get_nzbcache().nzbcache_get(*cache_key)
+            if cached is not None:
+                self.logger.debug(
+                    'NZBParse - NZB-File meta entries cached: %s' %
+                    basename(nzbfile))
+                return cached[0]
 
-                for event, element in elements:
-                    for child in element:
-                        if child.tag == \
-                                "{http://www.newzbin.com/DTD/2003/nzb}meta":
-                            if isinstance(child.text, six.string_types) and \
-                                    child.text.strip():
-                                # Only store entries with content
-                                results[child.attrib['type'].upper()] = \
-                                    child.text.strip()
-
-                    element.clear()
+        etree = load_etree()
+        if etree is None:
+            self.logger.warning('NZBParse - Skipped; lxml is not installed')
+            return results
+
+        # lxml throws it's own exception
+        xml_syntax_error = getattr(etree, 'XMLSyntaxError', Exception)
+
+        # What we refer to the NZB-File as in our logs
+        label = nzbfile if is_nzb_path(nzbfile) else NZB_CONTENT_LABEL
+
+        try:
+            results = parse_nzb_head(nzbfile, head_only=head_only)
             self.logger.info(
                 'NZBParse - NZB-File parsed %d meta entries' % len(results),
             )
 
-        except NameError:
-            self.logger.warning('NZBParse - Skipped; lxml is not installed')
+            if cache_key is not None:
+                self._get_nzbcache().nzbcache_set(*cache_key, meta=results)
 
         except IOError:
             self.logger.warning(
-                'NZBParse - NZB-File is missing: %s' % basename(nzbfile))
+                'NZBParse - NZB-File is missing: %s' % basename(label))
 
-        except XMLSyntaxError as e:
-            if e[0] is None:
+        except xml_syntax_error as e:
+            if not e.args or e.args[0] is None:
                 # this is a bug with lxml in earlier versions
                 # https://bugs.launchpad.net/lxml/+bug/1185701
                 # It occurs when the end of the file is reached and lxml
@@ -1623,61 +2042,99 @@ class ScriptBase(object):
             else:
                 # This is the real thing
                 self.logger.error(
-                    'NZBParse - NZB-File is corrupt: %s' % nzbfile,
+                    'NZBParse - NZB-File is corrupt: %s' % label,
                 )
                 self.logger.debug(
                     'NZBParse - %s Exception %s' % (
-                        LXML_TYPE,
+                        etree.__name__,
                         str(e)))
 
         except Exception as e:
             self.logger.error(
-                'NZBParse - NZB-File is corrupt: %s' % nzbfile,
+                'NZBParse - NZB-File is corrupt: %s' % label,
             )
             self.logger.debug(
                 'NZBParse - %s Unhandled Exception %s' % (
                     str(e),
-                    LXML_TYPE))
+                    etree.__name__))
 
         return results
 
-    def parse_nzbcontent(self, nzbcontent, verbose=True):
+    def iter_nzbfile(self, nzbfile, segments=True):
+        """A generator that yields each file (and it's segments) found
+        within the NZB-File specified; see NZBParser.NZBFile
+
+        The NZB-File is streamed, so this can safely be used on NZB-Files
+        of any size.  If segments is set to False, only the segment totals
+        of each file are tracked.
         """
-        Parses nzb-content (extracted from within an NZB-File)
+        label = nzbfile if is_nzb_path(nzbfile) else NZB_CONTENT_LABEL
+        try:
+            for entry in iter_nzb_files(nzbfile, segments=segments):
+                yield entry
+
+        except ImportError:
+            self.logger.warning('NZBParse - Skipped; lxml is not installed')
+
+        except IOError:
+            self.logger.warning(
+                'NZBParse - NZB-File is missing: %s' % label)
+
+        except Exception as e:
+            self.logger.error(
+                'NZBParse - NZB-File is corrupt: %s' % label,
+            )
+            self.logger.debug('NZBParse - Exception %s' % str(e))
+
+    def summarize_nzbfile(self, nzbfile, use_cache=None):
+        """Returns the total bytes, segments and files (with a breakdown
+        of par2, rar and other files) found within the NZB-File specified;
+        see NZBParser.summarize_nzb()
 
-        This script first writes the contents of the NZB to a new file
-        so that we can parse it using the parse_nzbfile() which already
-        manages all the built in support for the several XML parsers
-        out there.
+        Just like parse_nzbfile(), the summary is cached for as long as
+        the NZB-File remains unchanged (see use_cache there).
 
+        None is returned if the NZB-File could not be parsed.
         """
-        # Temporarily write content to a temporary file
-        fname = mkstemp(
-            suffix='.tmp.nzb', dir=self.tempdir, text=True,
-        )
+        cache_key = self._nzbcache_key(nzbfile, use_cache)
+        if cache_key is not None:
+            cached = self._get_nzbcache().nzbcache_get(*cache_key)
+            if cached is not None and cached[1] is not None:
+                return cached[1]
 
+        label = nzbfile if is_nzb_path(nzbfile) else NZB_CONTENT_LABEL
         try:
-            fd = open(fname)
-        except:
-            return {}
+            summary = summarize_nzb(nzbfile)
+            if cache_key is not None:
+                self._get_nzbcache().nzbcache_set(
+                    *cache_key, summary=summary)
+            return summary
 
-        try:
-            fd.write(nzbcontent)
+        except ImportError:
+            self.logger.warning('NZBParse - Skipped; lxml is not installed')
 
-        finally:
-            fd.close()
+        except IOError:
+            self.logger.warning(
+                'NZBParse - NZB-File is missing: %s' % label)
 
-        results = self.parse_nzbfile(fname)
+        except Exception as e:
+            self.logger.error(
+                'NZBParse - NZB-File is corrupt: %s' % label,
+            )
+            self.logger.debug('NZBParse - Exception %s' % str(e))
 
-        try:
-            unlink(fname)
-        except:
-            if verbose:
-                self.logger.warning(
-                    'Failed to removed (temporary) NZB-File: %s' %
-                    fname)
+        return None
 
-        return results
+    def parse_nzbcontent(self, nzbcontent, verbose=True):
+        """
+        Parses nzb-content (extracted from within an NZB-File)
+
+        The content (bytes, str or a memoryview) is parsed directly from
+        memory using parse_nzbfile().  The verbose flag is no longer used
+        and is only kept for backwards compatibility.
+
+        """
+        return self.parse_nzbfile(nzbcontent)
 
     def parse_url(self, url, default_schema='http', qsd_auth=True):
         """A function that greatly simplifies the parsing of a url
@@ -1757,6 +2214,20 @@ class ScriptBase(object):
             # Invalid Hostname
             return None
 
+        try:
+            # Python 2.7
+            from urllib import unquote
+            from urllib import quote
+            from urlparse import parse_qsl
+            from urlparse import urlparse
+
+        except ImportError:
+            # Python 3.x
+            from urllib.parse import unquote
+            from urllib.parse import quote
+            from urllib.parse import parse_qsl
+            from urllib.parse import urlparse
+
         # Now do a proper extraction of data
         parsed = urlparse('http://%s' % host)
 
@@ -1869,36 +2340,19 @@ class ScriptBase(object):
 
         return result
 
-    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
-    # set() and get() wrappers
-    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
-    def unset(self, key, use_env=True, use_db=True):
-        """Unset a variable, this also occurs if you call set() with a value
-            set to None.
-        """
-        return self.set(key, None, use_env=use_env, use_db=use_db)
-
-    def set(self, key, value, use_env=True, use_db=True):
-        """Sets a key/value pair into the configuration
-
-            if use_env is True, then content is additionaly set in the
-            local environment variables.
+    def _get_database(self):
+        """Returns our Database object, connecting to it on first use.
 
-            if use_db is True, then content is additionally set in a sqlite
-            database.
+        None is returned if we don't have a database_key defined or if we
+        simply can't use the database (sqlite3 isn't available or the file
+        can't be accessed).
         """
-        # clean key
-        key = VALID_KEY_RE.sub('', key).upper()
-        if not key:
-            return False
+        if self.database is None and self.database_key:
+            try:
+                # Connect to database on first use only; sqlite3 is not
+                # imported until this point
+                from .Database import Database
 
-        if key in self.system:
-            self.logger.warning('set() called using a system key (%s)' % key)
-
-        # Save content to database
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
                 self.database = Database(
                     container=self.database_key,
                     database=join(
@@ -1907,53 +2361,255 @@ class ScriptBase(object):
                     ),
                     logger=self.logger,
                     debug=self.debug,
+                    preload=self.database_preload,
                 )
 
-                # Database is ready to go
-                if value is None:
-                    # Remove Entry if it's set to None
-                    self.database.unset(key=key)
-                    self.logger.debug('unset(database) %s"' % key)
-
-                elif isinstance(value, bool):
-                    # Convert boolean to integer (True to 1 or False to 0)
-                    self.database.set(key=key, value=int(value))
-                    self.logger.debug('set(database) %s="%s"' % (
-                        key,
-                        int(value)),
-                    )
-
-                else:
-                    self.database.set(key=key, value=value)
-                    self.logger.debug('set(database) %s="%s"' % (key, value))
-
             except EnvironmentError:
                 # Database Access Problem
                 # set the dbstore to false so it isn't used anymore
                 self.database = False
 
-            except NameError:
+            except ImportError:
                 # Sqlite wasn't installed
                 # set the dbstore to false so it isn't used anymore
                 self.database = False
 
-        elif use_db and self.database:
+        return self.database if self.database else None
+
+    def _get_nzbcache(self, use_cache=True):
+        """Returns the Database used to cache the content parsed from
+        NZB-Files, file hashes and our directory snapshots, connecting to it
+        on first use.
+
+        What we cache is shared by all scripts, but by default (use_cache
+        set to None) we only cache in the database we already have; None is
+        returned if we don't have a database_key defined.  Set use_cache to
+        True to open the (shared) database without one.  None is also
+        returned if use_cache is False or the database can't be used.
+        """
+        if use_cache is False:
+            return None
+
+        if use_cache is None and self._get_database() is None:
+            # Don't open a database just for our cache unless asked to
+            return None
+
+        if self._nzbcache is None:
+            self._nzbcache = self._get_database()
+
+        if self._nzbcache is None:
+            try:
+                from .Database import Database
+
+                self._nzbcache = Database(
+                    container=None,
+                    database=join(
+                        self.tempdir,
+                        NZBGET_DATABASE_FILENAME,
+                    ),
+                    logger=self.logger,
+                    debug=self.debug,
+                )
+
+            except (EnvironmentError, ImportError):
+                # Database Access Problem; don't try again
+                self._nzbcache = False
+
+        return self._nzbcache if self._nzbcache else None
+
+    def _nzbcache_key(self, nzbfile, use_cache=None):
+        """Returns the tuple of (path, size, mtime, inode) that identifies
+        the NZB-File specified in our cache.  None is returned if the
+        NZB-File can't (or shouldn't) be cached; it isn't a file, the cache
+        is unavailable or use_cache (see parse_nzbfile()) rules it out.
+        """
+        if not is_nzb_path(nzbfile) or self._get_nzbcache(use_cache) is None:
+            return None
+
+        try:
+            stat_obj = stat(nzbfile)
+
+        except OSError:
+            # It doesn't exist (or we can't access it)
+            return None
+
+        if not S_ISREG(stat_obj.st_mode):
+            return None
+
+        return (
+            abspath(nzbfile),
+            stat_obj.st_size,
+            stat_obj.st_mtime,
+            stat_obj.st_ino,
+        )
+
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    # set() and get() wrappers
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
+    @contextmanager
+    def transaction(self):
+        """A with block within which all of the set(), unset(), nzb_set()
+            and nzb_unset() database writes are made in a single transaction
+            (with a single commit) when the block is left.
+
+            with self.transaction():
+                for key, value in results.items():
+                    self.set(key, value)
+        """
+        database = self._get_database()
+        if database is None:
+            yield
+            return
+
+        with database.transaction():
+            yield
+
+    def flush_writes(self):
+        """Writes the database changes queued by set(), unset(), nzb_set()
+            and nzb_unset() in write-behind mode (in a single transaction).
+
+            This takes place automatically once too many are queued (or the
+            oldest one gets too old), when run() finishes, when we receive a
+            quit signal and when we exit.
+
+            Our writes remain queued (to be tried again) should they fail to
+            be written; False is returned.  Within a transaction() block our
+            writes are left for the block to commit (or roll back).
+        """
+        if not self._pending_writes:
+            return True
+
+        pending = self._pending_writes
+        database = self._get_database()
+        if database is None:
+            self.logger.warning(
+                'Discarded %d queued database write(s); '
+                'there is no database to write them to.' % len(pending))
+            self._pending_writes = {}
+            self._pending_since = None
+            return False
+
+        from .Database import CATEGORIES
+
+        # Within a transaction() block it's the (outermost) block that
+        # commits our writes; not us
+        nested = bool(database._transactions)
+
+        results = []
+        with database.transaction():
+            for category in CATEGORIES:
+                changes = [(key, value) for (_category, key), value
+                           in pending.items() if _category == category]
+                if not changes:
+                    continue
+
+                results.append(database.set_many(
+                    [(key, int(value) if isinstance(value, bool) else value)
+                     for key, value in changes if value is not None],
+                    category=category))
+                results.append(database.unset_many(
+                    [key for key, value in changes if value is None],
+                    category=category))
+
+        if not (all(results) and (nested or database.committed)):
+            self.logger.warning(
+                'Failed to flush %d queued database write(s); '
+                'they remain queued.' % len(pending))
+
+            # Give the database a chance to recover before we try again
+            self._pending_since = time()
+            return False
+
+        self._pending_writes = {}
+        self._pending_since = None
+
+        self.logger.debug('Flushed %d queued database write(s).' % len(
+            pending))
+        return True
+
+    def _queue_write(self, category, key, value):
+        """Queues a database write (a removal if value is None) made in
+            write-behind mode; see flush_writes()
+        """
+        now = time()
+        if not self._pending_writes:
+            self._pending_since = now
+
+        self._pending_writes[(category, key)] = value
+        self.logger.vdebug('queued(database) %s="%s"' % (key, value))
+
+        if len(self._pending_writes) >= self.write_behind_size or \
+                now - self._pending_since >= self.write_behind_age:
+            self.flush_writes()
+
+    def _with_pending_writes(self, category, items):
+        """Returns the list of (key, value) items (read from the database)
+            with our queued (write-behind) writes applied to them
+        """
+        if not self._pending_writes:
+            return items
+
+        items = dict(items)
+        for (_category, key), value in self._pending_writes.items():
+            if _category != category:
+                continue
+
+            if value is None:
+                items.pop(key, None)
+
+            else:
+                items[key] = value
+
+        return list(items.items())
+
+    def unset(self, key, use_env=True, use_db=True):
+        """Unset a variable, this also occurs if you call set() with a value
+            set to None.
+        """
+        return self.set(key, None, use_env=use_env, use_db=use_db)
+
+    def set(self, key, value, use_env=True, use_db=True):
+        """Sets a key/value pair into the configuration
+
+            if use_env is True, then content is additionaly set in the
+            local environment variables.
+
+            if use_db is True, then content is additionally set in a sqlite
+            database.
+        """
+        # clean key
+        key = VALID_KEY_RE.sub('', key).upper()
+        if not key:
+            return False
+
+        if key in self.system:
+            self.logger.warning('set() called using a system key (%s)' % key)
+
+        # Save content to database
+        database = self._get_database() if use_db else None
+        if database and self.write_behind:
+            from .Database import Category
+
+            # Written by flush_writes()
+            self._queue_write(Category.CONFIG, key, value)
+
+        elif database:
             # Database is ready to go
             if value is None:
                 # Remove Entry if it's set to None
-                self.database.unset(key=key)
+                database.unset(key=key)
                 self.logger.debug('unset(database) %s"' % key)
 
             elif isinstance(value, bool):
                 # Convert boolean to integer (change True to 1 or False to 0)
-                self.database.set(key=key, value=int(value))
+                database.set(key=key, value=int(value))
                 self.logger.debug('set(database) %s="%s"' % (
                     key,
                     int(value),
                 ))
 
             else:
-                self.database.set(key=key, value=value)
+                database.set(key=key, value=value)
                 self.logger.debug('set(database) %s="%s"' % (key, value))
 
         if value is None:
@@ -2022,38 +2678,14 @@ class ScriptBase(object):
             return value
 
         # Fetch content from database
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
-                self.database = Database(
-                    container=self.database_key,
-                    database=join(
-                        self.tempdir,
-                        NZBGET_DATABASE_FILENAME,
-                    ),
-                    logger=self.logger,
-                    debug=self.debug,
-                )
-
-                # Database is ready to go
-                value = self.database.get(key=key)
-                if value is not None:
-                    # only return if a key was found
-                    self.logger.debug('get(database) %s="%s"' % (key, value))
-                    return value
-
-            except EnvironmentError:
-                # Database Access Problem
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-            except NameError:
-                # Sqlite wasn't installed
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-        elif use_db and self.database:
-            value = self.database.get(key=key)
+        database = self._get_database() if use_db else None
+        if database:
+            from .Database import Category
+
+            # Our queued (write-behind) writes haven't made it there yet
+            value = self._pending_writes.get((Category.CONFIG, key)) \
+                if (Category.CONFIG, key) in self._pending_writes \
+                else database.get(key=key)
             if value is not None:
                 # only return if a key was found
                 self.logger.debug('get(database) %s="%s"' % (key, value))
@@ -2085,36 +2717,14 @@ class ScriptBase(object):
 
         """
         items = list()
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
-                self.database = Database(
-                    container=self.database_key,
-                    database=join(
-                        self.tempdir,
-                        NZBGET_DATABASE_FILENAME,
-                    ),
-                    logger=self.logger,
-                    debug=self.debug,
-                )
-
-                # Fetch from database first
-                # We return items as a list and not an iter
-                items = self.database.items()
-
-            except EnvironmentError:
-                # Database Access Problem
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-            except NameError:
-                # Sqlite wasn't installed
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
+        database = self._get_database() if use_db else None
+        if database:
+            from .Database import Category
 
-        elif use_db and self.database:
             # Fetch from database first
-            items = self.database.items()
+            # We return items as a list and not an iter
+            items = self._with_pending_writes(
+                Category.CONFIG, database.items())
 
         # Convert our list to a dictionary temporarily to provide
         # potential overrides
@@ -2156,60 +2766,25 @@ class ScriptBase(object):
             return False
 
         # Save content to database
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
-                self.database = Database(
-                    container=self.database_key,
-                    database=join(
-                        self.tempdir,
-                        NZBGET_DATABASE_FILENAME,
-                    ),
-                    logger=self.logger,
-                    debug=self.debug,
-                )
-
-                # Database is ready to go
-                if value is None:
-                    # Remove Entry if it's set to None
-                    self.database.unset(key=key, category=Category.NZB)
-                    self.logger.debug('nzb_unset(database) %s"' % key)
-
-                elif isinstance(value, bool):
-                    # Convert boolean to integer (True to 1 or False to 0)
-                    self.database.set(
-                        key=key, value=int(value), category=Category.NZB)
-                    self.logger.debug('nzb_set(database) %s="%s"' % (
-                        key,
-                        int(value)),
-                    )
-
-                else:
-                    self.database.set(
-                        key=key, value=value, category=Category.NZB)
-                    self.logger.debug(
-                        'nzb_set(database) %s="%s"' % (key, value))
+        database = self._get_database() if use_db else None
+        if database and self.write_behind:
+            from .Database import Category
 
-            except EnvironmentError:
-                # Database Access Problem
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
+            # Written by flush_writes()
+            self._queue_write(Category.NZB, key, value)
 
-            except NameError:
-                # Sqlite wasn't installed
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
+        elif database:
+            from .Database import Category
 
-        elif use_db and self.database:
             # Database is ready to go
             if value is None:
                 # Remove Entry if it's set to None
-                self.database.unset(key=key, category=Category.NZB)
+                database.unset(key=key, category=Category.NZB)
                 self.logger.debug('nzb_unset(database) %s"' % key)
 
             elif isinstance(value, bool):
                 # Convert boolean to integer (change True to 1 or False to 0)
-                self.database.set(
+                database.set(
                     key=key,
                     value=int(value),
                     category=Category.NZB,
@@ -2220,7 +2795,7 @@ class ScriptBase(object):
                 ))
 
             else:
-                self.database.set(key=key, value=value, category=Category.NZB)
+                database.set(key=key, value=value, category=Category.NZB)
                 self.logger.debug('nzb_set(database) %s="%s"' % (key, value))
 
         if value is None:
@@ -2284,39 +2859,14 @@ class ScriptBase(object):
             return value
 
         # Fetch content from database
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
-                self.database = Database(
-                    container=self.database_key,
-                    database=join(
-                        self.tempdir,
-                        NZBGET_DATABASE_FILENAME,
-                    ),
-                    logger=self.logger,
-                    debug=self.debug,
-                )
-
-                # Database is ready to go
-                value = self.database.get(key=key, category=Category.NZB)
-                if value is not None:
-                    # only return if a key was found
-                    self.logger.debug(
-                        'nzb_get(database) %s="%s"' % (key, value))
-                    return value
-
-            except EnvironmentError:
-                # Database Access Problem
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-            except NameError:
-                # Sqlite wasn't installed
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-        elif use_db and self.database:
-            value = self.database.get(key=key, category=Category.NZB)
+        database = self._get_database() if use_db else None
+        if database:
+            from .Database import Category
+
+            # Our queued (write-behind) writes haven't made it there yet
+            value = self._pending_writes.get((Category.NZB, key)) \
+                if (Category.NZB, key) in self._pending_writes \
+                else database.get(key=key, category=Category.NZB)
             if value is not None:
                 # only return if a key was found
                 self.logger.debug('nzb_get(database) %s="%s"' % (key, value))
@@ -2335,35 +2885,13 @@ class ScriptBase(object):
 
         """
         items = list()
-        if use_db and self.database is None and self.database_key:
-            try:
-                # Connect to database on first use only
-                self.database = Database(
-                    container=self.database_key,
-                    database=join(
-                        self.tempdir,
-                        NZBGET_DATABASE_FILENAME,
-                    ),
-                    logger=self.logger,
-                    debug=self.debug,
-                )
-
-                # Fetch from database first
-                items = self.database.items()
+        database = self._get_database() if use_db else None
+        if database:
+            from .Database import Category
 
-            except EnvironmentError:
-                # Database Access Problem
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-            except NameError:
-                # Sqlite wasn't installed
-                # set the dbstore to false so it isn't used anymore
-                self.database = False
-
-        elif use_db and self.database:
             # Fetch from database first
-            items = self.database.items(category=Category.NZB)
+            items = self._with_pending_writes(
+                Category.NZB, database.items(category=Category.NZB))
 
         # configuration trumps shared values
         items = dict(items)
@@ -2518,6 +3046,14 @@ class ScriptBase(object):
             password = self.get('ControlPassword', '')
 
         if user and password:
+            try:
+                # Python 2.7
+                from urllib import quote
+
+            except ImportError:
+                # Python 3.x
+                from urllib.parse import quote
+
             xmlrpc_url += '%s:%s@' % (quote(user), quote(password))
 
         xmlrpc_url += '%s:%s/xmlrpc' % (
@@ -2531,6 +3067,17 @@ class ScriptBase(object):
 
         # Future TODO: make this an option for those who want to verify
         # the host.
+        import ssl
+        try:
+            # Python 2
+            from xmlrpclib import ServerProxy
+            from xmlrpclib import SafeTransport
+
+        except ImportError:
+            # Python 3
+            from xmlrpc.client import ServerProxy
+            from xmlrpc.client import SafeTransport
+
         context = hasattr(ssl, '_create_unverified_context') \
             and ssl._create_unverified_context() or None
 
@@ -2632,41 +3179,37 @@ class ScriptBase(object):
         dup_score = 0
         dup_mode = NZBGetDuplicateMode.FORCE
 
-        if content is None:
-            if not category:
-                # Verify content is an NZB-File
-                meta = self.parse_nzbfile(filename)
-                category = unescape_xml(meta.get('CATEGORY', '').strip())
+        try:
+            if content is None:
+                # Compressed NZB-Files are decompressed as they're read
+                content = read_nzb(filename)
 
-            try:
-                f = open(filename, "r")
+            else:
+                if isinstance(content, six.text_type):
+                    content = content.encode('utf-8')
 
-            except:
-                self.logger.debug('API:NZB-File Could not open: %s' % filename)
-                return False
+                elif isinstance(content, memoryview):
+                    content = content.tobytes()
 
-            try:
-                content = f.read()
-                f.close()
-            except:
-                self.logger.debug('API:NZB-File Could not read: %s' % filename)
-                f.close()
-                return False
+                elif isinstance(content, bytearray):
+                    content = bytes(content)
+
+                if compression_type(content) is not None:
+                    content = read_nzb(content)
+
+        except Exception:
+            self.logger.debug('API:NZB-File Could not read: %s' % (
+                filename if content is None else NZB_CONTENT_LABEL))
+            return False
 
-        elif not category:
+        if not category:
             # We have content already loaded; We need to convert it into an
             # XML object for parsing
             meta = self.parse_nzbcontent(content)
             category = unescape_xml(meta.get('CATEGORY', '').strip())
 
         # Encode content
-        try:
-            # Python 2.x
-            b64content = standard_b64encode(content)
-        except TypeError:
-            # Python 3.x
-            b64content = standard_b64encode(
-                content.encode('utf-8')).decode('utf-8')
+        b64content = standard_b64encode(content).decode('utf-8')
 
         try:
             return self.api.append(
@@ -2722,23 +3265,207 @@ class ScriptBase(object):
         # Execute
         return core_function(*args, **kwargs)
 
-    def _get_files(self, search_dir, regex_filter=None, prefix_filter=None,
-                   suffix_filter=None, fullstats=False,
-                   followlinks=False, min_depth=None, max_depth=None,
-                   case_sensitive=False, skip_directories=SKIP_DIRECTORIES,
-                   *args, **kwargs):
-        """Returns a dict object of the files found in the download
-           directory. You can additionally pass in filters as a list or
-           string) to filter the results returned.
+    def iter_files(self, *args, **kwargs):
+        """A system wrapper to _iter_files() allowing a mult-script
+        environment
+        """
 
-              ex:
-              {
-                 '/full/path/to/file.mkv': {
-                     'basename': 'file.mkv',
-                     'dirname': '/full/path/to',
-                     # identify the filename (without applied extension)
-                     'filename': 'file',
-                     # always tolower() applied to:
+        # Default
+        core_function = self._iter_files
+        if self.script_mode is not None and \
+           hasattr(self, '%s_%s' % (self.script_mode, 'iter_files')):
+            core_function = getattr(
+                self, '%s_%s' % (self.script_mode, 'iter_files'))
+
+        # Execute
+        return core_function(*args, **kwargs)
+
+    def largest_files(self, n=1, search_dir=None, *args, **kwargs):
+        """Returns a list of the (up to) n largest files found as tuples of
+           (fullpath, FileRecord) ordered largest first.  All of the
+           arguments (such as the filters) supported by get_files() can be
+           specified; fullstats is always set.
+
+              # The largest video file we downloaded
+              results = self.largest_files(suffix_filter='.mkv, .avi')
+              if results:
+                  path, meta = results[0]
+
+           Only the n largest files found so far are kept while the
+           directories are walked.
+        """
+        kwargs['fullstats'] = True
+        return heapq.nlargest(
+            n, self.iter_files(search_dir, *args, **kwargs),
+            key=lambda entry: entry[1]['filesize'])
+
+    def summarize_files(self, search_dir=None, *args, **kwargs):
+        """Returns the total number of files (and bytes) found along with a
+           breakdown of them by their (lowercase) extension:
+
+              {
+                  'files': 4,
+                  'bytes': 1073743872,
+                  'extensions': {
+                      '.mkv': {'files': 1, 'bytes': 1073741824},
+                      '.srt': {'files': 2, 'bytes': 2000},
+                      '': {'files': 1, 'bytes': 48},
+                  },
+              }
+
+           All of the arguments (such as the filters) supported by
+           get_files() can be specified; fullstats is always set.
+        """
+        kwargs['fullstats'] = True
+        files = 0
+        total = 0
+        extensions = {}
+        for _, meta in self.iter_files(search_dir, *args, **kwargs):
+            size = meta['filesize']
+            files += 1
+            total += size
+
+            extension = meta['extension']
+            try:
+                extensions[extension][0] += 1
+                extensions[extension][1] += size
+
+            except KeyError:
+                # First file with this extension
+                extensions[extension] = [1, size]
+
+        return {
+            'files': files,
+            'bytes': total,
+            'extensions': dict(
+                (ext, {'files': v[0], 'bytes': v[1]})
+                for ext, v in extensions.items()),
+        }
+
+    def hash_files(self, paths, algorithm='md5', partial=None, threads=4,
+                   use_cache=None):
+        """Returns a dictionary of the (hex) digests of the content of each
+           of the files specified keyed by their (absolute) path; None is
+           set for any file that could not be read.  paths can be a single
+           path or a list of them (such as the dictionary returned by
+           get_files()).
+
+              hashes = self.hash_files(self.get_files(suffix_filter='.mkv'))
+
+           Any algorithm hashlib supports (md5, sha1, sha256, etc) can be
+           used as well as crc32 and the xxHash ones (xxh64, etc) if the
+           xxhash package is installed.  If partial is set, only the first
+           and last partial bytes of each file are hashed (see
+           Utils.file_hash()).
+
+           The files are hashed using a pool of (up to) threads threads.
+           Hashes are stored in our database so that any script can look
+           them up again for free for as long as the file remains unchanged
+           (same size, modification time and inode).  Just like
+           parse_nzbfile(), this only takes place by default if we already
+           have a database; set use_cache to True to always store them or
+           to False to always hash the files.
+        """
+        if isinstance(paths, six.string_types):
+            paths = (paths, )
+
+        try:
+            hash_object(algorithm)
+
+        except ValueError:
+            self.logger.error('Unsupported hash algorithm: %s' % algorithm)
+            return dict((abspath(path), None) for path in paths)
+
+        # What our hashes are stored as in our cache
+        label = algorithm if not partial else '%s:%d' % (algorithm, partial)
+
+        db = self._get_nzbcache(use_cache)
+        results = {}
+        # The files we need to hash
+        pending = []
+        for path in paths:
+            path = abspath(path)
+            try:
+                stat_obj = stat(path)
+                if not S_ISREG(stat_obj.st_mode):
+                    raise OSError('%s is not a file' % path)
+
+            except OSError as e:
+                self.logger.warning('Could not hash %s' % path)
+                self.logger.debug('Reason %s' % str(e))
+                results[path] = None
+                continue
+
+            key = (path, stat_obj.st_size, stat_obj.st_mtime, stat_obj.st_ino)
+            if db is not None:
+                results[path] = db.hashcache_get(*key, algorithm=label)
+                if results[path] is not None:
+                    continue
+
+            pending.append(key)
+
+        if not pending:
+            return results
+
+        pool = None
+        if threads and threads > 1 and len(pending) > 1:
+            pool = ThreadPool(min(threads, len(pending)))
+
+        try:
+            jobs = [pool.submit(file_hash, key[0], algorithm, partial)
+                    if pool is not None else None for key in pending]
+
+            entries = []
+            for key, job in zip(pending, jobs):
+                try:
+                    digest = job.result() if job is not None \
+                        else file_hash(key[0], algorithm, partial)
+
+                except (IOError, OSError) as e:
+                    self.logger.warning('Could not hash %s' % key[0])
+                    self.logger.debug('Reason %s' % str(e))
+                    results[key[0]] = None
+                    continue
+
+                results[key[0]] = digest
+                entries.append(key + (label, digest))
+
+        finally:
+            if pool is not None:
+                pool.close()
+
+        if db is not None and entries:
+            db.hashcache_set(entries)
+
+        self.logger.debug('Hashed %d of %d file(s) (%s)' % (
+            len(pending), len(results), label))
+        return results
+
+    def hash_file(self, path, algorithm='md5', partial=None, use_cache=None):
+        """Returns the (hex) digest of the content of the file specified or
+           None if it could not be read; see hash_files().
+        """
+        return self.hash_files(
+            path, algorithm=algorithm, partial=partial, threads=1,
+            use_cache=use_cache).get(abspath(path))
+
+    def _get_files(self, search_dir, regex_filter=None, prefix_filter=None,
+                   suffix_filter=None, fullstats=False,
+                   followlinks=False, min_depth=None, max_depth=None,
+                   case_sensitive=False, skip_directories=SKIP_DIRECTORIES,
+                   threads=None, *args, **kwargs):
+        """Returns a dict object of the files found in the download
+           directory. You can additionally pass in filters as a list or
+           string) to filter the results returned.
+
+              ex:
+              {
+                 '/full/path/to/file.mkv': {
+                     'basename': 'file.mkv',
+                     'dirname': '/full/path/to',
+                     # identify the filename (without applied extension)
+                     'filename': 'file',
+                     # always tolower() applied to:
                      'extension': 'mkv',
 
                      # If fullstatus == True then the following additional
@@ -2755,35 +3482,146 @@ class ScriptBase(object):
                  }
               }
 
-        """
+           Each file's details are returned as a FileRecord object; it acts
+           just like the dictionary shown above but the datetime objects
+           are only created if you ask for them.
+
+           Set threads to the number of threads you'd like to walk the
+           directories with; this can greatly speed up the scanning of a
+           network (NFS, SMB, etc) or FUSE mounted file system where each
+           directory listing and stat() call is a round trip. The results
+           are identical either way.
 
-        # Internal Tracking of Directory Depth
-        current_depth = kwargs.get('__current_depth', 1)
+           See _iter_files() if you'd rather process the files as they're
+           found.
+        """
+        return dict(self._iter_files(
+            search_dir=search_dir,
+            regex_filter=regex_filter,
+            prefix_filter=prefix_filter,
+            suffix_filter=suffix_filter,
+            fullstats=fullstats,
+            followlinks=followlinks,
+            min_depth=min_depth,
+            max_depth=max_depth,
+            case_sensitive=case_sensitive,
+            skip_directories=skip_directories,
+            threads=threads,
+        ))
+
+    def _iter_files(self, search_dir, regex_filter=None, prefix_filter=None,
+                    suffix_filter=None, fullstats=False,
+                    followlinks=False, min_depth=None, max_depth=None,
+                    case_sensitive=False, skip_directories=SKIP_DIRECTORIES,
+                    threads=None, *args, **kwargs):
+        """A generator that yields a tuple of (fullpath, dict) for each file
+           found in the download directory; the dict is identical to the
+           one returned for each file by _get_files() and the same filters
+           apply.
+
+           Files are yielded as they're found (nothing is accumulated), so
+           you can stop iterating as soon as you've found what you're
+           looking for:
+
+              for path, meta in self.iter_files(suffix_filter='.nfo'):
+                  # We only need the first one
+                  break
+
+           Unlike _get_files(), a file may be yielded more than once if the
+           search directories specified overlap one another.
+        """
 
-        # Build file list
-        files = {}
         if isinstance(search_dir, (list, tuple)):
-            for _dir in search_dir:
-                # use recursion to build a master (unique) list
-                files.update(self._get_files(
-                    search_dir=_dir,
-                    regex_filter=regex_filter,
-                    prefix_filter=prefix_filter,
-                    suffix_filter=suffix_filter,
-                    fullstats=fullstats,
-                    followlinks=followlinks,
-                    min_depth=min_depth,
-                    max_depth=max_depth,
-                    case_sensitive=case_sensitive,
-                    skip_directories=skip_directories,
-                    # Internal Current Directory Depth tracking
-                    __current_depth=current_depth,
-                ))
-            return files
+            search_dirs = search_dir
+
+        elif isinstance(search_dir, six.string_types):
+            search_dirs = (search_dir, )
 
-        elif not isinstance(search_dir, six.string_types):
+        else:
             # Unsupported
-            return {}
+            return
+
+        # Our filters only need to be prepared once
+        file_filter = self._file_filter(
+            regex_filter, prefix_filter, suffix_filter,
+            case_sensitive=case_sensitive)
+
+        if file_filter is None:
+            # An invalid regular expression was specified
+            return
+
+        filters = dict(
+            file_filter=file_filter,
+            fullstats=fullstats,
+            followlinks=followlinks,
+            min_depth=min_depth,
+            max_depth=max_depth,
+            skip_directories=skip_directories,
+        )
+
+        for search_dir in search_dirs:
+            if not isinstance(search_dir, six.string_types):
+                # Unsupported
+                continue
+
+            # Ensure we're always dealing with an absolute path
+            search_dir = abspath(search_dir)
+
+            # noise reduction; only display this notice once (but not on
+            # each recursive call)
+            self.logger.debug("get_files('%s') with %d filter(s)" % (
+                search_dir, len(file_filter),
+            ))
+
+            if isfile(search_dir):
+                # The prefix and suffix filters applied to a file specified
+                # directly honor the case_sensitive flag
+                entry = self._file_entry(
+                    search_dir,
+                    file_filter=self._file_filter(
+                        regex_filter, prefix_filter, suffix_filter,
+                        case_sensitive=case_sensitive,
+                        ignore_case=not case_sensitive),
+                    fullstats=fullstats)
+
+                if entry is not None:
+                    yield entry
+                continue
+
+            elif not isdir(search_dir):
+                continue
+
+            for entry in self._iter_directory(
+                    normpath(search_dir), current_depth=2, threads=threads,
+                    **filters):
+                yield entry
+
+    def _file_filter(self, regex_filter=None, prefix_filter=None,
+                     suffix_filter=None, case_sensitive=False,
+                     ignore_case=False):
+        """Returns a FileFilter object prepared from the filters specified
+           (or None if an invalid regular expression was specified).
+
+           FileFilter objects are cached so the filters are only parsed and
+           compiled the first time they're referenced.
+        """
+        try:
+            key = (
+                _filter_key(regex_filter),
+                _filter_key(prefix_filter),
+                _filter_key(suffix_filter),
+                bool(case_sensitive),
+                bool(ignore_case),
+            )
+            file_filter = FILE_FILTER_CACHE.get(key)
+
+        except TypeError:
+            # Our filters can't be cached
+            key = None
+            file_filter = None
+
+        if file_filter is not None:
+            return file_filter
 
         # Change all filters strings lists (if they aren't already)
         if regex_filter is None:
@@ -2810,286 +3648,578 @@ class ScriptBase(object):
             suffix_filter = self.parse_list(suffix_filter)
 
         # Precompile any defined regex definitions
-        if regex_filter:
-            _filters = []
-            for f in regex_filter:
-                if not isinstance(f, re_pattern_type):
-                    flags = re.MULTILINE
-                    if not case_sensitive:
-                        flags |= re.IGNORECASE
-                    try:
-                        _filters.append(re.compile(f, flags=flags))
-                        self.logger.vdebug('Compiled regex "%s"' % f)
-                    except:
-                        self.logger.error(
-                            'Invalid regular expression: "%s"' % f,
-                        )
-                        return {}
-                else:
-                    # precompiled already
-                    _filters.append(f)
-            # apply
-            regex_filter = _filters
+        _filters = []
+        for f in regex_filter:
+            if not isinstance(f, re_pattern_type):
+                flags = re.MULTILINE
+                if not case_sensitive:
+                    flags |= re.IGNORECASE
+                try:
+                    _filters.append(re.compile(f, flags=flags))
+                    self.logger.vdebug('Compiled regex "%s"' % f)
+                except:
+                    self.logger.error(
+                        'Invalid regular expression: "%s"' % f,
+                    )
+                    return None
+            else:
+                # precompiled already
+                _filters.append(f)
+
+        file_filter = FileFilter(
+            regex_filter=_filters,
+            prefix_filter=prefix_filter,
+            suffix_filter=suffix_filter,
+            ignore_case=ignore_case,
+        )
 
-        if current_depth == 1:
-            # Ensure we're always dealing with an absolute path
-            search_dir = abspath(search_dir)
+        if key is not None:
+            if len(FILE_FILTER_CACHE) >= FILE_FILTER_CACHE_SIZE:
+                # Keep our cache from growing out of control
+                FILE_FILTER_CACHE.clear()
+            FILE_FILTER_CACHE[key] = file_filter
 
-            # noise reduction; only display this notice once (but not on
-            # each recursive call)
-            self.logger.debug("get_files('%s') with %d filter(s)" % (
-                search_dir,
-                len(prefix_filter) + len(suffix_filter) + len(regex_filter),
-            ))
+        return file_filter
+
+    def _file_entry(self, search_dir, file_filter, fullstats, **kwargs):
+        """Returns a tuple of (fullpath, dict) for the (single) file
+           specified by search_dir if it passes our (prepared) filters,
+           otherwise None is returned.
+        """
+        fname = basename(search_dir)
+        dname = abspath(dirname(search_dir))
+        if file_filter and not file_filter.match(fname):
+            # File does not meet implied filters
+            self.logger.vdebug('Denied %s' % fname)
+            return None
+
+        # Update our search_dir
+        search_dir = join(dname, fname)
+
+        # If we reach here, we can prepare a file using the data
+        # we fetch
+        stat_obj = None
+        if fullstats:
+            # Extend file information
+            try:
+                stat_obj = stat(search_dir)
+            except OSError:
+                # File was not found or recently removed
+                self.logger.warning(
+                    'The file %s became inaccessible' % fname,
+                )
+                return None
+
+        return (search_dir, FileRecord(fname, dname, stat_obj))
 
-        if not dirname(search_dir):
-            search_dir = join(self.curdir, search_dir)
-
-        if isfile(search_dir):
-            fname = basename(search_dir)
-            dname = abspath(dirname(search_dir))
-            filtered = False
-            if regex_filter:
-                filtered = True
-                for regex in regex_filter:
-                    if regex.search(fname):
-                        self.logger.debug('Allowed %s (regex)' % fname)
-                        filtered = False
+    def _iter_directory(self, search_dir, current_depth, threads=None,
+                        **filters):
+        """A generator that yields a tuple of (fullpath, dict) for each file
+           found within the directory specified (and it's sub-directories)
+           using our (prepared) filters.
+
+           The directory tree is walked (depth first) using a stack of the
+           directories we're in the middle of; no matter how deep the tree
+           is, we never recurse.
+
+           If threads is greater than 1, the sub-directories are listed (and
+           their files stat()'ed) ahead of time using a pool of that many
+           threads.  The results (and the order they are yielded in) are
+           identical to those of the serial walk.
+        """
+        pool = None
+        if threads and threads > 1:
+            pool = ThreadPool(threads)
+
+        def prefetch(entries, depth):
+            # Queue the listing of each sub-directory found; they're queued
+            # in reverse so that the first one we'll need is started first
+            jobs = {}
+            if pool is not None:
+                for fullpath, _file in reversed(entries):
+                    if _file is None:
+                        jobs[fullpath] = pool.submit(
+                            list, self._scan_directory(
+                                fullpath, depth + 1, **filters))
+            return jobs
+
+        try:
+            entries = self._scan_directory(
+                search_dir, current_depth, **filters)
+            if pool is not None:
+                entries = list(entries)
+
+            # Each entry is a tuple of the (remaining) entries of the
+            # directory, the listings queued for it's sub-directories and
+            # it's depth
+            stack = [
+                (iter(entries), prefetch(entries, current_depth),
+                 current_depth)]
+
+            while stack:
+                entries, jobs, depth = stack[-1]
+                for fullpath, _file in entries:
+                    if _file is None:
+                        # walk our sub-directory
+                        job = jobs.pop(fullpath, None)
+                        _entries = job.result() if job is not None \
+                            else self._scan_directory(
+                                fullpath, depth + 1, **filters)
+
+                        stack.append((
+                            iter(_entries), prefetch(_entries, depth + 1),
+                            depth + 1))
                         break
-                if filtered:
-                    self.logger.vdebug('Denied %s (regex)' % fname)
-
-            if not filtered and prefix_filter:
-                filtered = True
-                for prefix in prefix_filter:
-                    if case_sensitive:
-                        if fname[0:len(prefix)] == prefix:
-                            self.logger.debug('Allowed %s (prefix)' % fname)
-                            filtered = False
-                            break
-                    else:
-                        # Not Case Sensitive
-                        if fname[0:len(prefix)].lower() == prefix.lower():
-                            self.logger.debug('Allowed %s (prefix)' % fname)
-                            filtered = False
-                            break
-                if filtered:
-                    self.logger.vdebug('Denied %s (prefix)' % fname)
-
-            if not filtered and suffix_filter:
-                filtered = True
-                for suffix in suffix_filter:
-                    if case_sensitive:
-                        if fname[-len(suffix):] == suffix:
-                            self.logger.vdebug('Allowed %s (suffix)' % fname)
-                            filtered = False
-                            break
-                    else:
-                        # Not Case Sensitive
-                        if fname[-len(suffix):].lower() == suffix.lower():
-                            self.logger.debug('Allowed %s (suffix)' % fname)
-                            filtered = False
-                            break
-                if filtered:
-                    self.logger.vdebug('Denied %s (suffix)' % fname)
-
-            if filtered:
-                # File does not meet implied filters
-                return {}
 
-            # Update our search_dir
-            search_dir = join(dname, fname)
-
-            # If we reach here, we can prepare a file using the data
-            # we fetch
-            _file = {
-                search_dir: {
-                    'basename': fname,
-                    'dirname': dname,
-                    'extension': splitext(basename(fname))[1].lower(),
-                    'filename': splitext(basename(fname))[0],
-                }
-            }
-            if fullstats:
-                # Extend file information
-                try:
-                    stat_obj = stat(search_dir)
-                except OSError:
-                    # File was not found or recently removed
-                    del files[search_dir]
-                    self.logger.warning(
-                        'The file %s became inaccessible' % fname,
-                    )
-                    return {}
-                try:
-                    _file[search_dir]['modified'] = \
-                        datetime.fromtimestamp(stat_obj[ST_MTIME])
-                except ValueError:
-                    _file[search_dir]['modified'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
-                try:
-                    _file[search_dir]['accessed'] = \
-                        datetime.fromtimestamp(stat_obj[ST_ATIME])
-                except ValueError:
-                    _file[search_dir]['accessed'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
-                try:
-                    _file[search_dir]['created'] = \
-                        datetime.fromtimestamp(stat_obj[ST_CTIME])
-                except ValueError:
-                    _file[search_dir]['created'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
+                    yield (fullpath, _file)
 
-                _file[search_dir]['filesize'] = stat_obj[ST_SIZE]
-            return _file
+                else:
+                    # We're done with this directory
+                    stack.pop()
 
-        elif not isdir(search_dir):
-            return {}
+        finally:
+            if pool is not None:
+                pool.close()
+
+    def _skip_directory(self, entry, followlinks, skip_directories):
+        """Returns True if the directory (entry) specified should not be
+           walked.
+        """
+        # Handle skip_directory directive
+        if (isinstance(skip_directories, list) and
+                entry.name in skip_directories) or \
+                (skip_directories and entry.name in SKIP_DIRECTORIES):
+            self.logger.vdebug(
+                'Skipping directory %s' % entry.name,
+            )
+            return True
 
-        # For depth matching
-        search_dir = normpath(search_dir)
-        current_depth += 1
+        if not followlinks and entry.is_symlink():
+            # honor followlinks
+            self.logger.vdebug(
+                'Skipping (link) directory %s' % entry.name,
+            )
+            return True
+
+        return False
+
+    def _scan_directory(self, search_dir, current_depth, file_filter,
+                        fullstats, followlinks, min_depth, max_depth,
+                        skip_directories):
+        """A generator that yields a tuple of (fullpath, dict) for each file
+           found within the directory specified that passes our (prepared)
+           filters.  Each sub-directory that should be walked is yielded
+           (where it was found) as a (fullpath, None) tuple.
+        """
         self.logger.vdebug('Directory depth offset %d' % current_depth)
 
         try:
-            # Get Directory entries
-            dirents = \
-                [d for d in listdir(search_dir) if d not in ('..', '.')]
+            # Get Directory entries; the file type (and on some platforms
+            # the stat() information) of each entry comes along with it
+            # saving us from looking it up again
+            entries = scandir(search_dir)
 
         except OSError as e:
             # Uh oh, we have no access to the directories
             self.logger.error('Could not access %s' % search_dir)
             self.logger.error('Reason %s' % str(e))
-            return {}
+            return
 
-        for dirent in dirents:
+        # scandir() reads the whole directory up front; but we drop each
+        # entry (along with the stat() information it caches) as soon as
+        # we're done with it rather than holding on to the listing while
+        # we walk the sub-directories found in it
+        entries.reverse()
+        while entries:
+            entry = entries.pop()
             # Store Path
+            dirent = entry.name
             fullpath = join(search_dir, dirent)
 
-            if isdir(fullpath):
+            if entry.is_dir():
                 # Min and Max depth handling
                 if max_depth and max_depth < current_depth:
                     continue
                 if min_depth and min_depth > current_depth:
                     continue
 
-                # Handle skip_directory directive
-                if (isinstance(skip_directories, list) and
-                        dirent in skip_directories) or \
-                        (skip_directories and dirent in SKIP_DIRECTORIES):
-                    self.logger.vdebug(
-                        'Skipping directory %s' % dirent,
-                    )
+                if self._skip_directory(
+                        entry, followlinks, skip_directories):
                     continue
 
-                if not followlinks and islink(fullpath):
-                    # honor followlinks
-                    self.logger.vdebug(
-                        'Skipping (link) directory %s' % dirent,
-                    )
-                    continue
-
-                # use recursion to build a master (unique) list
-                files.update(self._get_files(
-                    search_dir=fullpath,
-                    regex_filter=regex_filter,
-                    prefix_filter=prefix_filter,
-                    suffix_filter=suffix_filter,
-                    fullstats=fullstats,
-                    followlinks=followlinks,
-                    min_depth=min_depth,
-                    max_depth=max_depth,
-                    case_sensitive=case_sensitive,
-                    skip_directories=skip_directories,
-                    # Internal Current Directory Depth tracking
-                    __current_depth=current_depth,
-                ))
+                # This sub-directory is walked next
+                yield (fullpath, None)
                 continue
 
-            elif not isfile(fullpath):
+            elif not entry.is_file():
                 self.logger.vdebug(
                     'Skipping unknown %s' % dirent,
                 )
                 continue
 
-            filtered = False
+            if file_filter and not file_filter.match(dirent):
+                # File does not meet implied filters
+                self.logger.vdebug('Denied %s' % dirent)
+                continue
 
-            # Apply filters to match filed
-            if regex_filter:
-                filtered = True
-                for regex in regex_filter:
-                    if regex.search(dirent):
-                        self.logger.debug('Allowed %s (regex)' % dirent)
-                        filtered = False
-                        break
-                if filtered:
-                    self.logger.vdebug('Denied %s (regex)' % dirent)
+            # If we reach here, we found a file
+            stat_obj = None
+            if fullstats:
+                # Extend file information
+                try:
+                    stat_obj = entry.stat()
+                except OSError:
+                    # File was not found or recently removed
+                    self.logger.warning(
+                        'The file %s became inaccessible' % dirent,
+                    )
                     continue
 
-            if not filtered and prefix_filter:
-                filtered = True
-                for prefix in prefix_filter:
-                    if dirent[0:len(prefix)] == prefix:
-                        self.logger.debug('Allowed %s (prefix)' % dirent)
-                        filtered = False
-                        break
-                if filtered:
-                    self.logger.vdebug('Denied %s (prefix)' % dirent)
+            yield (fullpath, FileRecord(dirent, search_dir, stat_obj))
+
+    def disk_usage(self, search_dir=None, followlinks=False,
+                   skip_directories=SKIP_DIRECTORIES, threads=None,
+                   use_cache=True):
+        """Returns the disk usage of the directory specified (defaults to
+           our download directory) and each of it's sub-directories; each
+           total includes everything found beneath it (just like du):
+
+              {
+                  '/full/path/to': {
+                      # The number of files and sub-directories
+                      'files': 3,
+                      'directories': 1,
+                      # The (apparent) size of the files
+                      'bytes': 1073741924,
+                      # The space actually allocated for them on disk
+                      'allocated': 1073750016,
+                  },
+                  '/full/path/to/subs': {
+                      'files': 2,
+                      'directories': 0,
+                      'bytes': 100,
+                      'allocated': 8192,
+                  },
+              }
+
+           A hard linked file is counted each time it's found.  Set threads
+           to the number of threads you'd like to scan the directories with
+           (see get_files()).
+
+           The results are kept so that further calls (such as the ones
+           made by health checks and reporting) don't need to walk the
+           directories again; set use_cache to False to force a new scan.
+           An empty dictionary is returned if the directory can't be
+           accessed.
+        """
+        if search_dir is None:
+            search_dir = getattr(self, 'directory', None)
+            if not search_dir:
+                return {}
+
+        root = normpath(abspath(search_dir))
+        key = (
+            root, bool(followlinks),
+            _filter_key(skip_directories) if isinstance(
+                skip_directories, (list, tuple)) else bool(skip_directories),
+        )
+        if use_cache and key in self._disk_usage:
+            return self._disk_usage[key]
+
+        if not isdir(root):
+            self.logger.warning('Could not access %s' % root)
+            return {}
+
+        pool = None
+        if threads and threads > 1:
+            pool = ThreadPool(threads)
+
+        def scan(path):
+            if pool is None:
+                return None
+            return pool.submit(
+                self._disk_usage_scan, path, followlinks, skip_directories)
+
+        # Every directory found (parents before their children)
+        found = []
+        totals = {}
+        try:
+            pending = [(root, None, scan(root))]
+            while pending:
+                path, parent, job = pending.pop()
+                usage, subdirs = job.result() if job is not None else \
+                    self._disk_usage_scan(
+                        path, followlinks, skip_directories)
+
+                totals[path] = usage
+                found.append((path, parent))
+                for subdir in reversed(subdirs):
+                    pending.append((subdir, path, scan(subdir)))
+
+        finally:
+            if pool is not None:
+                pool.close()
+
+        # Add the totals of each directory to those of it's parent
+        for path, parent in reversed(found):
+            if parent is not None:
+                usage = totals[parent]
+                for no, value in enumerate(totals[path]):
+                    usage[no] += value
+                # the directory itself
+                usage[1] += 1
+
+        results = dict(
+            (path, {
+                'files': usage[0],
+                'directories': usage[1],
+                'bytes': usage[2],
+                'allocated': usage[3],
+            }) for path, usage in totals.items())
+
+        self._disk_usage[key] = results
+        return results
+
+    def _disk_usage_scan(self, path, followlinks, skip_directories):
+        """Returns a tuple of the usage ([files, directories, bytes,
+           allocated]) of the files found directly within the directory
+           specified and a list of the sub-directories found in it.
+        """
+        usage = [0, 0, 0, 0]
+        subdirs = []
+        try:
+            entries = scandir(path)
+
+        except OSError as e:
+            self.logger.error('Could not access %s' % path)
+            self.logger.error('Reason %s' % str(e))
+            return usage, subdirs
+
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not self._skip_directory(
+                            entry, followlinks, skip_directories):
+                        subdirs.append(join(path, entry.name))
                     continue
 
-            if not filtered and suffix_filter:
-                filtered = True
-                for suffix in suffix_filter:
-                    if dirent[-len(suffix):] == suffix:
-                        self.logger.debug('Allowed %s (suffix)' % dirent)
-                        filtered = False
-                        break
-                if filtered:
-                    self.logger.vdebug('Denied %s (suffix)' % dirent)
+                elif not entry.is_file():
                     continue
 
-            # If we reach here, we store the file found
-            files[fullpath] = {
-                'basename': dirent,
-                'dirname': search_dir,
-                'extension': splitext(basename(dirent))[1].lower(),
-                'filename': splitext(basename(dirent))[0],
-            }
+                stat_obj = entry.stat()
+
+            except OSError:
+                # File was not found or recently removed
+                continue
+
+            usage[0] += 1
+            usage[2] += stat_obj.st_size
+            # st_blocks is always in 512 byte units (but isn't available on
+            # all platforms)
+            blocks = getattr(stat_obj, 'st_blocks', None)
+            usage[3] += blocks * 512 if blocks is not None \
+                else stat_obj.st_size
+
+        return usage, subdirs
+
+    def get_file_changes(self, search_dir, followlinks=False,
+                         skip_directories=SKIP_DIRECTORIES, verify=False,
+                         use_cache=None):
+        """Compares the directory tree specified against the snapshot taken
+           of it the last time this function was called and returns what
+           has changed since:
+
+              {
+                  # The files added (and modified); their FileRecord
+                  # objects (as get_files() returns with fullstats set)
+                  'added': {'/full/path/to/file.mkv': FileRecord(), },
+                  'modified': {},
+
+                  # The paths of the files since removed
+                  'removed': ['/full/path/to/old.mkv', ],
+              }
+
+           The snapshot is then updated to reflect the current state of the
+           directory tree; on the first call every file is returned as
+           having been added.
+
+           Directories whose modification time (mtime) hasn't changed are
+           not read again; we just stat() the sub-directories recorded for
+           them.  A run where nothing changed costs roughly one stat() per
+           directory.  A file rewritten in place (without being renamed or
+           replaced) doesn't change the mtime of it's directory; set verify
+           to True to stat() every file in the tree to catch this too.
+
+           Snapshots are stored in our database (and are bound to our
+           database_key); a script without a database_key has to set
+           use_cache to True to have it's snapshots stored in the shared
+           database instead.  None is returned if the database isn't
+           available.
+        """
+        db = self._get_nzbcache(use_cache)
+        if db is None:
+            self.logger.warning(
+                'Snapshots of %s are not possible; the database is '
+                'unavailable.' % search_dir)
+            return None
+
+        root = normpath(abspath(search_dir))
+        changes = {'added': {}, 'modified': {}, 'removed': []}
+
+        # The snapshot entries to write and remove
+        entries = []
+        removed = []
+
+        def forget(path, is_dir):
+            # Track the removal of a path (and everything beneath it)
+            removed.append(path)
+            if not is_dir:
+                changes['removed'].append(path)
+                return
+
+            stack = [path]
+            while stack:
+                for _path, _entry in \
+                        db.snapshot_entries(root, stack.pop()).items():
+                    if _entry[0]:
+                        stack.append(_path)
+                    else:
+                        changes['removed'].append(_path)
+
+        recorded = db.snapshot_entries(root, '').get(root)
+        try:
+            stat_obj = stat(root)
+            if not S_ISDIR(stat_obj.st_mode):
+                raise OSError('%s is not a directory' % root)
+
+        except OSError as e:
+            self.logger.warning('Could not access %s' % root)
+            self.logger.debug('Reason %s' % str(e))
+            if recorded is not None:
+                # Our directory tree is gone
+                forget(root, True)
+                db.snapshot_update(root, removed=removed)
+            return changes
+
+        # Our stack of directories to check; each is a tuple of
+        # (path, parent, stat_obj, recorded)
+        stack = [(root, '', stat_obj, recorded)]
+        while stack:
+            path, parent, stat_obj, recorded = stack.pop()
+
+            children = {}
+            if recorded is not None:
+                if recorded[0] and recorded[1] == stat_obj.st_ino and \
+                        recorded[3] == stat_obj.st_mtime:
+                    # Nothing was added, removed or renamed in this
+                    # directory; we only need to check it's sub-directories
+                    # (the files within it are assumed to be unchanged
+                    # unless we're verifying them)
+                    children = db.snapshot_entries(
+                        root, path, directories_only=not verify)
+
+                    for _path, _entry in children.items():
+                        try:
+                            _stat_obj = stat(_path)
+
+                        except OSError:
+                            # It's since been removed
+                            forget(_path, _entry[0])
+                            continue
+
+                        if _entry[0]:
+                            stack.append((_path, path, _stat_obj, _entry))
+
+                        elif verify and (_entry[1], _entry[2], _entry[3]) != (
+                                _stat_obj.st_ino, _stat_obj[ST_SIZE],
+                                _stat_obj.st_mtime):
+                            changes['modified'][_path] = FileRecord(
+                                basename(_path), path, _stat_obj)
+                            entries.append((
+                                _path, path, 0, _stat_obj.st_ino,
+                                _stat_obj[ST_SIZE], _stat_obj.st_mtime))
+                    continue
+
+                children = db.snapshot_entries(root, path)
+
+            try:
+                dir_entries = scandir(path)
+
+            except OSError as e:
+                # We'll try again next time
+                self.logger.error('Could not access %s' % path)
+                self.logger.error('Reason %s' % str(e))
+                continue
+
+            entries.append((
+                path, parent, 1, stat_obj.st_ino, 0, stat_obj.st_mtime))
+
+            found = set()
+            for entry in dir_entries:
+                _path = join(path, entry.name)
+                _entry = children.get(_path)
 
-            if fullstats:
-                # Extend file information
                 try:
-                    stat_obj = stat(fullpath)
+                    if entry.is_dir():
+                        if self._skip_directory(
+                                entry, followlinks, skip_directories):
+                            continue
+
+                        if _entry is not None and not _entry[0]:
+                            # A file was replaced by a directory
+                            forget(_path, False)
+                            _entry = None
+
+                        found.add(_path)
+                        stack.append((_path, path, entry.stat(), _entry))
+                        continue
+
+                    elif not entry.is_file():
+                        continue
+
+                    _stat_obj = entry.stat()
+
                 except OSError:
                     # File was not found or recently removed
-                    del files[fullpath]
-                    self.logger.warning(
-                        'The file %s became inaccessible' % dirent,
-                    )
                     continue
 
-                try:
-                    files[fullpath]['modified'] = \
-                        datetime.fromtimestamp(stat_obj[ST_MTIME])
-                except ValueError:
-                    files[fullpath]['modified'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
-                try:
-                    files[fullpath]['accessed'] = \
-                        datetime.fromtimestamp(stat_obj[ST_ATIME])
-                except ValueError:
-                    files[fullpath]['accessed'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
-                try:
-                    files[fullpath]['created'] = \
-                        datetime.fromtimestamp(stat_obj[ST_CTIME])
-                except ValueError:
-                    files[fullpath]['created'] = \
-                        datetime(1980, 1, 1, 0, 0, 0, 0)
+                found.add(_path)
+                if _entry is not None and _entry[0]:
+                    # A directory was replaced by a file
+                    forget(_path, True)
+                    _entry = None
+
+                if _entry is None:
+                    changes['added'][_path] = \
+                        FileRecord(entry.name, path, _stat_obj)
+
+                elif (_entry[1], _entry[2], _entry[3]) != (
+                        _stat_obj.st_ino, _stat_obj[ST_SIZE],
+                        _stat_obj.st_mtime):
+                    changes['modified'][_path] = \
+                        FileRecord(entry.name, path, _stat_obj)
+
+                else:
+                    # Unchanged
+                    continue
+
+                entries.append((
+                    _path, path, 0, _stat_obj.st_ino, _stat_obj[ST_SIZE],
+                    _stat_obj.st_mtime))
+
+            for _path, _entry in children.items():
+                if _path not in found:
+                    forget(_path, _entry[0])
+
+        if entries or removed:
+            db.snapshot_update(root, entries=entries, removed=removed)
 
-                files[fullpath]['filesize'] = stat_obj[ST_SIZE]
-        # Return all files
-        return files
+        self.logger.debug(
+            'Snapshot of %s; %d added, %d modified, %d removed' % (
+                root, len(changes['added']), len(changes['modified']),
+                len(changes['removed'])))
+
+        return changes
 
     def run(self, *args, **kwargs):
         """The intent is this is the script you run from within your script
@@ -3140,6 +4270,14 @@ class ScriptBase(object):
                     ''.join('  ' + line for line in lines))
             exit_code = EXIT_CODE.FAILURE
 
+        try:
+            # Write anything we queued in write-behind mode
+            self.flush_writes()
+
+        except Exception as e:
+            self.logger.warning('Failed to flush database writes.')
+            self.logger.debug('Flush exception: %s' % str(e))
+
         # Handle tidying of PID-File if it exists
         if isinstance(self.pidfile, six.string_types):
             if self.is_unique_instance(die_on_fail=False, verbose=False):
@@ -3457,6 +4595,7 @@ class ScriptBase(object):
         # Handle other types
         return bool(arg)
 
+    @mode_signature(TEST_COMMAND, verify=True)
     def action_sanity_check(self):
         """Sanity checking to ensure this really is a Config Test
         """
@@ -3532,20 +4671,86 @@ class ScriptBase(object):
         # If we reach here, self.script_mode is invalid and/or is not
         # set; we need to detect it's value
         if len(self.script_dict.keys()):
-            for k in [v for v in SCRIPT_MODES
-                      if v in list(self.script_dict.keys()) + [
-                          SCRIPT_MODE.CONFIG_ACTION, SCRIPT_MODE.NONE, ]]:
-
-                if hasattr(self, '%s_%s' % (k, 'sanity_check')):
-                    if getattr(self, '%s_%s' % (k, 'sanity_check'))():
-                        self.script_mode = k
-                        if self.script_mode != SCRIPT_MODE.NONE:
-                            return self.script_mode
+            for k, verified in self._detect_mode_candidates():
+                if verified or getattr(self, '%s_%s' % (k, 'sanity_check'))():
+                    self.script_mode = k
+                    if self.script_mode != SCRIPT_MODE.NONE:
+                        return self.script_mode
 
         # Undetected; assume NONE
         self.script_mode = SCRIPT_MODE.NONE
         return self.script_mode
 
+    def _detect_mode_candidates(self):
+        """
+        Returns a list of (mode, verified) tuples identifying (in order) the
+        script modes that could apply to the current environment.
+
+        The sanity checks decorated with a mode_signature() are resolved from
+        the environment variables they identify; if verified is set to True,
+        then there is no need to call the sanity check at all.  All other
+        sanity checks (such as the ones you overload yourself) are returned
+        with verified set to False so that they can be called.
+        """
+        modes = tuple(v for v in SCRIPT_MODES
+                      if v in list(self.script_dict.keys()) + [
+                          SCRIPT_MODE.CONFIG_ACTION, SCRIPT_MODE.NONE, ])
+
+        cache_key = (type(self), modes)
+        try:
+            checks, keys = MODE_DETECTION_CACHE[cache_key]
+
+        except KeyError:
+            # Build our table of sanity checks and the environment
+            # variables they reference
+            checks = []
+            keys = set()
+            for k in modes:
+                check = getattr(
+                    type(self), '%s_%s' % (k, 'sanity_check'), None)
+                if check is None:
+                    continue
+
+                signature = getattr(check, 'mode_signature', None)
+                if signature:
+                    keys.add(signature[0])
+                    keys.update(signature[1])
+
+                checks.append((k, signature))
+
+            checks, keys = MODE_DETECTION_CACHE[cache_key] = \
+                (tuple(checks), tuple(keys))
+
+        # Our environment signature
+        signature = frozenset(k for k in keys if k in environ)
+
+        cache_key = (type(self), modes, signature)
+        try:
+            return MODE_DETECTION_CACHE[cache_key]
+
+        except KeyError:
+            pass
+
+        candidates = []
+        for k, mode_sig in checks:
+            if not mode_sig:
+                # We have no choice but to call the sanity check
+                candidates.append((k, False))
+                continue
+
+            required, excluded, verify = mode_sig
+            if required not in signature or signature.intersection(excluded):
+                # This mode doesn't apply
+                continue
+
+            candidates.append((k, not verify))
+            if not verify:
+                # Nothing past this point would ever be reached
+                break
+
+        MODE_DETECTION_CACHE[cache_key] = candidates
+        return candidates
+
     def signal_quit(self, signum, frame):
         """
         Quit signal received
@@ -3564,6 +4769,16 @@ class ScriptBase(object):
                 self, '%s_%s' % (self.script_mode, 'signal_quit'))
             signal_function()
 
+        database = self._get_database() if self._pending_writes else None
+        if database is not None and not database._transactions:
+            # Write anything we queued in write-behind mode; if we're in the
+            # middle of a transaction then run() takes care of it instead
+            try:
+                self.flush_writes()
+
+            except Exception:
+                pass
+
         self.logger.info('Quit Signal Received; Exiting.')
         self.logger.debug('%d Signal Received.' % signum)
         raise NZBGetExitException
@@ -15,14 +15,40 @@
 # GNU Lesser General Public License for more details.
 #
 import re
+import sys
+import six
+from threading import Thread
+from threading import Event
+from six.moves.queue import LifoQueue
+from os import stat
+from os import lstat
+from os import listdir
+from os import fstat
+from os.path import join
 from os.path import expanduser
+from stat import S_ISDIR
+from stat import S_ISREG
+from stat import S_ISLNK
 
 try:
-    from xml.sax.saxutils import unescape
-    SAX_UNESCAPE = True
+    # Python v3.5+
+    from os import scandir as _scandir
+
 except ImportError:
-    SAX_UNESCAPE = False
-    from HTMLParser import HTMLParser
+    try:
+        # Python v2.7 with the scandir package installed
+        from scandir import scandir as _scandir
+
+    except ImportError:
+        # Fall back to our listdir() based implementation
+        _scandir = None
+
+# Files smaller than this are read (instead of being memory mapped) when
+# they're hashed
+HASH_MMAP_MIN_SIZE = 1024 * 1024
+
+# The size of the blocks read from a file when hashing it
+HASH_CHUNK_SIZE = 1024 * 1024
 
 # Pre-Escape content since we reference it so much
 ESCAPED_PATH_SEPARATOR = re.escape('\\/')
@@ -110,6 +136,272 @@ def unescape_xml(content):
     Escapes XML content into it's regular string value
     """
 
-    if SAX_UNESCAPE:
+    # xml.sax.saxutils pulls in urllib (and with it ssl) so it's only
+    # imported when it's needed
+    try:
+        from xml.sax.saxutils import unescape
         return unescape(content)
-    return HTMLParser().unescape(content)
+
+    except ImportError:
+        from HTMLParser import HTMLParser
+        return HTMLParser().unescape(content)
+
+
+class ListDirEntry(object):
+    """
+    A (slower) stand-in for os.DirEntry used when os.scandir() isn't
+    available; the stat() information is looked up once when it's first
+    needed and reused from then on.
+    """
+    __slots__ = ('name', 'path', '_stat', '_lstat')
+
+    def __init__(self, path, name):
+        self.name = name
+        self.path = join(path, name)
+        self._stat = None
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = lstat(self.path)
+            return self._lstat
+
+        if self._stat is None:
+            self._stat = stat(self.path)
+        return self._stat
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return S_ISDIR(self.stat(follow_symlinks=follow_symlinks).st_mode)
+
+        except OSError:
+            return False
+
+    def is_file(self, follow_symlinks=True):
+        try:
+            return S_ISREG(self.stat(follow_symlinks=follow_symlinks).st_mode)
+
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        try:
+            return S_ISLNK(self.stat(follow_symlinks=False).st_mode)
+
+        except OSError:
+            return False
+
+
+def scandir(path):
+    """
+    Returns a list of the entries found in the directory specified as
+    os.DirEntry objects (or an equivalent).
+
+    The file type (and on some platforms the stat() information) of each
+    entry is returned by the operating system while the directory is read
+    which saves us from looking each one up again afterwards.  os.scandir()
+    is used if it's available (Python v3.5+ or the scandir package);
+    otherwise we fall back to listdir().
+
+    The directory is read in full (and closed) before we return; so
+    nothing is held open while the caller walks the directories beneath
+    it.  All of the entries are in memory at once as a result.
+
+    OSError is thrown if the directory can not be read.
+    """
+    if _scandir is not None:
+        return list(_scandir(path))
+
+    return [ListDirEntry(path, name) for name in listdir(path)
+            if name not in ('..', '.')]
+
+
+class ThreadJob(object):
+    """
+    A function call submitted to a ThreadPool; result() blocks until it has
+    been run and returns whatever it returned (or re-throws the exception
+    it threw).
+    """
+    __slots__ = ('fn', 'args', 'kwargs', '_done', '_result', '_exc_info')
+
+    def __init__(self, fn, *args, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self._done = Event()
+        self._result = None
+        self._exc_info = None
+
+    def run(self):
+        try:
+            self._result = self.fn(*self.args, **self.kwargs)
+
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+        finally:
+            # We no longer need these
+            self.fn = self.args = self.kwargs = None
+            self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+        return self._result
+
+
+class ThreadPool(object):
+    """
+    A minimal pool of threads to run jobs on.
+
+    The most recently submitted job is always started first; a caller
+    walking a directory tree depth first can queue each directory's
+    sub-directories (in reverse) as soon as it has them and the pool will
+    list them in the very order they'll be needed in.
+
+    This is only worth while when each call spends it's time waiting on
+    I/O (such as a directory listing on a NFS or FUSE mount).
+    """
+
+    def __init__(self, threads):
+        self._jobs = LifoQueue()
+        self._threads = []
+        for _ in range(max(1, threads)):
+            thread = Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) to be run and returns it's ThreadJob
+        """
+        job = ThreadJob(fn, *args, **kwargs)
+        self._jobs.put(job)
+        return job
+
+    def close(self):
+        """
+        Stops our threads; jobs that have not been started yet are never
+        run.
+        """
+        for _ in self._threads:
+            # Our stop requests are the most recent jobs so they're picked
+            # up next
+            self._jobs.put(None)
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            job.run()
+
+
+class CRC32(object):
+    """
+    A hashlib style wrapper to zlib.crc32()
+    """
+    __slots__ = ('_crc', )
+
+    def __init__(self):
+        self._crc = 0
+
+    def update(self, data):
+        # Only loaded if it's needed
+        import zlib
+
+        self._crc = zlib.crc32(data, self._crc)
+
+    def hexdigest(self):
+        return '%08x' % (self._crc & 0xffffffff)
+
+
+def hash_object(algorithm):
+    """
+    Returns a new (hashlib style) hash object for the algorithm specified;
+    anything hashlib supports (md5, sha1, sha256, etc) as well as crc32
+    and the xxHash algorithms (xxh32, xxh64, xxh3_64, etc) if the xxhash
+    package is installed.
+
+    ValueError is thrown if the algorithm is not supported.
+    """
+    if algorithm == 'crc32':
+        return CRC32()
+
+    if algorithm.startswith('xxh'):
+        try:
+            # xxHash support is optional
+            import xxhash
+
+        except ImportError:
+            xxhash = None
+
+        if xxhash is None or not hasattr(xxhash, algorithm):
+            raise ValueError('Unsupported hash type %s' % algorithm)
+        return getattr(xxhash, algorithm)()
+
+    # Only loaded if it's needed
+    import hashlib
+
+    return hashlib.new(algorithm)
+
+
+def file_hash(path, algorithm='md5', partial=None):
+    """
+    Returns the (hex) digest of the content of the file specified.
+
+    If partial is set, only the first and last partial bytes of the file
+    are hashed; a quick way of telling large files apart.  Files no larger
+    than twice this size are hashed in full.
+
+    Large files are memory mapped (and hashed in one go) if possible;
+    hashlib releases the GIL while doing so which allows several files to
+    be hashed at once using threads.
+
+    IOError (OSError) is thrown if the file can't be read and ValueError if
+    the algorithm is not supported.
+    """
+    hasher = hash_object(algorithm)
+    with open(path, 'rb') as f:
+        size = fstat(f.fileno()).st_size
+        if partial and size > partial * 2:
+            hasher.update(f.read(partial))
+            f.seek(-partial, 2)
+            hasher.update(f.read(partial))
+            return hasher.hexdigest()
+
+        if size >= HASH_MMAP_MIN_SIZE:
+            # Only loaded if it's needed
+            import mmap
+
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            except (EnvironmentError, ValueError, OverflowError):
+                # The file can't be memory mapped (32-bit systems, special
+                # file systems, etc); we'll read it instead
+                mapped = None
+
+            if mapped is not None:
+                try:
+                    hasher.update(mapped)
+
+                finally:
+                    mapped.close()
+
+                return hasher.hexdigest()
+
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
@@ -0,0 +1,429 @@
+# -*- encoding: utf-8 -*-
+#
+# A resident (warm) worker that keeps NZBGet scripts loaded between events
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+NZBGet starts a new Python interpreter for every event it passes along to
+a script (every queue event, scan and post-process).  Each time we pay for
+the interpreter start up, the imports and our ScriptBase initialization
+before main() is ever reached.
+
+This (opt-in) worker keeps your script class loaded and listens on a local
+Unix socket for events to process instead.  Each event is run with the
+environment, arguments and working directory of the caller and everything
+your script writes to stdout (such as the [NZB] messages generated by
+push()) and stderr is relayed back to it along with the exit code run()
+returned.
+
+The socket is only accessible to the user running the worker (anyone who
+can connect to it can have your script run with an environment of their
+choosing); make sure NZBGet runs as that same user.
+
+Start the worker once (outside of NZBGet):
+
+    from nzbget.Worker import ScriptWorker
+    from MyScript import MyScript
+
+    ScriptWorker(MyScript, '/tmp/myscript.sock').serve_forever()
+
+Then have NZBGet call the shim instead of your script; this file only
+depends on the Python standard library, so it can be called directly:
+
+    python /path/to/nzbget/Worker.py /tmp/myscript.sock /path/to/MyScript.py
+
+If the worker can't be reached, the shim simply runs the script
+(/path/to/MyScript.py above) the way NZBGet would have.
+
+By default events are processed one at a time within the worker process.
+The environment, arguments, working directory, stdout, stderr and signal
+handlers are all restored after each event.  Set fork to True to process
+each event in it's own (forked) child process instead.
+"""
+import os
+import sys
+import json
+import socket
+import signal
+import struct
+import traceback
+
+# Our frames are prefixed by their length (network byte order)
+FRAME_HEADER = struct.Struct('!I')
+
+# The exit code returned if the worker failed to handle our request
+WORKER_FAILURE = 1
+
+
+def send_frame(sock, payload):
+    """Sends a dictionary (as JSON) to the other end of our connection
+    """
+    data = json.dumps(payload).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock):
+    """Returns the next dictionary sent to us or None if the connection was
+    closed.
+    """
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+
+    data = _recv_exactly(sock, FRAME_HEADER.unpack(header)[0])
+    if data is None:
+        return None
+
+    return json.loads(data.decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    """Reads exactly size bytes from our socket"""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+class FrameWriter(object):
+    """A file-like object that relays whatever is written to it (one line
+    at a time) to the shim on the other end of our connection; stream
+    identifies what we're standing in for (stdout or stderr).
+    """
+    encoding = 'utf-8'
+
+    def __init__(self, sock, stream='stdout'):
+        self.sock = sock
+        self.stream = stream
+        self._buffer = u''
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+
+        self._buffer += data
+        if u'\n' in self._buffer:
+            lines, self._buffer = self._buffer.rsplit(u'\n', 1)
+            send_frame(self.sock, {self.stream: lines + u'\n'})
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self._buffer:
+            send_frame(self.sock, {self.stream: self._buffer})
+            self._buffer = u''
+
+    def isatty(self):
+        return False
+
+
+class ScriptWorker(object):
+    """Keeps a script class loaded and runs it for each request received on
+    our Unix socket.
+    """
+
+    def __init__(self, script, path, fork=False, backlog=16,
+                 *args, **kwargs):
+        """
+        script is the (ScriptBase based) class to initialize and run() for
+        each event.  Any additional arguments are passed into it's
+        constructor.
+        """
+        self.script = script
+        self.path = path
+        self.fork = fork and hasattr(os, 'fork')
+        self.backlog = backlog
+        self.args = args
+        self.kwargs = kwargs
+        self.sock = None
+
+    def listen(self):
+        """Binds to our Unix socket (replacing any stale one left behind)
+        """
+        if self.sock is not None:
+            return
+
+        try:
+            os.unlink(self.path)
+
+        except OSError:
+            # Nothing to clean up
+            pass
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        # Only we may connect to our socket; it's created that way (so
+        # there's no window where anyone else can) and then made sure of
+        umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+
+        finally:
+            os.umask(umask)
+
+        os.chmod(self.path, 0o600)
+        self.sock.listen(self.backlog)
+
+    def close(self):
+        """Stops listening for requests"""
+        if self.sock is None:
+            return
+
+        try:
+            self.sock.close()
+
+        finally:
+            self.sock = None
+            try:
+                os.unlink(self.path)
+
+            except OSError:
+                pass
+
+    def serve_forever(self):
+        """Handles requests until we're interrupted"""
+        self.listen()
+        try:
+            while self.sock is not None:
+                self.serve_once()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            self.close()
+
+    def serve_once(self):
+        """Accepts and handles a single request"""
+        self.listen()
+        try:
+            conn, _ = self.sock.accept()
+
+        except (socket.error, OSError, AttributeError):
+            # Our socket was closed on us
+            self.sock = None
+            return
+
+        try:
+            if self.fork:
+                self._reap()
+                if os.fork() != 0:
+                    # We're the parent; the child looks after the request
+                    return
+
+                # We're the child
+                try:
+                    self.handle(conn)
+
+                finally:
+                    os._exit(0)
+
+            self.handle(conn)
+
+        finally:
+            conn.close()
+
+    def handle(self, conn):
+        """Processes the request waiting on the specified connection
+        """
+        request = recv_frame(conn)
+        if not request:
+            return
+
+        stdout = FrameWriter(conn)
+        stderr = FrameWriter(conn, stream='stderr')
+        try:
+            exit_code = self.execute(
+                environ=request.get('environ', {}),
+                argv=request.get('argv', []),
+                cwd=request.get('cwd'),
+                stdout=stdout,
+                stderr=stderr,
+            )
+
+        except Exception:
+            stderr.write(traceback.format_exc())
+            exit_code = WORKER_FAILURE
+
+        stdout.flush()
+        stderr.flush()
+        send_frame(conn, {'exit': exit_code})
+
+    def execute(self, environ, argv, cwd=None, stdout=None, stderr=None):
+        """Runs our script within the environment specified and returns the
+        exit code.  Our own environment is restored afterwards.
+        """
+        saved_environ = dict(os.environ)
+        saved_argv = sys.argv
+        saved_stdout = sys.stdout
+        saved_stderr = sys.stderr
+        saved_cwd = os.getcwd()
+        saved_signals = {}
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            saved_signals[signum] = signal.getsignal(signum)
+
+        script = None
+        try:
+            os.environ.clear()
+            os.environ.update(environ)
+            sys.argv = list(argv) if argv else [saved_argv[0]]
+            if stdout is not None:
+                sys.stdout = stdout
+
+            if stderr is not None:
+                sys.stderr = stderr
+
+            if cwd:
+                try:
+                    os.chdir(cwd)
+
+                except OSError:
+                    # Stay where we are
+                    pass
+
+            script = self.script(*self.args, **self.kwargs)
+            return script.run()
+
+        finally:
+            for stream in (stdout, stderr):
+                if stream is not None:
+                    stream.flush()
+
+            # Detach the script's log handlers from the stream we're about
+            # to close
+            logger = getattr(script, 'logger', None)
+            for handler in list(getattr(logger, 'handlers', [])):
+                logger.removeHandler(handler)
+
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            sys.argv = saved_argv
+            sys.stdout = saved_stdout
+            sys.stderr = saved_stderr
+            os.chdir(saved_cwd)
+
+            for signum, handler in saved_signals.items():
+                try:
+                    signal.signal(signum, handler)
+
+                except (ValueError, TypeError):
+                    # We're not the main thread, or the handler was not
+                    # installed by Python
+                    pass
+
+    def _reap(self):
+        """Cleans up any of our forked children that have finished"""
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0]:
+                pass
+
+        except OSError:
+            # No children
+            pass
+
+
+def forward(path, argv=None, environ=None, cwd=None, stdout=None,
+            timeout=None, stderr=None):
+    """
+    Passes our event along to the worker listening on the specified Unix
+    socket and relays it's output to stdout (and stderr).
+
+    The exit code is returned, or None if the worker could not be reached.
+    """
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    except AttributeError:
+        # Unix sockets aren't supported
+        return None
+
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+
+    except (socket.error, OSError):
+        # Nobody is listening
+        sock.close()
+        return None
+
+    if stdout is None:
+        stdout = sys.stdout
+
+    if stderr is None:
+        stderr = sys.stderr
+
+    try:
+        send_frame(sock, {
+            'argv': list(sys.argv if argv is None else argv),
+            'environ': dict(os.environ if environ is None else environ),
+            'cwd': os.getcwd() if cwd is None else cwd,
+        })
+
+        while True:
+            response = recv_frame(sock)
+            if response is None:
+                # The worker went away on us
+                return WORKER_FAILURE
+
+            if 'stdout' in response:
+                stdout.write(response['stdout'])
+                stdout.flush()
+
+            if 'stderr' in response:
+                stderr.write(response['stderr'])
+                stderr.flush()
+
+            if 'exit' in response:
+                return response['exit']
+
+    except (socket.error, OSError):
+        return WORKER_FAILURE
+
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    """The launcher shim: Worker.py SOCKET [SCRIPT]
+    """
+    if argv is None:
+        argv = sys.argv
+
+    if len(argv) < 2:
+        sys.stderr.write('Usage: %s SOCKET [SCRIPT]\n' % argv[0])
+        return WORKER_FAILURE
+
+    script_argv = argv[2:] or argv[:1]
+    exit_code = forward(argv[1], argv=script_argv)
+    if exit_code is not None:
+        return exit_code
+
+    if len(argv) > 2:
+        # The worker isn't running; run the script ourselves
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable] + argv[2:])
+
+    sys.stderr.write('The worker at %s could not be reached.\n' % argv[1])
+    return WORKER_FAILURE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,12 +17,20 @@
 from TestBase import TestBase
 from TestBase import TEMP_DIRECTORY
 
+import sqlite3
 from os import unlink
+from threading import Timer
+from datetime import datetime
+from datetime import timedelta
 from os.path import join
 
 from nzbget.Database import Database
 from nzbget.Database import Category
+from nzbget.Database import ErrorType
+from nzbget.Database import classify_error
 from nzbget.Database import NZBGET_DATABASE_VERSION
+from nzbget.Database import NZBGET_SCHEMA
+from nzbget.Database import SQLITE_DATE_FORMAT
 from nzbget.Logger import VERY_VERBOSE_DEBUG
 
 # Temporary Directory
@@ -34,10 +42,11 @@ KEY = 'The.Perfect.Name.nzb'
 class TestDatabase(TestBase):
     def teardown_method(self):
         """This method is run once after _each_ test method is executed"""
-        try:
-            unlink(DATABASE)
-        except:
-            pass
+        for path in (DATABASE, DATABASE + '-wal', DATABASE + '-shm'):
+            try:
+                unlink(path)
+            except:
+                pass
 
         # common
         super(TestDatabase, self).teardown_method()
@@ -159,3 +168,499 @@ class TestDatabase(TestBase):
         db.prune(0)
         assert db.get('MY_KEY') is None
         assert db.get('MY_OTHER_KEY') is None
+
+    def test_schema_upgrade(self):
+        import sqlite3
+
+        # Build a version 1 database
+        socket = sqlite3.connect(DATABASE)
+        for query in NZBGET_SCHEMA[1]:
+            socket.execute(query)
+        socket.execute(
+            "UPDATE lookup SET value = '1' WHERE key = 'SCHEMA_VERSION'")
+        socket.execute(
+            "INSERT INTO keystore (container, category, key, value) " +
+            "VALUES (?, 'config', 'MY_KEY', 'MY_VALUE')", (KEY, ))
+        socket.commit()
+        socket.close()
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        # We were upgraded (and not reset)
+        assert db._get_version() == NZBGET_DATABASE_VERSION
+        assert db._schema_okay()
+        assert db.get('MY_KEY') == 'MY_VALUE'
+
+    def test_nzbcache(self):
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+
+        path = join(TEMP_DIRECTORY, KEY)
+        assert db.nzbcache_get(path, 100, 1.5, 2) is None
+        assert db.nzbcache_set(path, 100, 1.5, 2, meta={'NAME': 'A'})
+        assert db.nzbcache_get(path, 100, 1.5, 2) == ({'NAME': 'A'}, None)
+
+        # Any change to the NZB-File invalidates our entry
+        assert db.nzbcache_get(path, 101, 1.5, 2) is None
+        assert db.nzbcache_get(path, 100, 1.6, 2) is None
+        assert db.nzbcache_get(path, 100, 1.5, 3) is None
+
+        # A summary can be added to our existing entry
+        assert db.nzbcache_set(path, 100, 1.5, 2, summary={'files': 3})
+        assert db.nzbcache_get(path, 100, 1.5, 2) == \
+            ({'NAME': 'A'}, {'files': 3})
+
+        # But not once it's changed
+        assert db.nzbcache_set(path, 200, 1.5, 2, summary={'files': 4})
+        assert db.nzbcache_get(path, 200, 1.5, 2) == ({}, {'files': 4})
+
+        # The cache is shared by all containers
+        other = Database(
+            container='Another.Name.nzb',
+            database=DATABASE,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert other.nzbcache_get(path, 200, 1.5, 2) == ({}, {'files': 4})
+
+        # Only the most recently used entries are kept
+        db.execute(
+            "UPDATE lookup SET value = '2' WHERE key = 'NZBCACHE_SIZE'")
+        for no in range(5):
+            assert db.nzbcache_set('%s.%d' % (path, no), 1, 1.0, 1, meta={})
+            db.execute(
+                "UPDATE nzbcache SET last_access = ? WHERE path = ?",
+                ((datetime.now() - timedelta(minutes=10 - no))
+                 .strftime(SQLITE_DATE_FORMAT), '%s.%d' % (path, no)))
+        db.prune(vacuum=False)
+        assert db.nzbcache_get('%s.0' % path, 1, 1.0, 1) is None
+        assert db.nzbcache_get(path, 200, 1.5, 2) is not None
+        assert db.nzbcache_get('%s.4' % path, 1, 1.0, 1) is not None
+
+        # purge entries (0 = all)
+        db.prune(0)
+        assert db.nzbcache_get(path, 200, 1.5, 2) is None
+
+        assert db.nzbcache_set(path, 100, 1.5, 2, meta={'NAME': 'A'})
+        assert db.nzbcache_unset(path)
+        assert db.nzbcache_get(path, 100, 1.5, 2) is None
+
+    def test_snapshot(self):
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+
+        root = join(TEMP_DIRECTORY, 'snapshot')
+        assert db.snapshot_entries(root, '') == {}
+        assert db.snapshot_update(root, entries=[
+            (root, '', 1, 1, 0, 1.5),
+            (join(root, 'dir'), root, 1, 2, 0, 2.5),
+            (join(root, 'dir', 'file'), join(root, 'dir'), 0, 3, 100, 3.5),
+            (join(root, 'file'), root, 0, 4, 200, 4.5),
+            (join(root, 'dir2'), root, 1, 5, 0, 5.5),
+        ])
+        assert db.snapshot_entries(root, '') == {root: (True, 1, 0, 1.5)}
+        assert db.snapshot_entries(root, root) == {
+            join(root, 'dir'): (True, 2, 0, 2.5),
+            join(root, 'file'): (False, 4, 200, 4.5),
+            join(root, 'dir2'): (True, 5, 0, 5.5),
+        }
+        assert db.snapshot_entries(root, join(root, 'dir')) == {
+            join(root, 'dir', 'file'): (False, 3, 100, 3.5),
+        }
+
+        # Snapshots are bound to our container
+        other = Database(
+            container='other',
+            database=DATABASE,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert other.snapshot_entries(root, '') == {}
+
+        # Removing a directory removes everything beneath it (but not
+        # the entries that only share it's name as a prefix)
+        assert db.snapshot_update(root, removed=[join(root, 'dir')])
+        assert db.snapshot_entries(root, join(root, 'dir')) == {}
+        assert sorted(db.snapshot_entries(root, root).keys()) == \
+            sorted([join(root, 'file'), join(root, 'dir2')])
+
+        assert db.snapshot_unset(root)
+        assert db.snapshot_entries(root, root) == {}
+
+    def test_hashcache(self):
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+
+        path = join(TEMP_DIRECTORY, KEY)
+        assert db.hashcache_get(path, 100, 1.5, 2, 'md5') is None
+        assert db.hashcache_set([
+            (path, 100, 1.5, 2, 'md5', 'abcd'),
+            (path, 100, 1.5, 2, 'crc32', '1234'),
+        ])
+        assert db.hashcache_get(path, 100, 1.5, 2, 'md5') == 'abcd'
+        assert db.hashcache_get(path, 100, 1.5, 2, 'crc32') == '1234'
+        assert db.hashcache_get(path, 100, 1.5, 2, 'sha1') is None
+
+        # Our file changed
+        assert db.hashcache_get(path, 101, 1.5, 2, 'md5') is None
+        assert db.hashcache_get(path, 100, 1.6, 2, 'md5') is None
+        assert db.hashcache_get(path, 100, 1.5, 3, 'md5') is None
+
+        # Replacing an entry
+        assert db.hashcache_set([(path, 101, 1.5, 2, 'md5', 'efgh')])
+        assert db.hashcache_get(path, 101, 1.5, 2, 'md5') == 'efgh'
+        assert db.hashcache_get(path, 100, 1.5, 2, 'md5') is None
+
+        # Hashes are pruned just like everything else
+        assert db.prune(age=-1)
+        assert db.hashcache_get(path, 100, 1.5, 2, 'crc32') is None
+
+    def test_locking(self):
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        # NORMAL
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert db.set('MY_KEY', 'MY_VALUE')
+
+        # Our settings can be tuned
+        other = Database(
+            container=KEY,
+            database=DATABASE,
+            synchronous='full',
+            busy_timeout=0,
+            retries=0,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert other.execute("PRAGMA synchronous").fetchone()[0] == 2
+        assert other.get('MY_KEY') == 'MY_VALUE'
+
+        # Another script is writing to the database
+        locker = sqlite3.connect(DATABASE, check_same_thread=False)
+        locker.execute("BEGIN IMMEDIATE")
+
+        # We can still read (thanks to WAL) but we can't write; a locked
+        # database is not mistaken for a damaged one
+        assert other.get('MY_KEY') == 'MY_VALUE'
+        assert not other.set('MY_KEY', 'MY_NEW_VALUE')
+        assert not other.unset('MY_KEY')
+        assert not other.disabled
+        assert other.counters['locked'] == 2
+        assert other.counters['reset'] == 0
+        assert other.get('MY_KEY') == 'MY_VALUE'
+
+        # We retry until the lock is released
+        other.retries = 10
+        release = Timer(0.2, locker.commit)
+        release.start()
+        assert other.set('MY_KEY', 'MY_NEW_VALUE')
+        release.join()
+        assert other.counters['retry'] > 0
+        locker.close()
+
+        assert db.get('MY_KEY') == 'MY_NEW_VALUE'
+        assert db.unset('MY_KEY')
+        assert other.get('MY_KEY') is None
+
+    def test_locked_commit(self):
+
+        # Without WAL our COMMIT has to wait for the readers to finish
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+            journal_mode='delete',
+            busy_timeout=0,
+            retries=0,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert db.set('MY_KEY', 'MY_VALUE')
+
+        # Another script is reading (holding on to a SHARED lock)
+        reader = sqlite3.connect(
+            DATABASE, isolation_level=None, check_same_thread=False)
+        reader.execute("BEGIN")
+        reader.execute("SELECT * FROM keystore").fetchall()
+
+        # Our write isn't lost quietly; we're told it failed
+        assert not db.set('MY_KEY', 'MY_NEW_VALUE')
+        assert not db.socket.in_transaction
+        assert db.get('MY_KEY') == 'MY_VALUE'
+
+        # Nothing within a transaction() block is written either
+        with db.transaction():
+            assert db.set('MY_KEY', 'MY_NEW_VALUE')
+            assert db.set('MY_OTHER_KEY', 'MY_OTHER_VALUE')
+        assert not db.socket.in_transaction
+        assert db.get('MY_KEY') == 'MY_VALUE'
+        assert db.get('MY_OTHER_KEY') is None
+
+        # Our COMMIT is retried (as is) until the reader is done
+        db.retries = 10
+        release = Timer(0.2, reader.execute, ("COMMIT", ))
+        release.start()
+        assert db.set('MY_KEY', 'MY_NEW_VALUE')
+        release.join()
+        assert db.counters['retry'] > 0
+
+        reader.execute("BEGIN")
+        reader.execute("SELECT * FROM keystore").fetchall()
+        release = Timer(0.2, reader.execute, ("COMMIT", ))
+        release.start()
+        with db.transaction():
+            assert db.set('MY_OTHER_KEY', 'MY_OTHER_VALUE')
+            assert db.nzbcache_set('/tmp/a.nzb', 1, 1.0, 1, meta={'a': 1})
+            assert db.snapshot_update('/tmp', entries=[
+                ('/tmp', '', True, 1, 0, 1.0)])
+            assert db.hashcache_set([('/tmp/a', 1, 1.0, 1, 'md5', 'abc')])
+        release.join()
+
+        assert reader.execute(
+            "SELECT value FROM keystore WHERE key = 'MY_KEY'").fetchone() \
+            == ('MY_NEW_VALUE', )
+        assert reader.execute(
+            "SELECT value FROM keystore WHERE key = 'MY_OTHER_KEY'")\
+            .fetchone() == ('MY_OTHER_VALUE', )
+        for table in ('nzbcache', 'snapshot', 'hashcache'):
+            assert reader.execute(
+                "SELECT COUNT(*) FROM %s" % table).fetchone() == (1, )
+        reader.close()
+
+        # Our caches are written in the transaction of our block (and not
+        # committed part way through it)
+        with db.transaction():
+            assert db.nzbcache_unset('/tmp/a.nzb')
+            assert db.snapshot_unset('/tmp')
+            assert db.set('MY_KEY', 'MY_VALUE')
+            assert db.socket.in_transaction
+        assert not db.socket.in_transaction
+        assert db.nzbcache_get('/tmp/a.nzb', 1, 1.0, 1) is None
+        assert db.snapshot_entries('/tmp', '') == {}
+        assert db.get('MY_KEY') == 'MY_VALUE'
+
+    def test_recovery(self):
+
+        for message, error_type in (
+                ('database is locked', ErrorType.LOCKED),
+                ('database table is locked', ErrorType.LOCKED),
+                ('database or disk is full', ErrorType.UNWRITABLE),
+                ('attempt to write a readonly database',
+                 ErrorType.UNWRITABLE),
+                ('disk I/O error', ErrorType.UNWRITABLE),
+                ('database disk image is malformed', ErrorType.CORRUPT),
+                ('file is not a database', ErrorType.CORRUPT),
+                ('no such table: keystore', ErrorType.CORRUPT)):
+            assert classify_error(
+                sqlite3.OperationalError(message)) == error_type
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert db.set('MY_KEY', 'MY_VALUE')
+
+        # A suspicious error isn't enough to reset our database
+        db._recover('get', sqlite3.OperationalError('no such column: x'))
+        assert db.counters[ErrorType.CORRUPT] == 1
+        assert db.counters['reset'] == 0
+        assert db.get('MY_KEY') == 'MY_VALUE'
+
+        # But damage is
+        db.execute("DROP TABLE keystore")
+        assert db.get('MY_KEY') is None
+        assert db.counters[ErrorType.CORRUPT] == 2
+        assert db.counters['reset'] == 1
+        assert db._schema_okay()
+
+        # The write that found the damage is made again once it's repaired
+        db.execute("DROP TABLE keystore")
+        assert db.set('MY_KEY', 'MY_VALUE')
+        assert db.counters[ErrorType.CORRUPT] == 3
+        assert db.counters['reset'] == 2
+        assert db.get('MY_KEY') == 'MY_VALUE'
+
+        # We carry on in memory when we can't write to the database; the
+        # write that failed is made again there
+        _begin = db._begin
+
+        def _full():
+            db._begin = _begin
+            raise sqlite3.OperationalError('database or disk is full')
+
+        db._begin = _full
+        assert db.set('MY_KEY', 'MY_NEW_VALUE')
+        assert db.counters[ErrorType.UNWRITABLE] == 1
+        assert db.in_memory
+        assert db.get('MY_KEY') == 'MY_NEW_VALUE'
+
+        # Our database itself is left alone
+        other = Database(
+            container=KEY,
+            database=DATABASE,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert not other.in_memory
+        assert other.get('MY_KEY') == 'MY_VALUE'
+
+    def test_set_many(self):
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        other = Database(
+            container=KEY,
+            database=DATABASE,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+
+        assert db.set_many({'KEY1': 'A', 'KEY2': 'B', '%$': 'C'})
+        assert db.set_many([('KEY2', 'D'), ('key3', 'E')])
+        assert db.set_many([('KEY4', 'F')], category=Category.NZB)
+        assert db.set_many([])
+        assert not db.set_many([('KEY5', 'G')], category='invalid')
+        assert sorted(other.items()) == [
+            ('KEY1', 'A'), ('KEY2', 'D'), ('KEY3', 'E')]
+        assert other.items(category=Category.NZB) == [('KEY4', 'F')]
+
+        assert db.unset_many(['KEY1', 'key3', 'MISSING'])
+        assert other.items() == [('KEY2', 'D')]
+
+        # Nothing is written until we leave our transaction
+        with db.transaction():
+            assert db.set('KEY1', 'H')
+            with db.transaction():
+                assert db.set('KEY2', 'I')
+                assert db.unset('KEY4', category=Category.NZB)
+
+            assert db.get('KEY2') == 'I'
+            assert other.get('KEY2') == 'D'
+
+        assert sorted(other.items()) == [('KEY1', 'H'), ('KEY2', 'I')]
+        assert other.items(category=Category.NZB) == []
+
+        # Or at all if our transaction fails
+        try:
+            with db.transaction():
+                assert db.set('KEY1', 'J')
+                raise KeyError()
+
+        except KeyError:
+            pass
+
+        assert db.get('KEY1') == 'H'
+        assert other.get('KEY1') == 'H'
+
+        # Older versions of SQLite (without UPSERT) are still supported
+        version_info = sqlite3.sqlite_version_info
+        try:
+            sqlite3.sqlite_version_info = (3, 23, 1)
+            assert db.set_many([('KEY1', 'K'), ('KEY3', 'L')])
+
+        finally:
+            sqlite3.sqlite_version_info = version_info
+
+        assert sorted(other.items()) == [
+            ('KEY1', 'K'), ('KEY2', 'I'), ('KEY3', 'L')]
+
+    def test_preload(self):
+
+        other = Database(
+            container=KEY,
+            database=DATABASE,
+            reset=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+        assert other.set('KEY1', 'A')
+        assert other.set('KEY2', 'B', category=Category.NZB)
+
+        db = Database(
+            container=KEY,
+            database=DATABASE,
+            preload=True,
+
+            debug=VERY_VERBOSE_DEBUG,
+        )
+
+        # Track our queries
+        queries = []
+        db.socket.set_trace_callback(queries.append)
+
+        # Our container is read in a single query
+        assert db.get('KEY1') == 'A'
+        assert db.get('KEY2', category=Category.NZB) == 'B'
+        assert db.get('KEY2') is None
+        assert db.get('MISSING', 'DEFAULT') == 'DEFAULT'
+        assert db.items() == [('KEY1', 'A')]
+        assert db.items(category=Category.NZB) == [('KEY2', 'B')]
+        assert len(queries) == 1
+
+        # We're kept in sync with our own writes (and read them back the
+        # way they were stored)
+        assert db.set('KEY3', 'C')
+        assert db.set('KEY4', True)
+        assert db.set_many({'KEY5': 5, 'KEY6': None})
+        assert db.unset('KEY1')
+        del queries[:]
+        assert db.get('KEY1') is None
+        assert db.get('KEY3') == 'C'
+        assert db.get('KEY4') == '1'
+        assert db.get('KEY5') == '5'
+        assert db.get('KEY6', 'DEFAULT') is None
+        assert not queries
+        assert sorted(db.items()) == sorted(other.items())
+
+        # Values SQLite converts its own way are read back
+        assert db.set('KEY7', 1.5)
+        assert db.get('KEY7') == other.get('KEY7')
+
+        # A rolled back transaction doesn't leave anything behind
+        try:
+            with db.transaction():
+                assert db.set('KEY3', 'D')
+                assert db.get('KEY3') == 'D'
+                raise KeyError()
+
+        except KeyError:
+            pass
+
+        assert db.get('KEY3') == 'C'
@@ -341,3 +341,43 @@ class TestPostProcessScript(TestBase):
             script_mode=SCRIPT_MODE.SCHEDULER,
         )
         assert script.run() == EXIT_CODE.FAILURE
+
+    def test_detect_mode_signatures(self):
+        """The script mode is detected from the environment variables present
+        without calling each of the sanity checks
+        """
+        calls = []
+
+        class TestTriScript(PostProcessScript, SchedulerScript, ScanScript):
+            def postprocess_sanity_check(self, *args, **kwargs):
+                # An overloaded sanity check is always called
+                calls.append(SCRIPT_MODE.POSTPROCESSING)
+                return super(TestTriScript, self)\
+                    .postprocess_sanity_check(*args, **kwargs)
+
+        os.environ['%sTASKID' % SCHEDULER_ENVIRO_ID] = '1'
+        os.environ['%sDIRECTORY' % SCAN_ENVIRO_ID] = TEMP_DIRECTORY
+        try:
+            for _ in range(2):
+                script = TestTriScript(logger=False, debug=VERY_VERBOSE_DEBUG)
+                assert script.detect_mode() == SCRIPT_MODE.SCAN
+
+            assert calls == [SCRIPT_MODE.POSTPROCESSING] * 2
+
+            # The same results are returned if we walk the sanity checks
+            for mode in (SCRIPT_MODE.SCAN, SCRIPT_MODE.SCHEDULER):
+                assert getattr(script, '%s_sanity_check' % mode)() is True
+
+            os.environ['%sDIRECTORY' % POSTPROC_ENVIRO_ID] = TEMP_DIRECTORY
+            script = TestTriScript(logger=False, debug=VERY_VERBOSE_DEBUG)
+            assert script.detect_mode() == SCRIPT_MODE.POSTPROCESSING
+
+            # Neither of these are valid while post-processing
+            for mode in (SCRIPT_MODE.SCAN, SCRIPT_MODE.SCHEDULER):
+                assert getattr(script, '%s_sanity_check' % mode)() is False
+
+        finally:
+            del os.environ['%sTASKID' % SCHEDULER_ENVIRO_ID]
+            del os.environ['%sDIRECTORY' % SCAN_ENVIRO_ID]
+            if '%sDIRECTORY' % POSTPROC_ENVIRO_ID in os.environ:
+                del os.environ['%sDIRECTORY' % POSTPROC_ENVIRO_ID]
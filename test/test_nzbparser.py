@@ -0,0 +1,277 @@
+# -*- encoding: utf-8 -*-
+#
+# A Test Suite (for nose) for the NZB-File Parser
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+import gzip
+import bz2
+from os.path import join
+from io import BytesIO
+
+try:
+    # Python v3.3+
+    import lzma
+
+except ImportError:
+    # Python v2.x
+    lzma = None
+
+from TestBase import TestBase
+from TestBase import TEMP_DIRECTORY
+
+from nzbget.NZBParser import parse_nzb_head
+from nzbget.NZBParser import iter_nzb_files
+from nzbget.NZBParser import summarize_nzb
+from nzbget.NZBParser import NZBSegment
+from nzbget.NZBParser import NZB_SEGMENT_MAX
+from nzbget.NZBParser import read_nzb
+from nzbget.NZBParser import compression_type
+
+NZBFILE = join(TEMP_DIRECTORY, 'A.Great.Movie.nzb')
+
+NZB_HEAD = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nzb PUBLIC "-//newzBin//DTD NZB 1.0//EN"
+    "http://www.newzbin.com/DTD/nzb/nzb-1.0.dtd">
+<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb">
+<head>
+    <meta type="category">Movies &gt; HD</meta>
+    <meta type="name">A.Great.Movie</meta>
+    <meta type="empty">   </meta>
+</head>
+"""
+
+NZB_FILE = b"""<file poster="poster@example.com (Poster)" date="1335500602"
+    subject="&quot;a.great.movie.%(ext)s&quot; yEnc (1/%(segments)d)">
+<groups>
+<group>alt.binaries.test</group>
+</groups>
+<segments>
+%(segment_xml)s
+</segments>
+</file>
+"""
+
+NZB_SEGMENT = b'<segment bytes="%(bytes)d" number="%(no)d">' \
+    b'part%(file)d.%(no)d@example.com</segment>'
+
+
+def nzb_content(files=10, segments=10, head=True, close=True, par2=0):
+    """Generates an NZB-File"""
+    content = [NZB_HEAD if head else NZB_HEAD.split(b'<head>')[0]]
+    for file_no in range(1, files + 1):
+        ext = b'vol%.2d.par2' % file_no if file_no <= par2 \
+            else b'part%.2d.rar' % file_no
+        segment_xml = b'\n'.join([NZB_SEGMENT % {
+            b'bytes': 1000 + no, b'no': no, b'file': file_no}
+            for no in range(1, segments + 1)])
+        content.append(NZB_FILE % {
+            b'ext': ext,
+            b'segments': segments,
+            b'segment_xml': segment_xml,
+        })
+
+    if close:
+        content.append(b'</nzb>\n')
+
+    return b''.join(content)
+
+
+class CountingStream(BytesIO):
+    """Tracks the amount of data read from us"""
+    def __init__(self, *args, **kwargs):
+        BytesIO.__init__(self, *args, **kwargs)
+        self.bytes_read = 0
+
+    def read(self, *args, **kwargs):
+        data = BytesIO.read(self, *args, **kwargs)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestNZBParser(TestBase):
+
+    def test_head_parsing(self):
+        with open(NZBFILE, 'wb') as f:
+            f.write(nzb_content())
+
+        expected = {
+            'CATEGORY': 'Movies > HD',
+            'NAME': 'A.Great.Movie',
+        }
+        assert parse_nzb_head(NZBFILE) == expected
+        assert parse_nzb_head(NZBFILE, head_only=False) == expected
+
+        # No head at all
+        with open(NZBFILE, 'wb') as f:
+            f.write(nzb_content(head=False))
+        assert parse_nzb_head(NZBFILE) == {}
+        assert parse_nzb_head(NZBFILE, head_only=False) == {}
+
+    def test_head_only_stops_reading(self):
+        content = nzb_content(files=100, segments=100)
+        stream = CountingStream(content)
+        assert parse_nzb_head(stream)['NAME'] == 'A.Great.Movie'
+
+        # We never read much past the head
+        assert stream.bytes_read < 128 * 1024 < len(content)
+
+        # A truncated NZB-File is not a problem if we never get to the
+        # broken part
+        content = nzb_content(close=False)
+        assert parse_nzb_head(CountingStream(content))['NAME'] == \
+            'A.Great.Movie'
+
+        try:
+            parse_nzb_head(CountingStream(content), head_only=False)
+            # We should never get here
+            assert False
+
+        except Exception:
+            # the parse error is thrown
+            pass
+
+    def test_iter_nzb_files(self):
+        with open(NZBFILE, 'wb') as f:
+            f.write(nzb_content(files=3, segments=4, par2=1))
+
+        entries = list(iter_nzb_files(NZBFILE))
+        assert len(entries) == 3
+
+        entry = entries[0]
+        assert entry.poster == 'poster@example.com (Poster)'
+        assert entry.date == '1335500602'
+        assert entry.subject == '"a.great.movie.vol01.par2" yEnc (1/4)'
+        assert entry.filename == 'a.great.movie.vol01.par2'
+        assert entry.file_type == 'par2'
+        assert entry.groups == ['alt.binaries.test']
+        assert len(entry) == 4
+        assert entry.bytes == 1001 + 1002 + 1003 + 1004
+
+        segments = list(entry.segments)
+        assert len(segments) == 4
+        assert segments[0] == NZBSegment(1, 1001, 'part1.1@example.com')
+        assert segments[3] == NZBSegment(4, 1004, 'part1.4@example.com')
+
+        assert entries[1].filename == 'a.great.movie.part02.rar'
+        assert entries[1].file_type == 'rar'
+        assert list(entries[2].segments)[1].message_id == \
+            'part3.2@example.com'
+
+        # Only track the totals
+        entries = list(iter_nzb_files(NZBFILE, segments=False))
+        assert len(entries) == 3
+        assert len(entries[0]) == 4
+        assert entries[0].bytes == 1001 + 1002 + 1003 + 1004
+        assert list(entries[0].segments) == []
+
+        # Streams are supported too
+        assert len(list(iter_nzb_files(
+            CountingStream(nzb_content(files=5))))) == 5
+
+    def test_iter_nzb_files_bad_segments(self):
+        content = nzb_content(files=1, segments=3)
+        content = content.replace(b'number="2"', b'number="-2"')
+        content = content.replace(
+            b'bytes="1003"', b'bytes="%d"' % (NZB_SEGMENT_MAX + 1))
+
+        # A bad segment doesn't prevent the file from being parsed
+        entries = list(iter_nzb_files(content))
+        assert len(entries) == 1
+        assert len(entries[0]) == 3
+        assert entries[0].bytes == 1001 + 1002
+
+        segments = list(entries[0].segments)
+        assert segments[1] == NZBSegment(0, 1002, 'part1.2@example.com')
+        assert segments[2] == NZBSegment(3, 0, 'part1.3@example.com')
+
+        # The same goes for when we're only tracking the totals
+        entries = list(iter_nzb_files(content, segments=False))
+        assert len(entries[0]) == 3
+        assert entries[0].bytes == 1001 + 1002
+
+    def test_summarize_nzb(self):
+        with open(NZBFILE, 'wb') as f:
+            f.write(nzb_content(files=5, segments=3, par2=2))
+
+        segment_bytes = 1001 + 1002 + 1003
+        assert summarize_nzb(NZBFILE) == {
+            'files': 5,
+            'segments': 15,
+            'bytes': segment_bytes * 5,
+            'par2': {'files': 2, 'segments': 6, 'bytes': segment_bytes * 2},
+            'rar': {'files': 3, 'segments': 9, 'bytes': segment_bytes * 3},
+            'other': {'files': 0, 'segments': 0, 'bytes': 0},
+        }
+
+        # Corrupt NZB-Files throw an exception
+        try:
+            summarize_nzb(CountingStream(nzb_content(close=False)))
+            # We should never get here
+            assert False
+
+        except Exception:
+            # the parse error is thrown
+            pass
+
+    def test_compressed_nzbfiles(self):
+        content = nzb_content(files=20, segments=50)
+
+        def gzip_compress(data):
+            stream = BytesIO()
+            with gzip.GzipFile(fileobj=stream, mode='wb') as f:
+                f.write(data)
+            return stream.getvalue()
+
+        compressors = {
+            'gzip': gzip_compress,
+            'bz2': bz2.compress,
+        }
+        if lzma is not None:
+            compressors['xz'] = lzma.compress
+
+        for compression, compress in compressors.items():
+            compressed = compress(content)
+            assert compression_type(compressed) == compression
+
+            path = '%s.%s' % (NZBFILE, compression)
+            with open(path, 'wb') as f:
+                f.write(compressed)
+
+            # Paths, content and streams are all decompressed on the fly
+            for source in (path, compressed, CountingStream(compressed)):
+                assert parse_nzb_head(source)['NAME'] == 'A.Great.Movie'
+
+            assert len(list(iter_nzb_files(path))) == 20
+            assert summarize_nzb(compressed)['segments'] == 20 * 50
+            assert read_nzb(path) == content
+            assert read_nzb(compressed) == content
+
+        # Nothing to decompress
+        assert compression_type(content) is None
+        assert read_nzb(content) == content
+
+        # Concatenated gzip streams are one NZB-File
+        compressed = gzip_compress(content[:1000]) + \
+            gzip_compress(content[1000:])
+        assert read_nzb(compressed) == content
+
+        # Corrupt compressed content
+        try:
+            parse_nzb_head(gzip_compress(content)[:-1000], head_only=False)
+            # We should never get here
+            assert False
+
+        except Exception:
+            # the error is thrown
+            pass
@@ -805,6 +805,72 @@ class TestPostProcessScript(TestBase):
         )
         assert script.parse_nzbfile(NZBFILENAME_SHOW_B)['LETTER'] == 'D'
 
+    def test_nzbfile_cache(self):
+
+        # We don't open a database just for our cache
+        script = PostProcessScript(
+            logger=False, debug=VERY_VERBOSE_DEBUG, use_database=False)
+        assert script.parse_nzbfile(NZBFILENAME_SHOW_A)['LETTER'] == 'B'
+        assert script._nzbcache is None
+
+        # Unless we have one (or we ask for it)
+        script = PostProcessScript(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert script.database_key
+        assert script.parse_nzbfile(NZBFILENAME_SHOW_A)['LETTER'] == 'B'
+        assert script._nzbcache is not None
+        summary = script.summarize_nzbfile(NZBFILENAME_SHOW_A)
+        assert summary['files'] == 0
+
+        # Change the content without changing the size, modification time
+        # or inode of the NZB-File; our cached results are returned
+        st = os.stat(NZBFILENAME_SHOW_A)
+        with open(NZBFILENAME_SHOW_A, 'r+b') as f:
+            content = f.read().replace(
+                b'<meta type="letter">B', b'<meta type="letter">Z')
+            f.seek(0)
+            f.write(content)
+        os.utime(NZBFILENAME_SHOW_A, (st.st_atime, st.st_mtime))
+
+        # A new script (sharing the same database)
+        script = PostProcessScript(
+            logger=False, debug=VERY_VERBOSE_DEBUG, use_database=False)
+        assert script.parse_nzbfile(
+            NZBFILENAME_SHOW_A, use_cache=True)['LETTER'] == 'B'
+        assert script.summarize_nzbfile(
+            NZBFILENAME_SHOW_A, use_cache=True) == summary
+
+        # Unless we don't want it to be
+        assert script.parse_nzbfile(
+            NZBFILENAME_SHOW_A, use_cache=False)['LETTER'] == 'Z'
+
+        # Any other change is detected
+        os.utime(NZBFILENAME_SHOW_A, (st.st_atime, st.st_mtime + 1))
+        assert script.parse_nzbfile(
+            NZBFILENAME_SHOW_A, use_cache=True)['LETTER'] == 'Z'
+
+    def test_nzbcontent_parsing(self):
+
+        # a NZB Logger set to False uses stderr
+        script = PostProcessScript(logger=False, debug=VERY_VERBOSE_DEBUG)
+
+        with open(NZBFILENAME_SHOW_A, 'rb') as f:
+            content = f.read()
+
+        # Content is parsed from memory; nothing is written to disk
+        for entry in (content, content.decode('utf-8'), memoryview(content),
+                      bytearray(content)):
+            assert script.parse_nzbcontent(entry)['LETTER'] == 'B'
+            assert script.parse_nzbfile(entry)['LETTER'] == 'B'
+
+        # File-like objects are supported too
+        with open(NZBFILENAME_SHOW_A, 'rb') as f:
+            assert script.parse_nzbfile(f)['LETTER'] == 'B'
+
+        # Corrupt and empty content
+        assert script.parse_nzbcontent(content[:-32]) == {}
+        assert script.parse_nzbcontent(b'') == {}
+        assert script.parse_nzbfile(None) == {}
+
     def test_file_obsfucation(self):
 
         download_dir = join(TEMP_DIRECTORY, 'obsfucation')
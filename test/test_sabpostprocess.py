@@ -15,10 +15,10 @@
 # GNU Lesser General Public License for more details.
 #
 import os
+from os import listdir
 from os import makedirs
 from os.path import basename
 from os.path import dirname
-from os.path import isfile
 from os.path import join
 
 from TestBase import TestBase
@@ -281,18 +281,25 @@ class TestSABPostProcessScript(TestBase):
             dirname(__file__), 'var', 'plain.nzb.gz')
 
         # Create our object
+        files = set(listdir(TEMP_DIRECTORY))
         script = SABPostProcessScript(logger=False, debug=VERY_VERBOSE_DEBUG)
 
-        # We have a temporary file now
-        tmp_file = script._sab_temp_nzb
-        assert(isfile(tmp_file) is True)
+        # The compressed NZB-File is referenced directly; nothing is
+        # extracted to disk
+        assert script.nzbfilename.endswith('plain.nzb.gz')
+        assert not [f for f in set(listdir(TEMP_DIRECTORY)) - files
+                    if f.endswith('.nzb')]
 
-        # Running our script will just return zero
-        assert(script.run() == 0)
+        # It's decompressed as it's parsed
+        assert len(list(script.iter_nzbfile(script.nzbfilename))) == 3
+        assert script.summarize_nzbfile(script.nzbfilename)['files'] == 3
 
-        # But not after we exit, our tmp_file would have been cleaned up
-        assert(isfile(tmp_file) is False)
+        # Scripts calling on our old handling still work
+        assert script.handle_nzbfile(script.nzbfilename) == \
+            script.nzbfilename
+        script.sabnzbd_postprocess_close()
 
-        # We should be able to uncompress this file
+        # Running our script will just return zero
+        assert(script.run() == 0)
 
         del os.environ['%sORIG_NZB_GZ' % SAB_ENVIRO_ID]
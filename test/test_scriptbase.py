@@ -17,8 +17,15 @@
 import os
 import sys
 import re
+import gc
+import sqlite3
 from os.path import join
 from os.path import isfile
+from os.path import abspath
+from os.path import dirname
+import subprocess
+from base64 import standard_b64decode
+from datetime import datetime
 try:
     # Python 2.7
     from urllib import unquote
@@ -35,6 +42,25 @@ from nzbget.ScriptBase import SYS_ENVIRO_ID
 from nzbget.ScriptBase import SHELL_EXIT_CODE
 from nzbget.ScriptBase import CFG_ENVIRO_ID
 from nzbget.ScriptBase import Health
+from nzbget.ScriptBase import NZBGetExitException
+from nzbget.ScriptBase import _flush_writes_at_exit
+from nzbget.ScriptBase import WRITE_BEHIND_SCRIPTS
+from nzbget.ScriptBase import index_environ
+from nzbget.ScriptBase import nzb_variants
+from nzbget.ScriptBase import NZB_VARIANT_INDEX
+from nzbget.ScriptBase import FileFilter
+from nzbget.ScriptBase import FILE_FILTER_CACHE
+from nzbget.ScriptBase import FileRecord
+from nzbget.ScriptBase import SHR_ENVIRO_ID
+from nzbget.ScriptBase import TST_ENVIRO_ID
+from nzbget.ScriptBase import SAB_ENVIRO_ID
+from nzbget.ScriptBase import DNZB_ENVIRO_ID
+from nzbget.ScriptBase import SYS_OPTS_RE
+from nzbget.ScriptBase import CFG_OPTS_RE
+from nzbget.ScriptBase import SHR_OPTS_RE
+from nzbget.ScriptBase import TST_OPTS_RE
+from nzbget.ScriptBase import SAB_OPTS_RE
+from nzbget.ScriptBase import DNZB_OPTS_RE
 from nzbget.Logger import VERY_VERBOSE_DEBUG
 
 from shutil import rmtree
@@ -123,6 +149,183 @@ class TestScriptBase(TestBase):
         assert script.nzb_set(KEY, None) is True
         assert script.nzb_get(KEY, VALUE) == VALUE
 
+    def test_transaction(self):
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        other = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+
+        with script.transaction():
+            assert script.set('MY_TXN_KEY', 'MY_VALUE', use_env=False)
+            assert script.nzb_set('MY_TXN_KEY', 'MY_NZBVALUE', use_env=False)
+
+            # Nothing has been written yet
+            assert other.get('MY_TXN_KEY') is None
+            assert other.nzb_get('MY_TXN_KEY') is None
+
+        assert other.get('MY_TXN_KEY') == 'MY_VALUE'
+        assert other.nzb_get('MY_TXN_KEY') == 'MY_NZBVALUE'
+
+        with script.transaction():
+            assert script.unset('MY_TXN_KEY', use_env=False)
+            assert script.nzb_unset('MY_TXN_KEY', use_env=False)
+
+        other = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        assert other.get('MY_TXN_KEY') is None
+        assert other.nzb_get('MY_TXN_KEY') is None
+
+        # Without a database our block is still run
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        with script.transaction():
+            assert script.set('MY_TXN_KEY', 'MY_VALUE', use_env=False)
+        assert script.get('MY_TXN_KEY') == 'MY_VALUE'
+
+    def test_write_behind(self):
+        other = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        assert other.set('MY_WB_OLD', 'MY_OLD_VALUE', use_env=False)
+        other = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test',
+            write_behind=True)
+        assert script.get('MY_WB_OLD') == 'MY_OLD_VALUE'
+
+        assert script.set('MY_WB_KEY', 'MY_VALUE', use_env=False)
+        assert script.set('MY_WB_BOOL', True, use_env=False)
+        assert script.unset('MY_WB_OLD', use_env=False)
+        assert script.nzb_set('MY_WB_KEY', 'MY_NZBVALUE', use_env=False)
+
+        # Our reads are consistent with what we've queued
+        assert script.get('MY_WB_KEY') == 'MY_VALUE'
+        assert script.get('MY_WB_OLD') is None
+        items = dict(script.items(check_system=False))
+        assert items['MY_WB_KEY'] == 'MY_VALUE'
+        assert 'MY_WB_OLD' not in items
+        assert script.nzb_get('MY_WB_KEY') == 'MY_NZBVALUE'
+
+        # But nothing has been written yet
+        assert other.get('MY_WB_KEY') is None
+        assert other.get('MY_WB_OLD') == 'MY_OLD_VALUE'
+        assert other.nzb_get('MY_WB_KEY') is None
+
+        assert script.flush_writes()
+        assert not script._pending_writes
+        assert other.get('MY_WB_KEY') == 'MY_VALUE'
+        assert other.get('MY_WB_BOOL') == '1'
+        assert other.get('MY_WB_OLD') is None
+        assert other.nzb_get('MY_WB_KEY') == 'MY_NZBVALUE'
+
+        # We flush once we've queued enough
+        script.write_behind_size = 2
+        assert script.set('MY_WB_KEY1', 'A', use_env=False)
+        assert other.get('MY_WB_KEY1') is None
+        assert script.set('MY_WB_KEY2', 'B', use_env=False)
+        assert other.get('MY_WB_KEY1') == 'A'
+        assert other.get('MY_WB_KEY2') == 'B'
+
+        # Or once our oldest write is old enough
+        script.write_behind_age = 0
+        assert script.set('MY_WB_KEY1', 'C', use_env=False)
+        assert other.get('MY_WB_KEY1') == 'C'
+
+        # We flush when we receive a quit signal
+        script.write_behind_age = 60
+        assert script.set('MY_WB_KEY1', 'D', use_env=False)
+        try:
+            script.signal_quit(15, None)
+            assert False
+
+        except NZBGetExitException:
+            pass
+        assert other.get('MY_WB_KEY1') == 'D'
+
+        # A flush within a transaction() block is committed by the block
+        script.write_behind_size = 1
+        with script.transaction():
+            assert script.set('MY_WB_KEY1', 'H', use_env=False)
+            assert not script._pending_writes
+            assert other.get('MY_WB_KEY1') == 'D'
+        assert other.get('MY_WB_KEY1') == 'H'
+
+        with script.transaction():
+            assert script.set('MY_WB_KEY2', 'I', use_env=False)
+            assert script.flush_writes()
+        assert not script._pending_writes
+        assert other.get('MY_WB_KEY2') == 'I'
+        script.write_behind_size = 100
+
+        # Nothing is lost should our flush fail (another script is holding
+        # on to the database)
+        database = script._get_database()
+        database.retries = 0
+        database.execute("PRAGMA busy_timeout = 0")
+        locker = sqlite3.connect(database.database)
+        locker.execute("BEGIN IMMEDIATE")
+        assert script.set('MY_WB_KEY1', 'G', use_env=False)
+        assert not script.flush_writes()
+        assert script._pending_writes
+        assert script.get('MY_WB_KEY1') == 'G'
+        locker.rollback()
+        locker.close()
+
+        assert script.flush_writes()
+        assert not script._pending_writes
+        assert other.get('MY_WB_KEY1') == 'G'
+
+        # When run() finishes
+        class WriteBehindScript(ScriptBase):
+            def main(self, *args, **kwargs):
+                self.set('MY_WB_KEY1', 'E', use_env=False)
+                raise TypeError
+
+        script = WriteBehindScript(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test',
+            write_behind=True)
+        assert script.run() == SHELL_EXIT_CODE.FAILURE
+        assert other.get('MY_WB_KEY1') == 'E'
+
+        # And when we exit (atexit)
+        assert script.set('MY_WB_KEY1', 'F', use_env=False)
+        _flush_writes_at_exit()
+        assert other.get('MY_WB_KEY1') == 'F'
+
+        # Our scripts aren't kept around (for atexit) once they're gone
+        del script
+        for _ in range(10):
+            WriteBehindScript(
+                logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test',
+                write_behind=True)
+        gc.collect()
+        # The last one is still referenced by our signal handlers
+        assert len(WRITE_BEHIND_SCRIPTS) <= 1
+
+    def test_database_preload(self):
+        other = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        assert other.set('MY_PL_KEY', 'MY_VALUE', use_env=False)
+        assert other.nzb_set('MY_PL_KEY', 'MY_NZBVALUE', use_env=False)
+
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test',
+            database_preload=True)
+        assert script.get('MY_PL_KEY') == 'MY_VALUE'
+
+        # Everything else comes from memory
+        queries = []
+        script.database.socket.set_trace_callback(queries.append)
+        assert script.nzb_get('MY_PL_KEY') == 'MY_NZBVALUE'
+        for no in range(8):
+            assert script.nzb_get('MY_PL_MISSING%d' % no) is None
+        assert dict(script.nzb_items())['MY_PL_KEY'] == 'MY_NZBVALUE'
+        assert not queries
+
+        # Including what we write ourselves
+        assert script.set('MY_PL_KEY', 'MY_NEW_VALUE', use_env=False)
+        assert script.database.get('MY_PL_KEY') == 'MY_NEW_VALUE'
+
     def test_set_and_get(self):
         # a NZB Logger set to False uses stderr
         script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
@@ -285,6 +488,40 @@ class TestScriptBase(TestBase):
         )
         assert len(files) == 1
 
+    def test_iter_files(self):
+
+        # a NZB Logger set to False uses stderr
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert list(script.iter_files(search_dir=SEARCH_DIR)) == []
+
+        makedirs(join(SEARCH_DIR, 'subdir'))
+        for filename in ('file.mkv', 'file.nfo', 'sample.mkv',
+                         join('subdir', 'file.nfo')):
+            open(join(SEARCH_DIR, filename), 'w').close()
+
+        # Our results are the same as get_files()
+        for kwargs in ({}, {'suffix_filter': '.nfo'},
+                       {'prefix_filter': 'sample', 'fullstats': True},
+                       {'regex_filter': r'^file', 'max_depth': 1},
+                       {'search_dir': join(SEARCH_DIR, 'file.nfo')},
+                       {'search_dir': [
+                           SEARCH_DIR, join(SEARCH_DIR, 'subdir')]}):
+            kwargs.setdefault('search_dir', SEARCH_DIR)
+            assert dict(script.iter_files(**kwargs)) == \
+                script.get_files(**kwargs)
+
+        # Files are yielded as they're found; we can stop at any time
+        results = script.iter_files(search_dir=SEARCH_DIR)
+        path, meta = next(results)
+        assert meta['basename'] in ('file.mkv', 'file.nfo', 'sample.mkv')
+        assert path == join(SEARCH_DIR, meta['basename']) or \
+            path == join(SEARCH_DIR, 'subdir', meta['basename'])
+        results.close()
+
+        # Invalid regular expressions
+        assert list(script.iter_files(
+            search_dir=SEARCH_DIR, regex_filter='((')) == []
+
     def test_file_listings_with_depth(self):
 
         subdirs = (
@@ -760,6 +997,93 @@ class TestScriptBase(TestBase):
         # allow lowercase and mixed characters too
         assert script.validate('TempDir') is True
 
+    def test_index_environ(self):
+        """Test that our single pass over the environment produces the same
+        results as matching each of our regular expressions against it.
+        """
+        env = {
+            'NZBOP_TEMPDIR': ' /tmp ',
+            'NZBPO_DEBUG': 'no',
+            'NZBPO_lowercase': 'ignored',
+            'NZBR_SHARED': 'value',
+            'NZBR__DNZB_MOVIEYEAR': '1998',
+            'NZBR__DNZB_': 'ignored',
+            'NZBCP_COMMAND': 'ConnectionTest',
+            'SAB_COMPLETE_DIR': '/downloads',
+            'NZBPP_DIRECTORY': '/downloads/abcd',
+            'PATH': '/usr/bin',
+            'NZBOP_': 'ignored',
+            'nzbop_LOWER': 'ignored',
+        }
+
+        index = index_environ(env)
+        for prefix, regex in ((SYS_ENVIRO_ID, SYS_OPTS_RE),
+                              (CFG_ENVIRO_ID, CFG_OPTS_RE),
+                              (SHR_ENVIRO_ID, SHR_OPTS_RE),
+                              (TST_ENVIRO_ID, TST_OPTS_RE),
+                              (SAB_ENVIRO_ID, SAB_OPTS_RE),
+                              (DNZB_ENVIRO_ID, DNZB_OPTS_RE)):
+            assert index.get(prefix, {}) == {
+                regex.match(k).group(1): v.strip()
+                for (k, v) in env.items() if regex.match(k)}
+
+        assert index[SYS_ENVIRO_ID] == {'TEMPDIR': '/tmp'}
+        assert index[DNZB_ENVIRO_ID] == {'MOVIEYEAR': '1998'}
+        assert index['NZBPP_'] == {'DIRECTORY': '/downloads/abcd'}
+
+        # Our script references the environment through the same index
+        os.environ['%sMOVIEYEAR' % DNZB_ENVIRO_ID] = '1998'
+        try:
+            script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+            assert script.system['TEMPDIR'] == TEMP_DIRECTORY
+            assert script.nzbheaders['MOVIEYEAR'] == '1998'
+            assert script.environ_options(SYS_ENVIRO_ID)['TEMPDIR'] == \
+                TEMP_DIRECTORY
+
+        finally:
+            del os.environ['%sMOVIEYEAR' % DNZB_ENVIRO_ID]
+
+        assert script._environ_index is None
+
+        # Our index is released even if our script mode fails to initialize
+        scripts = []
+
+        class FailingScript(ScriptBase):
+            def shell_init(self, *args, **kwargs):
+                scripts.append(self)
+                raise ValueError('Failed to initialize')
+
+        try:
+            FailingScript(logger=False, debug=VERY_VERBOSE_DEBUG)
+            assert False
+
+        except ValueError:
+            pass
+
+        assert scripts[0]._environ_index is None
+
+    def test_lazy_imports(self):
+        """Importing nzbget should not load modules that are only needed
+        by some of the scripts (such as the XML parser, database, etc).
+        """
+        # We need a fresh interpreter to test this
+        lazy_modules = (
+            'lxml', 'sqlite3', 'xmlrpclib', 'xmlrpc.client', 'ssl', 'gzip',
+            'hashlib', '_hashlib',
+        )
+        code = 'import sys; import nzbget; print(",".join(' \
+            '[m for m in %r if m in sys.modules]))' % (lazy_modules, )
+
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.pathsep.join(filter(bool, (
+            dirname(dirname(abspath(__file__))),
+            env.get('PYTHONPATH'),
+        )))
+
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], env=env).decode('utf-8').strip()
+        assert output == ''
+
     def test_items(self):
         """see if we can retreive all our set variables using the items()
         function.
@@ -1117,3 +1441,579 @@ class TestScriptBase(TestBase):
         # like ?? and *
         results = script.parse_regex('*.mkv, *.avi')
         assert(len(results) == 2)
+
+    def test_add_nzb(self):
+        """
+        NZB-Files (compressed or not) are passed along to the NZBGet API
+        """
+        class API(object):
+            def __init__(self):
+                self.calls = []
+
+            def append(self, *args):
+                self.calls.append(args)
+                return True
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        script.api = API()
+
+        gzipped = join(dirname(__file__), 'var', 'plain.nzb.gz')
+        assert script.add_nzb(gzipped, category='Linux') is True
+
+        filename, b64content, category = script.api.calls[-1][:3]
+        assert filename == gzipped
+        assert category == 'Linux'
+
+        # NZBGet receives the decompressed NZB-File
+        content = standard_b64decode(b64content)
+        assert content.startswith(b'<?xml')
+
+        # In-memory content (compressed or not)
+        with open(gzipped, 'rb') as f:
+            assert script.add_nzb('plain.nzb', content=f.read()) is True
+        assert standard_b64decode(script.api.calls[-1][1]) == content
+
+        assert script.add_nzb(
+            'plain.nzb', content=content.decode('utf-8')) is True
+        assert standard_b64decode(script.api.calls[-1][1]) == content
+
+        # A missing NZB-File
+        assert script.add_nzb(join(TEMP_DIRECTORY, 'missing.nzb')) is False
+        assert len(script.api.calls) == 3
+
+    def test_nzb_variants(self):
+        """
+        The renamed variants of an NZB-File are indexed by their name
+        """
+        nzb_dir = join(TEMP_DIRECTORY, 'nzb_variants')
+        try:
+            rmtree(nzb_dir)
+        except:
+            pass
+        makedirs(nzb_dir)
+
+        for filename in ('A.nzb.queued', 'A.nzb.2.queued', 'A.nzb.error',
+                         'A.nzb.3.nzb_processed', 'B.nzb.processed',
+                         'AA.nzb.queued', 'A.nzb.bak', 'A.nzb'):
+            with open(join(nzb_dir, filename), 'w') as f:
+                f.write('')
+
+        assert sorted(nzb_variants(nzb_dir, 'A.nzb')) == sorted([
+            join(nzb_dir, 'A.nzb'),
+            join(nzb_dir, 'A.nzb.queued'),
+            join(nzb_dir, 'A.nzb.2.queued'),
+            join(nzb_dir, 'A.nzb.error'),
+            join(nzb_dir, 'A.nzb.3.nzb_processed'),
+        ])
+        assert nzb_variants(nzb_dir, 'B.nzb') == [
+            join(nzb_dir, 'B.nzb.processed')]
+        assert nzb_variants(nzb_dir, 'C.nzb') == []
+        assert abspath(nzb_dir) in NZB_VARIANT_INDEX
+
+        # Our index is rebuilt once the directory changes
+        with open(join(nzb_dir, 'C.nzb.queued'), 'w') as f:
+            f.write('')
+        # Some filesystems only track the modification time in seconds
+        st = os.stat(nzb_dir)
+        os.utime(nzb_dir, (st.st_atime, st.st_mtime + 1))
+        assert nzb_variants(nzb_dir, 'C.nzb') == [
+            join(nzb_dir, 'C.nzb.queued')]
+
+        # Missing directories
+        rmtree(nzb_dir)
+        assert nzb_variants(nzb_dir, 'A.nzb') == []
+        assert abspath(nzb_dir) not in NZB_VARIANT_INDEX
+
+    def test_get_files_links(self):
+        """
+        Symbolic links are handled the same way regardless of how the
+        directory is read
+        """
+        if not hasattr(os, 'symlink'):
+            # Nothing to test
+            return
+
+        link_dir = join(TEMP_DIRECTORY, 'file_links')
+        try:
+            rmtree(link_dir)
+        except:
+            pass
+        makedirs(join(link_dir, 'directory'))
+        for path in ('file.mkv', join('directory', 'file.nfo')):
+            with open(join(link_dir, path), 'w') as f:
+                f.write('content')
+
+        os.symlink(join(link_dir, 'file.mkv'), join(link_dir, 'link.mkv'))
+        os.symlink(join(link_dir, 'directory'), join(link_dir, 'dir_link'))
+        os.symlink(join(link_dir, 'missing'), join(link_dir, 'broken.mkv'))
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        files = script.get_files(link_dir, fullstats=True)
+        assert sorted(files.keys()) == sorted([
+            join(link_dir, 'file.mkv'),
+            join(link_dir, 'link.mkv'),
+            join(link_dir, 'directory', 'file.nfo'),
+        ])
+        # Links are followed for their stats
+        assert files[join(link_dir, 'link.mkv')]['filesize'] == 7
+
+        files = script.get_files(link_dir, followlinks=True)
+        assert join(link_dir, 'dir_link', 'file.nfo') in files
+        assert len(files) == 4
+
+        rmtree(link_dir)
+
+    def test_get_files_threaded(self):
+        """
+        Directories walked with a pool of threads produce the very same
+        results (in the very same order) as they do serially
+        """
+        from nzbget.ScriptBase import SKIP_DIRECTORIES
+
+        for dir_no in range(5):
+            for path in ('a', join('a', 'b'), join('a', 'b', 'c'), 'd'):
+                _dir = join(SEARCH_DIR, 'dir%d' % dir_no, path)
+                makedirs(_dir)
+                for file_no in range(3):
+                    open(join(_dir, 'file%d.mkv' % file_no), 'w').close()
+                open(join(_dir, 'file.nfo'), 'w').close()
+
+        for _dir in SKIP_DIRECTORIES:
+            makedirs(join(SEARCH_DIR, 'dir0', _dir))
+            open(join(SEARCH_DIR, 'dir0', _dir, 'ignore_me.mkv'), 'w').close()
+
+        if hasattr(os, 'symlink'):
+            os.symlink(join(SEARCH_DIR, 'dir1'), join(SEARCH_DIR, 'dir_link'))
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        for kwargs in ({}, {'max_depth': 3}, {'min_depth': 2},
+                       {'followlinks': True}, {'skip_directories': False},
+                       {'suffix_filter': '.nfo', 'fullstats': True},
+                       {'regex_filter': r'file[12]', 'max_depth': 4}):
+
+            expected = list(script.iter_files(SEARCH_DIR, **kwargs))
+            assert expected
+            for threads in (2, 8):
+                assert list(script.iter_files(
+                    SEARCH_DIR, threads=threads, **kwargs)) == expected
+
+            assert script.get_files(SEARCH_DIR, threads=4, **kwargs) == \
+                dict(expected)
+
+        # We can stop at any time
+        results = script.iter_files(SEARCH_DIR, threads=4)
+        assert next(results)
+        results.close()
+
+        # Missing directories are handled gracefully
+        assert list(script.iter_files(
+            join(SEARCH_DIR, 'missing'), threads=4)) == []
+
+    def test_file_filter(self):
+        # No filters at all
+        file_filter = FileFilter()
+        assert len(file_filter) == 0
+        assert file_filter.match('file.mkv')
+
+        # Regular expressions are merged
+        file_filter = FileFilter(regex_filter=[
+            re.compile(r'\.mkv$', re.IGNORECASE),
+            re.compile(r'^sample', re.IGNORECASE),
+        ])
+        assert len(file_filter) == 2
+        assert file_filter.match('file.MKV')
+        assert file_filter.match('Sample.avi')
+        assert not file_filter.match('file.avi')
+
+        # Back-references can't be merged; but they still work
+        file_filter = FileFilter(regex_filter=[
+            re.compile(r'^(a+)b\1$'),
+            re.compile(r'^(?P<x>c+)d(?P=x)$'),
+            re.compile(r'^(e)$'),
+        ])
+        assert file_filter.match('aabaa')
+        assert not file_filter.match('aaba')
+        assert file_filter.match('cdc')
+        assert file_filter.match('e')
+        assert not file_filter.match('f')
+
+        # Patterns with different flags are handled separately
+        file_filter = FileFilter(regex_filter=[
+            re.compile(r'\.mkv$'),
+            re.compile(r'\.nfo$', re.IGNORECASE),
+        ])
+        assert not file_filter.match('file.MKV')
+        assert file_filter.match('file.NFO')
+
+        # Prefixes and Suffixes; all filters must match
+        file_filter = FileFilter(
+            regex_filter=[re.compile(r'E[0-9]+')],
+            prefix_filter=['show', 'movie'],
+            suffix_filter=['.mkv', '.avi'])
+        assert len(file_filter) == 5
+        assert file_filter.match('show.E01.mkv')
+        assert file_filter.match('movie.E01.avi')
+        assert not file_filter.match('show.mkv')
+        assert not file_filter.match('SHOW.E01.MKV')
+        assert not file_filter.match('tv.E01.mkv')
+
+        file_filter = FileFilter(
+            prefix_filter=['Show'], suffix_filter=['.MKV'], ignore_case=True)
+        assert file_filter.match('SHOW.E01.mkv')
+        assert not file_filter.match('SHOW.E01.avi')
+
+        # Our filters are only prepared once
+        FILE_FILTER_CACHE.clear()
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        file_filter = script._file_filter(
+            regex_filter=['^file', '^sample'], suffix_filter='.mkv, .avi')
+        assert len(file_filter) == 4
+        assert len(FILE_FILTER_CACHE) == 1
+        assert file_filter is script._file_filter(
+            regex_filter=['^file', '^sample'], suffix_filter='.mkv, .avi')
+        assert file_filter is not script._file_filter(
+            regex_filter=['^file', '^sample'], suffix_filter='.mkv, .avi',
+            case_sensitive=True)
+        assert len(FILE_FILTER_CACHE) == 2
+
+        # Invalid regular expressions
+        assert script._file_filter(regex_filter='((') is None
+        assert len(FILE_FILTER_CACHE) == 2
+
+    def test_file_record(self):
+        path = join(TEMP_DIRECTORY, 'File.Record.MKV')
+        with open(path, 'w') as f:
+            f.write('content')
+        stat_obj = os.stat(path)
+
+        record = FileRecord('File.Record.MKV', TEMP_DIRECTORY)
+        assert len(record) == 4
+        assert record == {
+            'basename': 'File.Record.MKV',
+            'dirname': TEMP_DIRECTORY,
+            'filename': 'File.Record',
+            'extension': '.mkv',
+        }
+        assert 'filesize' not in record
+        assert record.get('modified') is None
+        try:
+            record['filesize']
+            # We should never get here
+            assert False
+
+        except KeyError:
+            # Expected
+            pass
+
+        record = FileRecord('File.Record.MKV', TEMP_DIRECTORY, stat_obj)
+        assert len(record) == 8
+        assert record['filesize'] == 7
+        assert record['modified'] == \
+            datetime.fromtimestamp(int(stat_obj.st_mtime))
+        assert record['accessed'] == \
+            datetime.fromtimestamp(int(stat_obj.st_atime))
+        assert record['created'] == \
+            datetime.fromtimestamp(int(stat_obj.st_ctime))
+        assert sorted(record.keys()) == sorted([
+            'basename', 'dirname', 'filename', 'extension',
+            'filesize', 'accessed', 'created', 'modified'])
+        assert dict(record) == record.copy()
+        assert isinstance(record.copy(), dict)
+
+        # Records can still be changed like a dictionary
+        record['filesize'] = 100
+        record['custom'] = True
+        del record['created']
+        assert record['filesize'] == 100
+        assert record['custom'] is True
+        assert 'created' not in record
+        assert len(record) == 8
+
+        # get_files() returns them
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        files = script.get_files(path, fullstats=True)
+        assert isinstance(files[path], FileRecord)
+        assert files[path] == FileRecord(
+            'File.Record.MKV', TEMP_DIRECTORY, stat_obj)
+        os.unlink(path)
+
+    def test_get_file_changes(self):
+        for _dir in ('a', join('a', 'b'), 'c'):
+            makedirs(join(SEARCH_DIR, _dir))
+            for no in range(3):
+                with open(join(SEARCH_DIR, _dir, 'file%d.mkv' % no), 'w') \
+                        as f:
+                    f.write('content')
+
+        # We don't open a database just for our snapshots
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert script.get_file_changes(SEARCH_DIR) is None
+        assert script._nzbcache is None
+
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        script._get_nzbcache().snapshot_unset(SEARCH_DIR)
+
+        # Everything is new the first time
+        changes = script.get_file_changes(SEARCH_DIR)
+        assert len(changes['added']) == 9
+        assert changes['modified'] == {}
+        assert changes['removed'] == []
+        record = changes['added'][join(SEARCH_DIR, 'a', 'b', 'file0.mkv')]
+        assert record['filesize'] == 7
+        assert record['dirname'] == join(SEARCH_DIR, 'a', 'b')
+
+        # Nothing changed
+        assert script.get_file_changes(SEARCH_DIR) == {
+            'added': {}, 'modified': {}, 'removed': []}
+
+        # Add, remove and modify some files
+        with open(join(SEARCH_DIR, 'a', 'b', 'new.nfo'), 'w') as f:
+            f.write('new')
+        os.unlink(join(SEARCH_DIR, 'c', 'file0.mkv'))
+        with open(join(SEARCH_DIR, 'a', 'file1.mkv'), 'w') as f:
+            f.write('content that has changed')
+
+        changes = script.get_file_changes(SEARCH_DIR)
+        assert list(changes['added'].keys()) == \
+            [join(SEARCH_DIR, 'a', 'b', 'new.nfo')]
+        assert changes['removed'] == [join(SEARCH_DIR, 'c', 'file0.mkv')]
+
+        # A file rewritten in place doesn't change it's directory; only a
+        # verify catches it
+        assert changes['modified'] == {}
+        changes = script.get_file_changes(SEARCH_DIR, verify=True)
+        assert list(changes['modified'].keys()) == \
+            [join(SEARCH_DIR, 'a', 'file1.mkv')]
+        assert changes['modified'][join(SEARCH_DIR, 'a', 'file1.mkv')][
+            'filesize'] == 24
+
+        # Files replaced in a directory are detected
+        os.unlink(join(SEARCH_DIR, 'c', 'file1.mkv'))
+        with open(join(SEARCH_DIR, 'c', 'file1.mkv'), 'w') as f:
+            f.write('replaced')
+        changes = script.get_file_changes(SEARCH_DIR)
+        assert list(changes['modified'].keys()) == \
+            [join(SEARCH_DIR, 'c', 'file1.mkv')]
+
+        # Removing a directory removes everything beneath it
+        rmtree(join(SEARCH_DIR, 'a'))
+        changes = script.get_file_changes(SEARCH_DIR)
+        assert sorted(changes['removed']) == sorted(
+            [join(SEARCH_DIR, 'a', 'b', 'file%d.mkv' % no)
+             for no in range(3)] +
+            [join(SEARCH_DIR, 'a', 'file%d.mkv' % no) for no in range(3)] +
+            [join(SEARCH_DIR, 'a', 'b', 'new.nfo')])
+        assert script.get_file_changes(SEARCH_DIR) == {
+            'added': {}, 'modified': {}, 'removed': []}
+
+        # Our snapshot only covers what we're left with
+        rmtree(SEARCH_DIR)
+        changes = script.get_file_changes(SEARCH_DIR)
+        assert sorted(changes['removed']) == sorted(
+            [join(SEARCH_DIR, 'c', 'file1.mkv'),
+             join(SEARCH_DIR, 'c', 'file2.mkv')])
+        assert script.get_file_changes(SEARCH_DIR) == {
+            'added': {}, 'modified': {}, 'removed': []}
+
+    def test_get_files_deep(self):
+        """
+        Directory trees deeper than our recursion limit can be walked
+        """
+        depth = 300
+        path = join(SEARCH_DIR, *(['d'] * depth))
+        makedirs(path)
+        open(join(path, 'deep.mkv'), 'w').close()
+        open(join(SEARCH_DIR, 'd', 'shallow.mkv'), 'w').close()
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        recursion_limit = sys.getrecursionlimit()
+        try:
+            sys.setrecursionlimit(depth - 100)
+            for threads in (None, 4):
+                files = script.get_files(SEARCH_DIR, threads=threads)
+                assert sorted(files.keys()) == sorted([
+                    join(path, 'deep.mkv'),
+                    join(SEARCH_DIR, 'd', 'shallow.mkv')])
+
+            # Depth limits still apply
+            files = script.get_files(SEARCH_DIR, max_depth=depth)
+            assert list(files.keys()) == \
+                [join(SEARCH_DIR, 'd', 'shallow.mkv')]
+
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+    def test_largest_files(self):
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert script.largest_files(search_dir=SEARCH_DIR) == []
+        assert script.summarize_files(SEARCH_DIR) == {
+            'files': 0, 'bytes': 0, 'extensions': {}}
+
+        makedirs(join(SEARCH_DIR, 'subs'))
+        sizes = {
+            'movie.mkv': 5000,
+            'sample.mkv': 500,
+            'movie.nfo': 10,
+            'movie.vol01.PAR2': 300,
+            'movie.vol02.par2': 600,
+            'README': 20,
+            join('subs', 'english.srt'): 40,
+            join('subs', 'french.srt'): 45,
+        }
+        for path, size in sizes.items():
+            with open(join(SEARCH_DIR, path), 'wb') as f:
+                f.write(b'x' * size)
+
+        results = script.largest_files(search_dir=SEARCH_DIR)
+        assert len(results) == 1
+        assert results[0][0] == join(SEARCH_DIR, 'movie.mkv')
+        assert results[0][1]['filesize'] == 5000
+
+        results = script.largest_files(3, SEARCH_DIR)
+        assert [path for path, _ in results] == [
+            join(SEARCH_DIR, 'movie.mkv'),
+            join(SEARCH_DIR, 'movie.vol02.par2'),
+            join(SEARCH_DIR, 'sample.mkv'),
+        ]
+
+        # Filters are supported
+        results = script.largest_files(
+            2, SEARCH_DIR, suffix_filter='.srt')
+        assert [path for path, _ in results] == [
+            join(SEARCH_DIR, 'subs', 'french.srt'),
+            join(SEARCH_DIR, 'subs', 'english.srt'),
+        ]
+
+        # Asking for more than we have
+        assert len(script.largest_files(100, SEARCH_DIR)) == len(sizes)
+
+        assert script.summarize_files(SEARCH_DIR) == {
+            'files': 8,
+            'bytes': sum(sizes.values()),
+            'extensions': {
+                '.mkv': {'files': 2, 'bytes': 5500},
+                '.nfo': {'files': 1, 'bytes': 10},
+                '.par2': {'files': 2, 'bytes': 900},
+                '.srt': {'files': 2, 'bytes': 85},
+                '': {'files': 1, 'bytes': 20},
+            },
+        }
+        assert script.summarize_files(SEARCH_DIR, max_depth=1)['files'] == 6
+
+    def test_hash_files(self):
+        import hashlib
+
+        contents = {}
+        for no in range(5):
+            path = join(SEARCH_DIR, 'file%d.bin' % no)
+            contents[path] = os.urandom(1000 * (no + 1))
+            with open(path, 'wb') as f:
+                f.write(contents[path])
+
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+        expected = dict(
+            (path, hashlib.md5(content).hexdigest())
+            for path, content in contents.items())
+
+        for threads in (1, 4):
+            assert script.hash_files(
+                contents.keys(), threads=threads, use_cache=False) == \
+                expected
+
+        # The dictionary returned by get_files() can be passed in
+        assert script.hash_files(script.get_files(SEARCH_DIR)) == expected
+
+        path = join(SEARCH_DIR, 'file0.bin')
+        assert script.hash_file(path) == expected[path]
+        assert script.hash_file(path, 'sha1') == \
+            hashlib.sha1(contents[path]).hexdigest()
+        assert script.hash_file(path, partial=100) == hashlib.md5(
+            contents[path][:100] + contents[path][-100:]).hexdigest()
+
+        # Change the content without changing the size, modification time
+        # or inode of the file; our cached hash is returned to any script
+        st = os.stat(path)
+        with open(path, 'r+b') as f:
+            f.write(b'changed')
+        os.utime(path, (st.st_atime, st.st_mtime))
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert script.hash_file(path, use_cache=True) == expected[path]
+        assert script.hash_file(path, use_cache=False) != expected[path]
+
+        # We don't open a database just for our cache unless asked to
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        assert script.hash_file(path) != expected[path]
+        assert script._nzbcache is None
+
+        script = ScriptBase(
+            logger=False, debug=VERY_VERBOSE_DEBUG, database_key='test')
+
+        # Any other change is detected
+        os.utime(path, (st.st_atime, st.st_mtime + 1))
+        assert script.hash_file(path) != expected[path]
+
+        # Files we can't hash
+        assert script.hash_file(join(SEARCH_DIR, 'missing')) is None
+        assert script.hash_file(SEARCH_DIR) is None
+        assert script.hash_files([path], algorithm='invalid') == \
+            {path: None}
+
+    def test_disk_usage(self):
+        from nzbget.ScriptBase import SKIP_DIRECTORIES
+
+        makedirs(join(SEARCH_DIR, 'a', 'b'))
+        makedirs(join(SEARCH_DIR, 'c'))
+        makedirs(join(SEARCH_DIR, SKIP_DIRECTORIES[0]))
+        sizes = {
+            'root.mkv': 5000,
+            join('a', 'a.nfo'): 100,
+            join('a', 'b', 'b1.srt'): 10,
+            join('a', 'b', 'b2.srt'): 20,
+            join(SKIP_DIRECTORIES[0], 'ignored'): 1000,
+        }
+        for path, size in sizes.items():
+            with open(join(SEARCH_DIR, path), 'wb') as f:
+                f.write(b'x' * size)
+
+        script = ScriptBase(logger=False, debug=VERY_VERBOSE_DEBUG)
+        usage = script.disk_usage(SEARCH_DIR)
+        assert sorted(usage.keys()) == sorted([
+            SEARCH_DIR, join(SEARCH_DIR, 'a'), join(SEARCH_DIR, 'a', 'b'),
+            join(SEARCH_DIR, 'c')])
+
+        assert usage[SEARCH_DIR]['files'] == 4
+        assert usage[SEARCH_DIR]['directories'] == 3
+        assert usage[SEARCH_DIR]['bytes'] == 5130
+        assert usage[join(SEARCH_DIR, 'a')]['files'] == 3
+        assert usage[join(SEARCH_DIR, 'a')]['directories'] == 1
+        assert usage[join(SEARCH_DIR, 'a')]['bytes'] == 130
+        assert usage[join(SEARCH_DIR, 'a', 'b')]['bytes'] == 30
+        assert usage[join(SEARCH_DIR, 'c')] == {
+            'files': 0, 'directories': 0, 'bytes': 0, 'allocated': 0}
+
+        if hasattr(os.stat(SEARCH_DIR), 'st_blocks'):
+            assert usage[SEARCH_DIR]['allocated'] == sum(
+                os.stat(join(SEARCH_DIR, path)).st_blocks * 512
+                for path in sizes.keys()
+                if not path.startswith(SKIP_DIRECTORIES[0]))
+
+        # Our results are the same when using threads
+        assert script.disk_usage(
+            SEARCH_DIR, threads=4, use_cache=False) == usage
+
+        # We don't need to walk the directory again
+        with open(join(SEARCH_DIR, 'c', 'new.mkv'), 'wb') as f:
+            f.write(b'x' * 50)
+        assert script.disk_usage(SEARCH_DIR) == usage
+        assert script.disk_usage(SEARCH_DIR, use_cache=False)[SEARCH_DIR][
+            'bytes'] == 5180
+
+        # Skipped directories can be included
+        assert script.disk_usage(
+            SEARCH_DIR, skip_directories=False)[SEARCH_DIR]['bytes'] == 6180
+
+        # Missing directories
+        assert script.disk_usage(join(SEARCH_DIR, 'missing')) == {}
@@ -21,7 +21,20 @@ sys.path.insert(0, join(dirname(dirname(__file__)), 'nzbget'))
 
 from Utils import os_path_split
 from Utils import tidy_path
+from Utils import scandir
+from Utils import ListDirEntry
+from Utils import ThreadPool
+from Utils import file_hash
+from Utils import hash_object
+from Utils import HASH_MMAP_MIN_SIZE
 from TestBase import TestBase
+from TestBase import TEMP_DIRECTORY
+
+import os
+import zlib
+import hashlib
+from shutil import rmtree
+from threading import Event
 
 
 class TestUtils(TestBase):
@@ -77,3 +90,131 @@ class TestUtils(TestBase):
         # Network Paths
         assert tidy_path('\\\\network\\\\path\\ ') == \
             '\\\\network\\path'
+
+    def test_scandir(self):
+        scan_dir = join(TEMP_DIRECTORY, 'scandir')
+        try:
+            rmtree(scan_dir)
+        except:
+            pass
+        os.makedirs(join(scan_dir, 'directory'))
+        with open(join(scan_dir, 'file'), 'w') as f:
+            f.write('content')
+
+        if hasattr(os, 'symlink'):
+            os.symlink(join(scan_dir, 'file'), join(scan_dir, 'file_link'))
+            os.symlink(
+                join(scan_dir, 'directory'), join(scan_dir, 'dir_link'))
+            os.symlink(join(scan_dir, 'missing'), join(scan_dir, 'broken'))
+
+        entries = dict((e.name, e) for e in scandir(scan_dir))
+        expected = dict(
+            (name, ListDirEntry(scan_dir, name))
+            for name in os.listdir(scan_dir))
+        assert sorted(entries.keys()) == sorted(expected.keys())
+
+        # Our listdir() based fallback behaves the same way
+        for name, entry in expected.items():
+            assert entries[name].path == entry.path == join(scan_dir, name)
+            assert entries[name].is_dir() == entry.is_dir() == \
+                os.path.isdir(entry.path)
+            assert entries[name].is_file() == entry.is_file() == \
+                os.path.isfile(entry.path)
+            assert entries[name].is_symlink() == entry.is_symlink() == \
+                os.path.islink(entry.path)
+
+        assert entries['file'].stat().st_size == \
+            expected['file'].stat().st_size == 7
+
+        # Missing directories
+        rmtree(scan_dir)
+        try:
+            scandir(scan_dir)
+            # We should never get here
+            assert False
+
+        except OSError:
+            # Expected
+            pass
+
+    def test_thread_pool(self):
+        pool = ThreadPool(4)
+        jobs = [pool.submit(pow, no, 2) for no in range(100)]
+        assert [job.result() for job in jobs] == \
+            [no * no for no in range(100)]
+
+        # Exceptions are thrown back to whoever collects the result
+        job = pool.submit(int, 'invalid')
+        try:
+            job.result()
+            # We should never get here
+            assert False
+
+        except ValueError:
+            # Expected
+            pass
+
+        pool.close()
+
+        # The most recent job submitted is started first
+        order = []
+        pool = ThreadPool(1)
+        started = Event()
+        release = Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        # Occupy our only thread while we queue our jobs
+        pool.submit(block)
+        started.wait()
+        jobs = [pool.submit(order.append, no) for no in range(5)]
+        release.set()
+        for job in jobs:
+            job.result()
+        assert order == [4, 3, 2, 1, 0]
+        pool.close()
+
+    def test_file_hash(self):
+        path = join(TEMP_DIRECTORY, 'file_hash.bin')
+
+        # Small files are read and large ones are memory mapped
+        for size in (0, 1000, HASH_MMAP_MIN_SIZE + 1000):
+            content = os.urandom(size)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+            for algorithm in ('md5', 'sha1', 'sha256'):
+                assert file_hash(path, algorithm) == \
+                    hashlib.new(algorithm, content).hexdigest()
+
+            assert file_hash(path, 'crc32') == \
+                '%08x' % (zlib.crc32(content) & 0xffffffff)
+
+            # Only the head and tail of the file
+            expected = hashlib.md5(content[:100] + content[-100:]) \
+                if size > 200 else hashlib.md5(content)
+            assert file_hash(path, partial=100) == expected.hexdigest()
+
+        # Unsupported algorithms
+        for algorithm in ('invalid', 'xxh_invalid'):
+            try:
+                hash_object(algorithm)
+                # We should never get here
+                assert False
+
+            except ValueError:
+                # Expected
+                pass
+
+        # Missing files
+        os.unlink(path)
+        try:
+            file_hash(path)
+            # We should never get here
+            assert False
+
+        except (IOError, OSError):
+            # Expected
+            pass
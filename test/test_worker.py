@@ -0,0 +1,124 @@
+# -*- encoding: utf-8 -*-
+#
+# A Test Suite (for nose) for the resident script Worker
+#
+# Copyright (C) 2014-2019 Chris Caron <lead2gold@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+import os
+import sys
+import stat
+from os.path import join
+from threading import Thread
+
+from TestBase import TestBase
+from TestBase import TEMP_DIRECTORY
+
+from nzbget.ScriptBase import CFG_ENVIRO_ID
+from nzbget.ScriptBase import SYS_ENVIRO_ID
+from nzbget.ScriptBase import NZBGET_MSG_PREFIX
+from nzbget.ScriptBase import EXIT_CODE
+from nzbget.PostProcessScript import PostProcessScript
+from nzbget.PostProcessScript import POSTPROC_ENVIRO_ID
+from nzbget.Worker import ScriptWorker
+from nzbget.Worker import forward
+from nzbget.Logger import VERY_VERBOSE_DEBUG
+
+try:
+    # Python v2.7
+    from StringIO import StringIO
+except ImportError:
+    # Python v3.x
+    from io import StringIO
+
+SOCKET_PATH = join(TEMP_DIRECTORY, 'worker.sock')
+
+
+class WorkerScript(PostProcessScript):
+    """A post-processing script that reports on it's environment"""
+
+    def postprocess_main(self, *args, **kwargs):
+        # Anything set by a previous request?
+        self.push('PREVIOUS', self.get('PREVIOUS', 'no'))
+        self.set('PREVIOUS', 'yes')
+
+        self.push('MYCOLOR', self.get('COLOR'))
+        sys.stderr.write('My color is %s\n' % self.get('COLOR'))
+        return EXIT_CODE.SUCCESS if self.get('COLOR') != 'red' \
+            else EXIT_CODE.FAILURE
+
+
+class TestWorker(TestBase):
+    def environment(self, color):
+        return {
+            '%sTEMPDIR' % SYS_ENVIRO_ID: TEMP_DIRECTORY,
+            '%sVERSION' % SYS_ENVIRO_ID: '18',
+            '%sDIRECTORY' % POSTPROC_ENVIRO_ID: TEMP_DIRECTORY,
+            '%sNZBNAME' % POSTPROC_ENVIRO_ID: 'A.Great.Movie',
+            '%sCOLOR' % CFG_ENVIRO_ID: color,
+        }
+
+    def test_worker(self):
+        worker = ScriptWorker(
+            WorkerScript, SOCKET_PATH,
+            logger=False, debug=VERY_VERBOSE_DEBUG)
+        worker.listen()
+
+        # Nobody else can connect to our worker
+        assert stat.S_IMODE(os.stat(SOCKET_PATH).st_mode) == 0o600
+
+        def serve(count):
+            for _ in range(count):
+                worker.serve_once()
+
+        thread = Thread(target=serve, args=(2, ))
+        thread.start()
+
+        saved_environ = dict(os.environ)
+        try:
+            stdout = StringIO()
+            stderr = StringIO()
+            assert forward(
+                SOCKET_PATH, argv=['script.py'],
+                environ=self.environment('blue'),
+                stdout=stdout, stderr=stderr) == EXIT_CODE.SUCCESS
+            assert '%sNZBPR_MYCOLOR=blue' % NZBGET_MSG_PREFIX in \
+                stdout.getvalue().splitlines()
+
+            # What's written to stderr is relayed (to stderr) too
+            assert 'My color is blue' in stderr.getvalue().splitlines()
+            assert 'My color is blue' not in stdout.getvalue()
+
+            # Nothing from the first request can leak into the second
+            stdout = StringIO()
+            assert forward(
+                SOCKET_PATH, argv=['script.py'],
+                environ=self.environment('red'),
+                stdout=stdout) == EXIT_CODE.FAILURE
+            assert '%sNZBPR_MYCOLOR=red' % NZBGET_MSG_PREFIX in \
+                stdout.getvalue().splitlines()
+            assert '%sNZBPR_PREVIOUS=no' % NZBGET_MSG_PREFIX in \
+                stdout.getvalue().splitlines()
+
+        finally:
+            thread.join()
+            worker.close()
+
+        # Our own environment was never touched
+        assert dict(os.environ) == saved_environ
+        assert '%sPREVIOUS' % CFG_ENVIRO_ID not in os.environ
+        assert sys.stdout is not stdout
+        assert sys.stderr is not stderr
+
+    def test_worker_unavailable(self):
+        # No worker is listening
+        assert forward(SOCKET_PATH, environ={}) is None